@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Benchmark infra-manager.py against local stand-ins for docker, kind, kubectl and containerlab.
+
+Every scenario runs in a fresh child process, working directory and shim state
+(see shims.py), so no clusters, containers or network are needed. For every
+topology size (N clusters with M workers, K VLANs, P IPClaims) it reports the
+wall time, the number of subprocesses infra-manager.py started, the number of
+tool calls the shims saw (including the `ip` calls inside `docker exec`) and
+the peak memory of the infra-manager.py process.
+
+Scenarios:
+  create           create_infra(): networks, clusters, CNI, containerlab, kubenet
+  network-plan     create_network_plan(): all steps, on seeded clusters
+  gen-crs          generate_network_crs() from seeded VLANClaims/IPClaims
+  vlan-interfaces  create_vlan_interfaces() on seeded clusters
+  destroy          destroy_infra() of seeded clusters
+
+Examples:
+  python bench/bench.py
+  python bench/bench.py --sizes 4:1:8:24,8:2:64:256 --scenarios gen-crs,vlan-interfaces
+  python bench/bench.py --latency 0.05 --latency-for kind_create=2 --json before.json
+
+NOTE: like infra-manager.py itself, `create` rewrites and `destroy` removes
+/tmp/vars.json, so these scenarios refuse to run while that file exists (a lab
+may be up) unless --force.
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+POC_DIR = os.path.dirname(BENCH_DIR)
+SCRIPT = os.path.join(POC_DIR, "infra-manager.py")
+sys.path.insert(0, BENCH_DIR)
+import shims  # noqa: E402
+
+SCENARIOS = ["create", "network-plan", "gen-crs", "vlan-interfaces", "destroy"]
+DEFAULT_SIZES = "2:1:8:24,4:2:32:128,8:2:64:512"
+TOOLS = ["kind", "kubectl", "docker", "containerlab", "curl", "sudo", "sysctl", "ip"]
+VLAN_MIN = 2
+
+# ----------------------------
+# TOPOLOGY
+# ----------------------------
+def parse_size(spec):
+    clusters, workers, vlans, ipclaims = (int(v) for v in spec.split(":"))
+    return {"clusters": clusters, "workers": workers, "vlans": vlans, "ipclaims": ipclaims}
+
+def cluster_names(size):
+    """The management cluster plus N-1 workload clusters (the sites)."""
+    return ["mgmt"] + [f"site{i}" for i in range(1, size["clusters"])]
+
+def network_names(size):
+    return [f"net{i}" for i in range(1, size["vlans"] + 1)]
+
+def ipclaim_targets(size):
+    """(network, site) for every IPClaim, spread round robin over the networks and sites."""
+    networks, sites = network_names(size), cluster_names(size)[1:] or ["mgmt"]
+    return [(networks[i % len(networks)], sites[i // len(networks) % len(sites)]) for i in range(size["ipclaims"])]
+
+def manifest(path, docs):
+    with open(path, "w") as f:
+        yaml.safe_dump_all(docs, f, sort_keys=False)
+
+def vlan_index(size):
+    return {
+        "apiVersion": "vlan.be.kuid.dev/v1alpha1", "kind": "VLANIndex", "metadata": {"name": "5g"},
+        "spec": {"minID": VLAN_MIN, "maxID": VLAN_MIN + size["vlans"] - 1},
+    }
+
+def vlan_claims(size):
+    return [{
+        "apiVersion": "vlan.be.kuid.dev/v1alpha1", "kind": "VLANClaim",
+        "metadata": {"name": net, "labels": {"nephio.org/network-name": net}},
+        "spec": {"index": "5g", "labels": {"nephio.org/network-name": net}},
+    } for net in network_names(size)]
+
+def ip_claims(size):
+    return [{
+        "apiVersion": "ipam.be.kuid.dev/v1alpha1", "kind": "IPClaim",
+        "metadata": {"name": f"5g.{net}-{site}-rt-{i}", "labels": {"nephio.org/network-name": net}},
+        "spec": {"index": f"5g.{net}",
+                 "selector": {"matchLabels": {"nephio.org/network-name": net, "nephio.org/site": site}}},
+    } for i, (net, site) in enumerate(ipclaim_targets(size))]
+
+def prepare_workdir(workdir, size):
+    """Kind configs for the topology, generated network-plan manifests, the rest linked from the repo."""
+    os.makedirs(os.path.join(workdir, "infra-kind"))
+    for cluster in cluster_names(size):
+        manifest(os.path.join(workdir, "infra-kind", f"{cluster}-cluster.yaml"), [{
+            "kind": "Cluster", "apiVersion": "kind.x-k8s.io/v1alpha4", "name": cluster,
+            "nodes": [{"role": "control-plane"}] + [{"role": "worker"}] * size["workers"],
+        }])
+    os.symlink(os.path.join(POC_DIR, "infra-kind", "multus-daemonset-thick.yml"),
+               os.path.join(workdir, "infra-kind", "multus-daemonset-thick.yml"))
+    for name in ("infra-kubenet", "clab-topo.gotmpl"):
+        os.symlink(os.path.join(POC_DIR, name), os.path.join(workdir, name))
+
+    plan = os.path.join(workdir, "network-plan")
+    os.makedirs(plan)
+    for name in ("discovery.yaml", "inventory.yaml"):
+        os.symlink(os.path.join(POC_DIR, "network-plan", name), os.path.join(plan, name))
+    networks = network_names(size)
+    sites = cluster_names(size)[1:]
+    manifest(os.path.join(plan, "vlan-indicies.yaml"), [vlan_index(size)])
+    manifest(os.path.join(plan, "dynamic-vlan.yaml"), vlan_claims(size))
+    manifest(os.path.join(plan, "ipindex.yaml"), [{
+        "apiVersion": "ipam.be.kuid.dev/v1alpha1", "kind": "IPIndex", "metadata": {"name": f"5g.{net}"},
+        "spec": {"prefixes": [{"prefix": f"10.{i // 250}.{i % 250}.0/24"}]},
+    } for i, net in enumerate(networks)])
+    manifest(os.path.join(plan, "network-config.yaml"), [{
+        "apiVersion": "network.app.kuid.dev/v1alpha1", "kind": "NetworkConfig", "metadata": {"name": f"5g.{net}"},
+        "spec": {"topology": "5g", "prefixes": [{"prefix": f"172.{i % 250}.{j}.0/24"} for j, _ in enumerate(sites)]},
+    } for i, net in enumerate(networks)])
+    manifest(os.path.join(plan, "ipclaim-vpcs.yaml"), ip_claims(size))
+
+def seed_state(scenario, state_dir, size):
+    """Shim state a scenario starts from: nothing for create, clusters and/or claims otherwise."""
+    clusters = {c: size["workers"] for c in cluster_names(size)}
+    objects = []
+    if scenario == "gen-crs":
+        objects = vlan_claims(size) + ip_claims(size)
+        for vlan, claim in enumerate(objects[:size["vlans"]], VLAN_MIN):
+            claim["status"] = {"id": vlan}
+        for n, claim in enumerate(objects[size["vlans"]:]):
+            claim["status"] = {"address": f"10.{n // 250 % 250}.{n % 250}.1/24"}
+    elif scenario == "vlan-interfaces":
+        index = vlan_index(size)
+        index["status"] = {"minID": index["spec"]["minID"], "maxID": index["spec"]["maxID"]}
+        objects = [index]
+    shims.seed(state_dir, clusters={} if scenario == "create" else clusters, objects=objects)
+
+# ----------------------------
+# CHILD (one scenario, in its own process)
+# ----------------------------
+def run_child(scenario, size, result_file):
+    """Load infra-manager.py for the topology, run one scenario and write its measurements."""
+    spawned = []
+    popen_init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        spawned.append(1)
+        popen_init(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counting_init
+
+    spec = importlib.util.spec_from_file_location("infra_manager", SCRIPT)
+    im = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(im)
+    # Replaced in place: default arguments (e.g. of create_vlan_interfaces) hold the original dicts
+    clusters = cluster_names(size)
+    for table, values in (
+        (im.CLUSTERS_YAML, {c: f"infra-kind/{c}-cluster.yaml" for c in clusters}),
+        (im.NETWORKS, {c: "172.21.76.0/24:kind" for c in clusters}),
+        (im.ENDPOINT_BASE, {c: f"e1-{i}" for i, c in enumerate(clusters[1:], 1)}),
+    ):
+        table.clear()
+        table.update(values)
+
+    actions = {
+        "create": lambda: im.create_infra(workers=len(clusters)),
+        "network-plan": lambda: im.create_network_plan(),
+        "gen-crs": lambda: im.generate_network_crs(),
+        "vlan-interfaces": lambda: im.create_vlan_interfaces(im.CLUSTERS_YAML),
+        "destroy": lambda: im.destroy_infra(workers=len(clusters)),
+    }
+    error = None
+    start = time.perf_counter()
+    try:
+        actions[scenario]()
+    except (Exception, SystemExit) as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    wall = time.perf_counter() - start
+
+    with open(result_file, "w") as f:
+        json.dump({
+            "wall": wall,
+            "subprocesses": len(spawned),
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "threads": threading.active_count(),
+            "error": error,
+        }, f)
+
+# ----------------------------
+# RUNNER
+# ----------------------------
+def make_shim_bin(path):
+    os.makedirs(path)
+    for tool in TOOLS:
+        os.symlink(os.path.join(BENCH_DIR, "shims.py"), os.path.join(path, tool))
+
+def run_scenario(scenario, size, args):
+    """Run one scenario in a fresh child process; returns its measurements."""
+    root = tempfile.mkdtemp(prefix=f"infra-bench-{scenario}-")
+    workdir, state_dir = os.path.join(root, "work"), os.path.join(root, "state")
+    prepare_workdir(workdir, size)
+    seed_state(scenario, state_dir, size)
+    make_shim_bin(os.path.join(root, "bin"))
+
+    env = dict(
+        os.environ,
+        PATH=os.path.join(root, "bin") + os.pathsep + os.environ.get("PATH", ""),
+        SHIM_STATE=state_dir,
+        SHIM_LATENCY=str(args.latency),
+        SHIM_READY_DELAY=str(args.ready_delay),
+        INFRA_NO_SESSION="1",  # the shims stand in for the CLIs, not for the API servers
+        INFRA_CACHE_DIR=os.path.join(root, "cache"),
+    )
+    for item in args.latency_for:
+        op, _, seconds = item.partition("=")
+        env[f"SHIM_LATENCY_{op.upper()}"] = seconds
+
+    result_file = os.path.join(root, "result.json")
+    with open(os.path.join(root, "output.log"), "w") as out:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", scenario,
+             "--size", ":".join(str(size[k]) for k in ("clusters", "workers", "vlans", "ipclaims")),
+             "--result", result_file],
+            cwd=workdir, env=env, stdout=out, stderr=subprocess.STDOUT, timeout=args.timeout,
+        )
+    try:
+        with open(result_file) as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        result = {"error": f"no result, see {root}/output.log"}
+    try:
+        with open(os.path.join(state_dir, "calls.log")) as f:
+            result["tool_calls"] = sum(1 for _ in f)
+    except OSError:
+        result["tool_calls"] = 0
+
+    if args.keep or result.get("error"):
+        result["dir"] = root
+    else:
+        shutil.rmtree(root, ignore_errors=True)
+    return dict(result, scenario=scenario, **size)
+
+def print_table(results):
+    header = f"{'scenario':<16} {'N':>3} {'M':>3} {'K':>5} {'P':>6} {'wall':>8} {'subproc':>8} {'tools':>7} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r.get("wall") is None:
+            print(f"{r['scenario']:<16} {r['clusters']:>3} {r['workers']:>3} {r['vlans']:>5} {r['ipclaims']:>6}  "
+                  f"failed: {r['error']}")
+            continue
+        print(f"{r['scenario']:<16} {r['clusters']:>3} {r['workers']:>3} {r['vlans']:>5} {r['ipclaims']:>6} "
+              f"{r['wall']:>7.2f}s {r['subprocesses']:>8} {r['tool_calls']:>7} {r['peak_rss_mb']:>8.1f}"
+              + (f"  ({r['error']})" if r.get("error") else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma separated N:M:K:P (clusters incl. mgmt : workers per cluster : VLANs : IPClaims)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every tool call")
+    parser.add_argument("--latency-for", action="append", default=[], metavar="OP=SECONDS",
+                        help="latency of one operation, e.g. kind_create=2 (see shims.py)")
+    parser.add_argument("--ready-delay", type=float, default=0.0, help="seconds before new objects report Ready")
+    parser.add_argument("--timeout", type=float, default=900, help="seconds per scenario run")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    parser.add_argument("--keep", action="store_true", help="keep the working directories")
+    parser.add_argument("--force", action="store_true", help="run `create`/`destroy` even if /tmp/vars.json exists")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, parse_size(args.size), args.result)
+        return
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    touching = [s for s in ("create", "destroy") if s in scenarios]
+    if touching and os.path.exists("/tmp/vars.json") and not args.force:
+        parser.error(f"/tmp/vars.json exists (is a lab up?); `{touching[0]}` would replace it, use --force to run anyway")
+
+    results = []
+    for spec in args.sizes.split(","):
+        size = parse_size(spec)
+        for scenario in scenarios:
+            print(f"running {scenario} {spec} ...", file=sys.stderr, flush=True)
+            results.append(run_scenario(scenario, size, args))
+    if "create" in scenarios:
+        with contextlib.suppress(OSError):
+            os.remove("/tmp/vars.json")
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
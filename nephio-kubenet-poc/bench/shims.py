@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for kind, kubectl, docker, containerlab, curl, sudo, sysctl and ip.
+
+bench.py links every tool name to this file; the tool is picked from argv[0].
+All tools share one JSON state file (clusters, docker networks, kube objects,
+node labels) in $SHIM_STATE, the VLAN links of every node are kept in a file
+per node, and every call is appended to $SHIM_STATE/calls.log.
+
+Latency is injected with SHIM_LATENCY (seconds, every call) and overridden per
+operation with SHIM_LATENCY_<OP>, e.g. SHIM_LATENCY_KIND_CREATE=2. Operations:
+kind_create, kind_delete, kind_load, kubectl_get, kubectl_apply, docker_exec,
+docker_pull, containerlab, curl.
+
+Files a `docker exec ... sh -s` script writes below /etc of a node end up in
+$SHIM_STATE/nodes/<node>/etc instead.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import sys
+import time
+
+# yaml and tarfile are imported where needed: every tool call is a new process,
+# and most of them (ip, docker exec, kubectl get) should start fast
+
+STATE = os.environ.get("SHIM_STATE", "/tmp/shim-state")
+
+# ----------------------------
+# STATE
+# ----------------------------
+def empty_state():
+    return {"clusters": {}, "networks": {}, "containers": {}, "images": [], "objects": {}, "labels": {},
+            "current": {}, "attached": {}, "seq": {"vlan": 1, "ip": 0}}
+
+@contextlib.contextmanager
+def state(name="state", default=empty_state):
+    """Load a state file under an exclusive lock and write it back afterwards."""
+    os.makedirs(STATE, exist_ok=True)
+    path = os.path.join(STATE, f"{name}.json")
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                st = json.load(f)
+        except (OSError, ValueError):
+            st = default()
+        yield st
+        with open(path, "w") as f:
+            json.dump(st, f)
+
+def seed(state_dir, clusters=None, objects=(), cluster="mgmt"):
+    """
+    Pre-load state: clusters is {name: worker count}, objects are kube objects
+    (with status) stored in `cluster`. Existing state is replaced.
+    """
+    st = empty_state()
+    for name, workers in (clusters or {}).items():
+        st["clusters"][name] = node_names(name, workers)
+    for obj in objects:
+        obj = dict(obj, cluster=cluster, created=0)
+        st["objects"][object_key(cluster, obj)] = obj
+    st["current"][kubeconfig()] = f"kind-{cluster}"
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, "state.json"), "w") as f:
+        json.dump(st, f)
+
+def node_names(cluster, workers):
+    return [f"{cluster}-control-plane"] + [f"{cluster}-worker" + (str(i) if i > 1 else "") for i in range(1, workers + 1)]
+
+def object_key(cluster, obj):
+    return f"{cluster}/{obj['kind']}/{obj['metadata']['name']}"
+
+# ----------------------------
+# HELPERS
+# ----------------------------
+def latency(op="default"):
+    seconds = float(os.environ.get(f"SHIM_LATENCY_{op.upper()}", os.environ.get("SHIM_LATENCY", "0")))
+    if seconds:
+        time.sleep(seconds)
+
+def record(tool, argv):
+    os.makedirs(STATE, exist_ok=True)
+    with open(os.path.join(STATE, "calls.log"), "a") as f:
+        f.write(json.dumps([tool] + argv) + "\n")
+
+def opt(argv, *names, default=None):
+    """Value of an option given as `--name value` or `--name=value`."""
+    for i, arg in enumerate(argv):
+        for name in names:
+            if arg == name and i + 1 < len(argv):
+                return argv[i + 1]
+            if arg.startswith(name + "="):
+                return arg.split("=", 1)[1]
+    return default
+
+def fail(msg, code=1):
+    print(msg, file=sys.stderr)
+    sys.exit(code)
+
+# ----------------------------
+# KIND
+# ----------------------------
+def kind(argv):
+    if argv[:2] == ["get", "clusters"]:
+        with state() as st:
+            print("\n".join(sorted(st["clusters"])))
+    elif argv[:2] == ["get", "nodes"]:
+        with state() as st:
+            print("\n".join(st["clusters"].get(opt(argv, "--name"), [])))
+    elif argv[:2] == ["create", "cluster"]:
+        import yaml
+        name = opt(argv, "--name")
+        with open(opt(argv, "--config")) as f:
+            config = yaml.safe_load(f)
+        latency("kind_create")
+        if name in os.environ.get("SHIM_FAIL_CLUSTERS", "").split(","):
+            fail(f"ERROR: failed to create cluster {name}")
+        workers = sum(1 for n in config["nodes"] if n["role"] != "control-plane")
+        with state() as st:
+            st["clusters"][name] = node_names(name, workers)
+            st["current"][kubeconfig()] = f"kind-{name}"
+        print(f"Creating cluster \"{name}\" ...")
+    elif argv[:2] == ["delete", "cluster"]:
+        name = opt(argv, "--name")
+        latency("kind_delete")
+        with state() as st:
+            st["clusters"].pop(name, None)
+        print(f"Deleting cluster \"{name}\" ...")
+    elif argv[:2] == ["load", "docker-image"]:
+        latency("kind_load")
+        with state() as st:
+            images = [a for i, a in enumerate(argv[2:], 2) if not a.startswith("-") and argv[i - 1] != "--name"]
+            missing = [image for image in images if image not in st["images"]]
+        if missing:
+            fail(f"ERROR: image: \"{missing[0]}\" not present locally")
+    else:
+        latency()
+
+# ----------------------------
+# KUBECTL
+# ----------------------------
+PLURALS = {"VLANIndex": "vlanindices", "IPIndex": "ipindices"}
+
+def resource_matches(resource, obj):
+    plural = resource.split(".")[0].split("/")[0]
+    return plural in (PLURALS.get(obj["kind"], obj["kind"].lower() + "s"), obj["kind"].lower())
+
+def selector_matches(labels, selector):
+    for part in (selector or "").split(","):
+        part = part.strip().strip("'")
+        if not part:
+            continue
+        if part.startswith("!"):
+            if part[1:] in labels:
+                return False
+        elif "=" in part:
+            key, value = part.split("=", 1)
+            if labels.get(key) != value:
+                return False
+        elif part not in labels:
+            return False
+    return True
+
+def node_object(name, labels):
+    meta = {"name": name, "labels": {"kubernetes.io/hostname": name, **labels}}
+    if name.endswith("control-plane"):
+        meta["labels"]["node-role.kubernetes.io/control-plane"] = ""
+    return {"kind": "Node", "metadata": meta, "status": {"conditions": [{"type": "Ready", "status": "True"}]}}
+
+POD = {"kind": "Pod", "metadata": {"name": "kuid-server-0", "namespace": "kuid-system"},
+       "status": {"phase": "Running", "containerStatuses": [{"ready": True}]}}
+
+def ready_status(obj, st):
+    """Status a controller would eventually set: Ready, plus allocated IDs/addresses."""
+    status = {"conditions": [{"type": "Ready", "status": "True"}]}
+    if obj["kind"] == "VLANIndex":
+        status.update(minID=obj["spec"]["minID"], maxID=obj["spec"]["maxID"])
+    elif obj["kind"] == "VLANClaim":
+        st["seq"]["vlan"] += 1
+        status["id"] = st["seq"]["vlan"]
+    elif obj["kind"] == "IPClaim":
+        st["seq"]["ip"] += 1
+        n = st["seq"]["ip"]
+        status["address"] = f"10.{n // 250 % 250}.{n % 250}.1/24"
+    return status
+
+def children(obj):
+    """Objects the real controllers create for obj."""
+    kind, name = obj["kind"], obj["metadata"]["name"]
+    if kind == "DiscoveryRule":
+        return [{"kind": "Target", "metadata": {"name": "leaf"}, "spec": {}}]
+    if kind == "Topology":
+        return [{"kind": "Node", "metadata": {"name": f"{name}.region1.site1.leaf"}, "spec": {}}]
+    if kind == "NetworkConfig":
+        return [{"kind": "IPClaim", "metadata": {"name": f"{name}.{p['prefix'].replace('/', '-')}"},
+                 "spec": {"prefix": p["prefix"]}} for p in obj["spec"].get("prefixes", [])]
+    if kind == "Network":
+        return [{"kind": "Config", "metadata": {"name": f"{name}.leaf",
+                 "ownerReferences": [{"kind": "Network", "name": name}]}, "spec": {}}]
+    return []
+
+def view(obj, now):
+    """obj as seen at time now: not Ready until SHIM_READY_DELAY seconds after it was created."""
+    delay = float(os.environ.get("SHIM_READY_DELAY", "0"))
+    if delay and now - obj.get("created", 0) < delay and "conditions" in obj.get("status", {}):
+        obj = json.loads(json.dumps(obj))
+        obj["status"]["conditions"] = [{"type": "Ready", "status": "False", "reason": "Progressing"}]
+    return obj
+
+def kubectl_get(argv, cluster):
+    latency("kubectl_get")
+    resource = argv[1]
+    name = argv[2] if len(argv) > 2 and not argv[2].startswith("-") else None
+    with state() as st:
+        if resource == "nodes":
+            if cluster not in st["clusters"]:
+                fail(f"error: context kind-{cluster} does not exist")
+            items = [node_object(n, st["labels"].get(n, {})) for n in st["clusters"][cluster]]
+        elif resource == "pods":
+            items = [POD]
+        else:
+            items = [o for o in st["objects"].values() if o["cluster"] == cluster and resource_matches(resource, o)]
+    items = [i for i in items if selector_matches(i["metadata"].get("labels", {}), opt(argv, "-l", "--selector"))]
+    if name:
+        items = [i for i in items if i["metadata"]["name"] == name]
+        if not items:
+            fail(f'Error from server (NotFound): {resource} "{name}" not found')
+
+    now = time.time()
+    if "--watch" not in argv:
+        items = [view(i, now) for i in items]
+        print(json.dumps(items[0] if name else {"kind": "List", "items": items}))
+        return
+    for item in items:
+        print(json.dumps({"type": "ADDED", "object": view(item, now)}, indent=4))
+    sys.stdout.flush()
+    delay = float(os.environ.get("SHIM_READY_DELAY", "0"))
+    if delay:
+        time.sleep(max(0, max([i.get("created", 0) for i in items] or [now]) + delay - time.time()))
+        for item in items:
+            print(json.dumps({"type": "MODIFIED", "object": item}, indent=4))
+        sys.stdout.flush()
+    time.sleep(float(os.environ.get("SHIM_WATCH_HOLD", "30")))
+
+def kubectl_apply(argv, cluster):
+    import yaml
+    latency("kubectl_apply")
+    path = opt(argv, "-f", "--filename")
+    if path == "-":
+        data = sys.stdin.read()
+    else:
+        with open(path) as f:
+            data = f.read()
+    now = time.time()
+    with state() as st:
+        for doc in yaml.safe_load_all(data):
+            if not doc or "metadata" not in doc:
+                continue
+            doc = dict(doc, cluster=cluster)
+            key = object_key(cluster, doc)
+            previous = st["objects"].get(key)
+            doc["status"] = previous["status"] if previous else ready_status(doc, st)
+            doc["created"] = previous["created"] if previous else now
+            st["objects"][key] = doc
+            print(f"{doc['kind'].lower()}/{doc['metadata']['name']} {'configured' if previous else 'created'}")
+            for child in children(doc):
+                child = dict(child, cluster=cluster, created=now)
+                child["metadata"].setdefault("labels", {})
+                if object_key(cluster, child) not in st["objects"]:
+                    child["status"] = ready_status(child, st)
+                    st["objects"][object_key(cluster, child)] = child
+
+def kubeconfig():
+    """Key of the current context: every kubeconfig file has its own."""
+    return os.environ.get("KUBECONFIG", "")
+
+def kubectl(argv):
+    context = opt(argv, "--context")
+    if argv[:2] == ["config", "use-context"]:
+        with state() as st:
+            st["current"][kubeconfig()] = argv[2]
+        return
+    if not context:
+        with state() as st:
+            context = st["current"].get(kubeconfig()) or "kind-mgmt"
+    cluster = context[len("kind-"):]
+
+    verb = argv[0] if argv else ""
+    if verb == "get":
+        kubectl_get(argv, cluster)
+    elif verb in ("apply", "create"):
+        kubectl_apply(argv, cluster)
+    elif verb == "label":
+        latency()
+        positional = [a for a in argv[1:] if not a.startswith("-") and a != context]
+        key, _, value = next(a for a in positional if "=" in a).partition("=")
+        with state() as st:
+            for arg in positional:
+                if "=" not in arg and arg not in ("node", "nodes"):
+                    st["labels"].setdefault(arg.split("/", 1)[-1], {})[key] = value
+    else:
+        latency()
+
+# ----------------------------
+# DOCKER
+# ----------------------------
+def docker(argv):
+    verb = argv[0] if argv else ""
+    if verb == "network":
+        sub, name = argv[1], argv[-1]
+        latency()
+        with state() as st:
+            if sub == "inspect":
+                if name not in st["networks"]:
+                    fail(f"Error response from daemon: network {name} not found")
+                print(json.dumps([{"Name": name, "IPAM": {"Config": [{"Subnet": st["networks"][name]}]}}]))
+            elif sub == "create":
+                st["networks"][name] = opt(argv, "--subnet", default="")
+            elif sub == "rm":
+                st["networks"].pop(name, None)
+            elif sub == "connect":
+                st["attached"].setdefault(name, ["kind"]).append(argv[2])
+            elif sub == "disconnect":
+                st["attached"][name] = [n for n in st["attached"].get(name, ["kind"]) if n != argv[2]]
+    elif verb == "exec":
+        latency("docker_exec")
+        args = argv[1:]
+        while args and args[0].startswith("-"):
+            args = args[1:]
+        node, cmd = args[0], args[1:]
+        env = dict(os.environ, SHIM_NODE=node)
+        if cmd == ["sh", "-s"]:
+            # Keep the node's files (e.g. containerd hosts.toml) out of the host's /etc
+            root = os.path.join(STATE, "nodes", node)
+            cmd = ["sh", "-c", sys.stdin.read().replace(" /etc/", f" {root}/etc/")]
+        # Run the command on this host; `ip` resolves to this shim and works on the node's links
+        os.execvpe(cmd[0], cmd, env)
+    elif verb in ("run", "create", "start", "rm", "inspect"):
+        latency()
+        name = opt(argv, "--name") if verb in ("run", "create") else argv[-1]
+        with state() as st:
+            cluster = next((a.split("=", 1)[1] for a in argv if a.startswith("io.x-k8s.kind.cluster=")), None)
+            if cluster:
+                # A kind node re-created from a snapshot
+                st["clusters"].setdefault(cluster, []).append(name)
+            if verb in ("run", "create", "start"):
+                st["containers"][name] = "running"
+                if opt(argv, "--network"):
+                    st["attached"][name] = [opt(argv, "--network")]
+            elif verb == "rm":
+                for name in [a for a in argv[1:] if not a.startswith("-")]:
+                    st["containers"].pop(name, None)
+            elif name in st["containers"] or any(name in nodes for nodes in st["clusters"].values()):
+                cluster = next((c for c, nodes in st["clusters"].items() if name in nodes), None)
+                print(json.dumps([{
+                    "Name": f"/{name}", "State": {"Status": st["containers"].get(name, "running")},
+                    "Config": {"Hostname": name, "Labels": {"io.x-k8s.kind.cluster": cluster} if cluster else {}},
+                    "NetworkSettings": {"Networks": {n: {"IPAddress": "172.21.76.2"} for n in st["attached"].get(name, ["kind"])}},
+                    "HostConfig": {"PortBindings": {}},
+                }]))
+            else:
+                fail(f"Error: No such object: {name}")
+    elif verb == "ps":
+        latency()
+        with state() as st:
+            nodes = {n: "running" for nodes in st["clusters"].values() for n in nodes}
+            for name, status in {**nodes, **st["containers"]}.items():
+                print(f"{name}\t{status}")
+    elif verb == "pull":
+        latency("docker_pull")
+        with state() as st:
+            st["images"] = sorted(set(st["images"]) | {argv[-1]})
+    elif argv[:2] == ["image", "inspect"]:
+        latency()
+        with state() as st:
+            if argv[2] not in st["images"]:
+                fail(f"Error: No such image: {argv[2]}")
+    else:
+        latency()
+
+# ----------------------------
+# CONTAINERLAB
+# ----------------------------
+def containerlab(argv):
+    """deploy/destroy start/remove the SR Linux containers (net-<lab>-<node>) of the vars file."""
+    latency("containerlab")
+    try:
+        with open(opt(argv, "--vars")) as f:
+            fabric = json.load(f)
+    except (OSError, TypeError, ValueError):
+        return
+    names = [f"net-{fabric.get('name', '5g')}-{node}" for node in fabric.get("leafs", []) + fabric.get("spines", [])]
+    with state() as st:
+        for name in names:
+            if argv[:1] == ["deploy"]:
+                st["containers"][name] = "running"
+            elif argv[:1] == ["destroy"]:
+                st["containers"].pop(name, None)
+
+# ----------------------------
+# IP (per-node VLAN links)
+# ----------------------------
+def ip(argv):
+    node = os.environ.get("SHIM_NODE", "host")
+    opts = []
+    while argv and argv[0].startswith("-"):
+        opts.append(argv.pop(0))
+        if opts[-1] == "-batch":
+            opts.append(argv.pop(0))
+    failed = False
+    with state(f"links-{node}", dict) as links:
+        if "-batch" not in opts:
+            ip_command(links, argv, "-j" in opts)
+            return
+        # One command per line; -force keeps going after a failed one
+        for line in sys.stdin.read().splitlines():
+            try:
+                ip_command(links, line.split(), "-j" in opts)
+            except SystemExit:
+                failed = True
+                if "-force" not in opts:
+                    break
+    if failed:
+        sys.exit(1)
+
+def ip_command(links, argv, as_json):
+    if argv[:2] == ["link", "show"]:
+        if len(argv) > 2:
+            if argv[2] not in links:
+                fail(f'Device "{argv[2]}" does not exist.')
+            print(argv[2])
+            return
+        found = [{"ifname": "lo"}, {"ifname": "eth0"}, {"ifname": "eth1"}] + [
+            {"ifname": n, "link": "eth1", "flags": ["BROADCAST", "MULTICAST"] + (["UP", "LOWER_UP"] if up else []),
+             "operstate": "UP" if up else "DOWN"} for n, up in links.items()
+        ]
+        print(json.dumps(found) if as_json else "\n".join(f["ifname"] for f in found))
+    elif argv[:2] == ["link", "add"]:
+        name = argv[argv.index("name") + 1]
+        if name in links:
+            fail("RTNETLINK answers: File exists", 2)
+        links[name] = False
+    elif argv[:2] == ["link", "set"]:
+        name = argv[3] if argv[2] == "up" else argv[2]
+        if name not in links:
+            fail(f'Cannot find device "{name}"')
+        links[name] = "up" in argv[2:]
+    elif argv[:2] in (["link", "del"], ["link", "delete"]):
+        if argv[2] not in links:
+            fail(f'Cannot find device "{argv[2]}"')
+        links.pop(argv[2])
+
+# ----------------------------
+# OTHERS
+# ----------------------------
+def curl(argv):
+    """Serves a small CNI plugins tarball for `-o FILE`; nothing (so no checksum) otherwise."""
+    import io
+    import tarfile
+    latency("curl")
+    out = opt(argv, "-o")
+    if not out:
+        return
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name in ("bridge", "macvlan", "host-local"):
+            data = b"#!/bin/sh\n"
+            info = tarfile.TarInfo(name)
+            info.size, info.mode = len(data), 0o755
+            tar.addfile(info, io.BytesIO(data))
+    with open(out, "wb") as f:
+        f.write(buf.getvalue())
+
+TOOLS = {
+    "kind": kind,
+    "kubectl": kubectl,
+    "docker": docker,
+    "ip": ip,
+    "curl": curl,
+    "containerlab": containerlab,
+}
+
+def main():
+    tool, argv = os.path.basename(sys.argv[0]), sys.argv[1:]
+    record(tool, argv)
+    if tool == "sudo":
+        os.execvp(argv[0], argv)
+    TOOLS.get(tool, lambda argv: latency())(argv)
+
+if __name__ == "__main__":
+    main()
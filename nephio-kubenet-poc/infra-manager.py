@@ -1,11 +1,31 @@
 #!/usr/bin/env python3
 import subprocess
 import sys
+import os
 import time
 import json
-import random
-import ast
-from collections import defaultdict
+import fcntl
+import hashlib
+import shutil
+import tempfile
+import functools
+import contextlib
+import codecs
+import select
+import socket
+import ssl
+import base64
+import atexit
+import http.client
+import urllib.parse
+import calendar
+import ipaddress
+import itertools
+import glob
+import re
+import threading
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     import yaml  # pip install pyyaml
@@ -13,6 +33,10 @@ except ImportError:
     print("[ERROR] Missing dependency: PyYAML. Install with: pip install pyyaml")
     sys.exit(1)
 
+# libyaml's C emitter/parser when PyYAML is built with it (much faster on large CR sets)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # ----------------------------
 # CONFIGURATION
 # ----------------------------
@@ -36,15 +60,141 @@ DEFAULT_NODE = "leaf"
 DEFAULT_REGION = "region1"
 DEFAULT_SITE = "site1"
 ENDPOINT_BASE={"core":"e1-1","regional":"e1-2","edge":"e1-3"}
+SITE_NODES = {}  # site -> leaf its workers are cabled to, when not DEFAULT_NODE
+SITE_ENDPOINTS = {}  # site -> [[leaf, port]] of every worker of the site, from a topology spec
+
+def site_endpoints(site):
+    """The [leaf, port] every worker of a site is cabled to."""
+    return SITE_ENDPOINTS.get(site) or [[SITE_NODES.get(site, DEFAULT_NODE), ENDPOINT_BASE[site]]]
 OUTPUT_CRS_FILE = "network-crs.yaml"
+NETWORK_IDS_FILE = "network-ids.json"  # persisted bridge-domain / routing-table networkIDs
+NETWORK_ID_RANGE = (1, 999)
+SPEC_HASH_ANNOTATION = "infra-manager/spec-hash"  # content hash of a generated CR, compared against the live object
+APPLY_BATCH_SIZE = 200  # Network CRs per `kubectl apply -f -` call; bounds what apply-crs holds in memory
+# Which workers get which VLAN interfaces: "all" puts every wanted VLAN on every worker, "claims" only
+# the VLANs of the networks that have an IPClaim selecting the worker's site (its cluster)
+VLAN_PLACEMENTS = ("all", "claims")
+VLAN_PLACEMENT = os.environ.get("INFRA_VLAN_PLACEMENT", "all")
+
+# CNI plugins installed into every kind node
+CNI_VERSION = "v1.3.0"
+CNI_ARCH = "amd64"
+CNI_URL = "https://github.com/containernetworking/plugins/releases/download/{version}/cni-plugins-linux-{arch}-{version}.tgz"
+CNI_SHA256 = None  # optional pin; by default the checksum published next to the release is used
+
+# Local artifact cache (downloads are content-addressed by sha256)
+CACHE_DIR = os.path.expanduser(os.environ.get("INFRA_CACHE_DIR", "~/.cache/infra-manager"))
+
+# Host limits kind needs; `create` only raises the ones below these values
+SYSCTLS = {
+    "fs.inotify.max_user_watches": 524288,
+    "fs.inotify.max_user_instances": 512,
+    "kernel.keys.maxkeys": 500000,
+    "kernel.keys.maxbytes": 1000000,
+}
+
+# Kubenet components applied to the mgmt cluster, in order. The sha256 of every
+# applied manifest is recorded in a ConfigMap, so `create` re-applies only changed ones.
+KUBENET_MANIFESTS = [
+    "infra-kubenet/pkgserver.yaml",
+    "infra-kubenet/sdc.yaml",
+    "infra-kubenet/kuid-server.yaml",
+    "infra-kubenet/kuid-nokia-srl.yaml",
+    "infra-kubenet/kuidapps.yaml",
+]
+MANIFEST_STATE = ("kube-system", "infra-manager-manifests")
+
+# Number of kind clusters brought up concurrently by `create` (1 = sequential)
+CREATE_WORKERS = len(CLUSTERS_YAML)
+
+# Leaf/spine fabric the workers are cabled to in clab-topo.gotmpl. Workers fill
+# the ports of one leaf before the next; the last SPINES ports of every leaf are
+# uplinks to the spines.
+LEAFS = 1
+SPINES = 0
+LEAF_PORTS = 34  # e1-1 .. e1-34 on an ixr-d3
+
+# Declarative topologies (--topology FILE) are rendered below TOPOLOGY_DIR;
+# PLAN_DIR then points at the rendered network-plan manifests.
+PLAN_DIR = "network-plan"
+TOPOLOGY_DIR = ".topology"
+KIND_NODE_IMAGE = "kindest/node:v1.33.2"
+SRL_IMAGE = "ghcr.io/nokia/srlinux:24.3.2-118"
+VARS_FILE = "/tmp/vars.json"  # containerlab vars of the running lab
+
+# Several labs can run side by side on one host (--lab ID): each one gets its ID on
+# every host-global name (kind clusters, bridges, containerlab lab), its state files
+# in LAB_DIR/<ID>/ and a slot 1..LAB_MAX of the bridge subnets and CIDR pools below.
+LAB_ID = None
+LAB_DIR = ".labs"
+LAB_MAX = 16
+LAB_POD_POOL = "100.64.0.0/10"      # a /14 per lab, a /20 per cluster
+LAB_SERVICE_POOL = "10.224.0.0/12"  # a /16 per lab, a /22 per cluster
+
+# Pull-through registry mirrors on the kind network; every node's containerd pulls through them
+REGISTRY_IMAGE = "registry:2"
+REGISTRY_MIRRORS = {"docker.io": "https://registry-1.docker.io", "ghcr.io": "https://ghcr.io"}
+# Workload images bulk-loaded into the clusters with `kind load` ("*" = every cluster)
+PRELOAD_MANIFESTS = {"*": ["infra-kind/multus-daemonset-thick.yml"], "mgmt": ["infra-kubenet/*.yaml"]}
+
+# Lab snapshots (`snapshot` / `restore`): committed node images plus these CRs of the mgmt cluster
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+SNAPSHOT_RESOURCES = [
+    "targets.inv.sdcio.dev", "nodes.infra.be.kuid.dev",
+    "vlanindices.vlan.be.kuid.dev", "vlanclaims.vlan.be.kuid.dev",
+    "ipindices.ipam.be.kuid.dev", "networkconfigs.network.app.kuid.dev",
+    "ipclaims.ipam.be.kuid.dev", "networks.network.app.kuid.dev",
+]
+
+class InfraError(Exception):
+    """Raised when one or more orchestration tasks failed."""
+
+    def __init__(self, msg, failures=None):
+        super().__init__(msg)
+        self.failures = failures or {}
 
 # ----------------------------
 # HELPERS
 # ----------------------------
-def run(cmd, check=True, capture=False):
+# Per-thread log prefix, so output of concurrent tasks can be told apart
+_log_ctx = threading.local()
+_print_lock = threading.Lock()
+
+def _emit(line):
+    with _print_lock:
+        print(line, flush=True)
+
+def run(cmd, check=True, capture=False, input=None):
+    with span(cmd, "cmd") as info:
+        try:
+            result = _run(cmd, check, capture, input)
+        except subprocess.CalledProcessError as exc:
+            info["exit"] = exc.returncode
+            raise
+        info["exit"] = 0 if capture else result.returncode
+        return result
+
+def _run(cmd, check, capture, input):
     if capture:
-        return subprocess.check_output(cmd, shell=True, text=True).strip()
-    return subprocess.run(cmd, shell=True, check=check)
+        return subprocess.check_output(cmd, shell=True, text=True, input=input).strip()
+    prefix = getattr(_log_ctx, "prefix", None)
+    if not prefix:
+        return subprocess.run(cmd, shell=True, check=check, text=True, input=input)
+
+    # Inside a concurrent task: stream the command output line by line with the task prefix
+    proc = subprocess.Popen(
+        cmd, shell=True, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        stdin=subprocess.PIPE if input is not None else None,
+    )
+    if input is not None:
+        proc.stdin.write(input)
+        proc.stdin.close()
+    for line in proc.stdout:
+        _emit(f"[{prefix}] {line.rstrip()}")
+    returncode = proc.wait()
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return subprocess.CompletedProcess(cmd, returncode)
 
 def log(level, msg):
     colors = {
@@ -55,19 +205,1089 @@ def log(level, msg):
     }
     color = colors.get(level, "")
     reset = "\033[0m"
-    print(f"{color}[{level}]{reset} {msg}")
+    prefix = getattr(_log_ctx, "prefix", None)
+    tag = f"[{prefix}] " if prefix else ""
+    _emit(f"{color}[{level}]{reset} {tag}{msg}")
+
+def kube_context(cluster):
+    return f"kind-{kind_name(cluster)}"
+
+def batched(items, size):
+    """Yield lists of up to `size` items, consuming the iterable lazily."""
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+def run_parallel(func, items, workers=None, label=str):
+    """
+    Run func(item) for every item on a thread pool, logging under a "[label(item)]" prefix.
+
+    Every task runs to completion even if another one fails, so nothing is
+    abandoned half way. Returns a tuple (results, failures), both dicts keyed by item.
+    """
+    items = list(items)
+    workers = max(1, min(workers or len(items) or 1, len(items) or 1))
+
+    def task(item):
+        _log_ctx.prefix = label(item)
+        try:
+            return func(item)
+        finally:
+            _log_ctx.prefix = None
+
+    results, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                results[item] = future.result()
+            except Exception as exc:
+                failures[item] = exc
+    return results, failures
+
+# ----------------------------
+# TRACING
+# ----------------------------
+# Commands, API requests, readiness waits and orchestration phases are recorded
+# as spans. `create`, `network-plan` and `apply-crs` write them as a Chrome trace
+# (load it in chrome://tracing or https://ui.perfetto.dev) and print a summary
+# table, with the phase timings of the previous run next to the current ones.
+TRACE_FILE = "infra-trace-{command}.json"  # one report per subcommand, so runs compare like with like
+TRACE_TOP_COMMANDS = 10  # slowest commands listed in the summary
+
+_trace_ctx = threading.local()
+_trace_lock = threading.Lock()
+_trace_spans = []
+
+@contextlib.contextmanager
+def span(name, cat="phase", **args):
+    """
+    Record the enclosed block as a span of category cat ("phase", "cmd", "api", "wait").
+
+    Yields the span's args dict, so the block can add details (exit code,
+    retries, ...). An exception leaving the block is recorded as args["error"].
+    """
+    stack = _trace_ctx.__dict__.setdefault("stack", [])
+    record = {
+        "name": name, "cat": cat, "args": args, "start": time.time(),
+        "thread": (threading.get_ident(), getattr(_log_ctx, "prefix", None)),
+    }
+    stack.append(record)
+    try:
+        yield args
+    except BaseException as exc:
+        args.setdefault("error", f"{type(exc).__name__}: {exc}"[:200])
+        raise
+    finally:
+        stack.remove(record)
+        record["end"] = time.time()
+        with _trace_lock:
+            _trace_spans.append(record)
+
+def span_note(**kwargs):
+    """Add details to the innermost open span of the calling thread."""
+    stack = getattr(_trace_ctx, "stack", None)
+    if stack:
+        stack[-1]["args"].update(kwargs)
+
+def _span_label(record):
+    prefix = record["thread"][1]
+    return f"{prefix}/{record['name']}" if prefix and prefix != record["name"] else record["name"]
+
+def _load_trace_phases(path):
+    try:
+        with open(path) as f:
+            return json.load(f).get("otherData", {}).get("phases", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def write_trace(command, path):
+    """Write all spans recorded so far as a Chrome trace; returns {phase label: seconds}."""
+    with _trace_lock:
+        spans = sorted(_trace_spans, key=lambda s: s["start"])
+    origin = spans[0]["start"] if spans else time.time()
+
+    tids, events, phases = {}, [], {}
+    for s in spans:
+        tid = tids.setdefault(s["thread"], len(tids) + 1)
+        events.append({
+            "name": s["name"], "cat": s["cat"], "ph": "X", "pid": 1, "tid": tid,
+            "ts": round((s["start"] - origin) * 1e6), "dur": round((s["end"] - s["start"]) * 1e6),
+            "args": s["args"],
+        })
+        if s["cat"] == "phase":
+            label = _span_label(s)
+            phases[label] = round(phases.get(label, 0) + s["end"] - s["start"], 3)
+    for (_, prefix), tid in tids.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": prefix or "main"}})
+
+    with open(path, "w") as f:
+        json.dump({
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"command": command, "started": origin, "phases": phases},
+        }, f, default=str)
+    return phases
+
+def report_trace(command, path):
+    """Write the trace report and print a timing summary, compared with the previous report at path."""
+    previous = _load_trace_phases(path)
+    try:
+        phases = write_trace(command, path)
+    except OSError as exc:
+        log("WARN", f"Could not write trace report {path}: {exc}")
+        return
+    with _trace_lock:
+        spans = list(_trace_spans)
+
+    log("INFO", f"Timing summary ({path}):")
+    _emit(f"  {'Phase':<44} {'Time':>8} {'Previous':>9}")
+    for label, seconds in phases.items():
+        before = f"{previous[label]:.1f}s" if label in previous else "-"
+        _emit(f"  {label:<44} {seconds:>7.1f}s {before:>9}")
+
+    totals = []
+    for cat, title in (("cmd", "commands"), ("api", "API requests"), ("wait", "waits")):
+        selected = [s for s in spans if s["cat"] == cat]
+        if selected:
+            failed = sum(1 for s in selected if s["args"].get("exit") or s["args"].get("error")
+                         or s["args"].get("ready") is False)
+            busy = sum(s["end"] - s["start"] for s in selected)
+            totals.append(f"{len(selected)} {title} ({busy:.1f}s" + (f", {failed} failed)" if failed else ")"))
+    _emit("  " + ", ".join(totals))
+
+    commands = sorted((s for s in spans if s["cat"] == "cmd"), key=lambda s: s["start"] - s["end"])
+    if commands:
+        _emit("  Slowest commands:")
+        for s in commands[:TRACE_TOP_COMMANDS]:
+            prefix = s["thread"][1]
+            label = (f"[{prefix}] " if prefix else "") + s["name"].replace("\n", " ")
+            label = label if len(label) <= 70 else label[:67] + "..."
+            _emit(f"  {s['end'] - s['start']:>7.1f}s  {label:<70} exit {s['args'].get('exit', '?')}")
+
+@contextlib.contextmanager
+def tracing(command, path=None):
+    """Trace the enclosed subcommand; the report is written when it ends, also when it fails."""
+    path = path or TRACE_FILE.format(command=command)
+    try:
+        with span(command):
+            yield
+    finally:
+        report_trace(command, path)
+
+# ----------------------------
+# API SESSIONS
+# ----------------------------
+# Every kubectl/docker call costs a process start, a kubeconfig parse and (for
+# kubectl) a TLS handshake. Reads, watches, label patches, server-side applies
+# and docker execs go through pooled keep-alive HTTP connections instead: one
+# pool per kind API server and one to the Docker socket. When a session cannot
+# be set up (no kubeconfig, no socket, INFRA_NO_SESSION=1) callers fall back
+# to the CLIs.
+USE_SESSIONS = os.environ.get("INFRA_NO_SESSION") != "1"
+SESSION_POOL_SIZE = 8
+SESSION_TIMEOUT = 30
+
+class ApiError(subprocess.CalledProcessError):
+    """A failed API request. Subclasses CalledProcessError so callers handle it like a failed CLI call."""
+
+    def __init__(self, status, method, path, body=""):
+        super().__init__(status, f"{method} {path}", output=body)
+        self.status = status
+
+    def __str__(self):
+        return f"{self.cmd} failed with status {self.returncode}: {self.output[:200]}"
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=SESSION_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one endpoint, shared between threads."""
+
+    def __init__(self, factory, size=SESSION_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request; returns (status, body bytes). Raises ApiError if the endpoint is unreachable."""
+        with span(f"{method} {path.partition('?')[0]}", "api") as info:
+            status, data, info["retries"] = self._request(method, path, body, headers)
+            info["status"] = status
+            return status, data
+
+    def _request(self, method, path, body, headers):
+        retries = 0
+        while True:
+            with self.lock:
+                conn, reused = (self.idle.pop(), True) if self.idle else (None, False)
+            conn = conn or self.factory()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError) as exc:
+                conn.close()
+                if reused:
+                    retries += 1
+                    continue  # the server closed an idle keep-alive connection; retry on a fresh one
+                raise ApiError(-1, method, path, str(exc))
+
+            if resp.will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    if len(self.idle) < self.size:
+                        self.idle.append(conn)
+                        conn = None
+                if conn:
+                    conn.close()
+            return resp.status, data, retries
+
+def _request_json(pool, method, path, body=None, content_type="application/json", headers=None):
+    headers = {"Accept": "application/json", **(headers or {})}
+    if body is not None:
+        headers["Content-Type"] = content_type
+        body = body if isinstance(body, (bytes, str)) else json.dumps(body)
+    status, data = pool.request(method, path, body=body, headers=headers)
+    if status >= 400:
+        raise ApiError(status, method, path, data.decode(errors="replace"))
+    return json.loads(data) if data.strip() else None
+
+_kubeconfig_cache = {}
+_kube_sessions = {}
+_sessions_lock = threading.Lock()
+_cert_dir = None
+
+def _load_kubeconfig():
+    """The parsed kubeconfig and its mtime (re-read only when the file changes), or (None, None)."""
+    path = os.path.expanduser(os.environ.get("KUBECONFIG", "~/.kube/config").split(os.pathsep)[0])
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None, None
+    cached = _kubeconfig_cache.get(path)
+    if not cached or cached[0] != mtime:
+        with open(path) as f:
+            cached = (mtime, yaml.safe_load(f) or {})
+        _kubeconfig_cache[path] = cached
+    return cached[1], mtime
+
+def _materialize(data_b64, suffix):
+    """Write base64 credential data to a private file (ssl needs paths) and return the path."""
+    global _cert_dir
+    if _cert_dir is None:
+        _cert_dir = tempfile.mkdtemp(prefix="infra-manager-")
+        atexit.register(shutil.rmtree, _cert_dir, True)
+    fd, path = tempfile.mkstemp(dir=_cert_dir, suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(base64.b64decode(data_b64))
+    return path
+
+class KubeSession:
+    """Pooled HTTPS client for the API server of one kubeconfig context."""
+
+    def __init__(self, config, context_name):
+        by_name = lambda kind: {e["name"]: e[kind[:-1]] for e in config.get(kind) or []}
+        context = by_name("contexts")[context_name]
+        cluster = by_name("clusters")[context["cluster"]]
+        user = by_name("users").get(context.get("user"), {})
+        self.namespace = context.get("namespace", "default")
+
+        server = urllib.parse.urlsplit(cluster["server"])
+        tls = ssl.create_default_context(
+            cafile=cluster.get("certificate-authority"),
+            cadata=base64.b64decode(cluster["certificate-authority-data"]).decode()
+            if "certificate-authority-data" in cluster else None,
+        )
+        if cluster.get("insecure-skip-tls-verify"):
+            tls.check_hostname = False
+            tls.verify_mode = ssl.CERT_NONE
+        if "client-certificate-data" in user:
+            tls.load_cert_chain(_materialize(user["client-certificate-data"], ".crt"),
+                                _materialize(user["client-key-data"], ".key"))
+        elif "client-certificate" in user:
+            tls.load_cert_chain(user["client-certificate"], user["client-key"])
+
+        self.host, self.port, self.tls = server.hostname, server.port or 443, tls
+        self.headers = {"Authorization": f"Bearer {user['token']}"} if "token" in user else {}
+        self.pool = ConnectionPool(self._connect)
+        self._resources = {}
+
+    def _connect(self, timeout=SESSION_TIMEOUT):
+        return http.client.HTTPSConnection(self.host, self.port, context=self.tls, timeout=timeout)
+
+    def request(self, method, path, body=None, content_type="application/json"):
+        return _request_json(self.pool, method, path, body, content_type, self.headers)
+
+    def _resource_list(self, group_version):
+        if group_version not in self._resources:
+            base = "/api/v1" if group_version == "v1" else f"/apis/{group_version}"
+            self._resources[group_version] = self.request("GET", base)["resources"]
+        return self._resources[group_version]
+
+    def resource_info(self, resource):
+        """Resolve "pods" / "vlanclaims.vlan.be.kuid.dev" to (base path, plural, namespaced)."""
+        plural, _, group = resource.partition(".")
+        if not group:
+            group_version = "v1"
+        else:
+            key = f"group:{group}"
+            if key not in self._resources:
+                self._resources[key] = self.request("GET", f"/apis/{group}")["preferredVersion"]["groupVersion"]
+            group_version = self._resources[key]
+        for res in self._resource_list(group_version):
+            if res["name"] == plural:
+                base = "/api/v1" if group_version == "v1" else f"/apis/{group_version}"
+                return base, plural, res["namespaced"]
+        raise ApiError(404, "GET", resource, f"resource {resource} not found")
+
+    def _path(self, resource, name=None, namespace=None):
+        base, plural, namespaced = self.resource_info(resource)
+        if namespace in ("--all-namespaces", "-A"):
+            namespace = None
+        else:
+            namespace = (namespace or "").replace("-n ", "").strip() or self.namespace
+        path = base
+        if namespaced and namespace:
+            path += f"/namespaces/{namespace}"
+        path += f"/{plural}"
+        return f"{path}/{name}" if name else path
+
+    def list(self, resource, name=None, namespace=None, selector=None):
+        path = self._path(resource, name, namespace)
+        if name:
+            return [self.request("GET", path)]
+        query = f"?labelSelector={urllib.parse.quote(selector)}" if selector else ""
+        result = self.request("GET", path + query)
+        # Like kubectl, fill in the kind of the items (the API only sets it on the list)
+        for item in result.get("items", []):
+            item.setdefault("apiVersion", result.get("apiVersion"))
+            item.setdefault("kind", result.get("kind", "").removesuffix("List"))
+        return result.get("items", [])
+
+    def watch(self, resource, name=None, namespace=None, selector=None, deadline=None):
+        """
+        Yield watch events ({"type", "object"}) on a dedicated connection until the deadline.
+
+        The server ends the stream at the deadline (timeoutSeconds); yields None then.
+        Raises WatchUnavailable if the stream breaks earlier.
+        """
+        remaining = max(1, int(deadline - time.time()) + 1)
+        params = {"watch": "1", "timeoutSeconds": str(remaining)}
+        if selector:
+            params["labelSelector"] = selector
+        if name:
+            params["fieldSelector"] = f"metadata.name={name}"
+        try:
+            path = f"{self._path(resource, None, namespace)}?{urllib.parse.urlencode(params)}"
+        except ApiError as exc:
+            raise WatchUnavailable(str(exc))  # e.g. the CRD is not installed yet
+
+        conn = self._connect(timeout=remaining + SESSION_TIMEOUT)
+        try:
+            conn.request("GET", path, headers={"Accept": "application/json", **self.headers})
+            resp = conn.getresponse()
+            if resp.status >= 400:
+                raise WatchUnavailable(f"watch {resource}: HTTP {resp.status}")
+            for line in resp:
+                if line.strip():
+                    yield json.loads(line)
+        except (http.client.HTTPException, OSError, ValueError) as exc:
+            raise WatchUnavailable(f"watch {resource}: {exc}")
+        finally:
+            conn.close()
+        if time.time() >= deadline - 1:
+            yield None
+        else:
+            raise WatchUnavailable(f"watch {resource} ended early")
+
+    def apply(self, obj, field_manager="infra-manager"):
+        """Server-side apply of one object (like `kubectl apply --server-side --force-conflicts`)."""
+        group_version = obj["apiVersion"]
+        for res in self._resource_list(group_version):
+            if res["kind"] == obj["kind"] and "/" not in res["name"]:
+                break
+        else:
+            raise ApiError(404, "PATCH", obj["kind"], f"kind {obj['kind']} not served by {group_version}")
+        base = "/api/v1" if group_version == "v1" else f"/apis/{group_version}"
+        namespace = obj["metadata"].get("namespace", self.namespace)
+        path = base + (f"/namespaces/{namespace}" if res["namespaced"] else "") + f"/{res['name']}/{obj['metadata']['name']}"
+        query = urllib.parse.urlencode({"fieldManager": field_manager, "force": "true"})
+        return self.request("PATCH", f"{path}?{query}", body=obj, content_type="application/apply-patch+yaml")
+
+    def label_node(self, node, key, value):
+        return self.request("PATCH", f"/api/v1/nodes/{node}", body={"metadata": {"labels": {key: value}}},
+                            content_type="application/merge-patch+json")
+
+def kube_session(context=None):
+    """Pooled session for a kube context (None = current context), or None to use kubectl instead."""
+    if not USE_SESSIONS:
+        return None
+    try:
+        config, mtime = _load_kubeconfig()
+    except (OSError, yaml.YAMLError):
+        return None
+    if not config:
+        return None
+    name = context or config.get("current-context")
+    with _sessions_lock:
+        # Keyed by the kubeconfig mtime: a recreated cluster comes with new credentials
+        key = (name, mtime)
+        if key not in _kube_sessions:
+            try:
+                _kube_sessions[key] = KubeSession(config, name)
+            except (KeyError, TypeError, ValueError, OSError, ssl.SSLError):
+                _kube_sessions[key] = None
+        return _kube_sessions[key]
+
+class DockerSession:
+    """Pooled client for the Docker Engine API on the local unix socket."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.pool = ConnectionPool(lambda: UnixHTTPConnection(socket_path))
+
+    def request(self, method, path, body=None):
+        return _request_json(self.pool, method, path, body)
+
+    def network(self, name):
+        """Network details as `docker network inspect` reports them, or None if it does not exist."""
+        try:
+            return self.request("GET", f"/networks/{urllib.parse.quote(name)}")
+        except ApiError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    def container(self, name):
+        """Container details as `docker inspect` reports them, or None if it does not exist."""
+        try:
+            return self.request("GET", f"/containers/{urllib.parse.quote(name)}/json")
+        except ApiError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    def image_exists(self, image):
+        try:
+            self.request("GET", f"/images/{urllib.parse.quote(image, safe='/:@')}/json")
+            return True
+        except ApiError as exc:
+            if exc.status == 404:
+                return False
+            raise
+
+    def containers(self, label=None):
+        query = ""
+        if label:
+            query = "&filters=" + urllib.parse.quote(json.dumps({"label": [label]}))
+        return self.request("GET", f"/containers/json?all=1{query}")
+
+    def exec(self, container, cmd):
+        """Run cmd (a list) in a container; returns (exit code, combined stdout/stderr)."""
+        created = self.request("POST", f"/containers/{container}/exec",
+                               {"AttachStdout": True, "AttachStderr": True, "Cmd": cmd})
+        status, data = self.pool.request(
+            "POST", f"/exec/{created['Id']}/start", body=json.dumps({"Detach": False, "Tty": False}),
+            headers={"Content-Type": "application/json"},
+        )
+        if status >= 400:
+            raise ApiError(status, "POST", f"/exec/{created['Id']}/start", data.decode(errors="replace"))
+        # Multiplexed stream: 8 byte header (stream type, 3 padding bytes, big-endian size) per frame
+        output, i = [], 0
+        while i + 8 <= len(data):
+            size = int.from_bytes(data[i + 4:i + 8], "big")
+            output.append(data[i + 8:i + 8 + size])
+            i += 8 + size
+        exit_code = self.request("GET", f"/exec/{created['Id']}/json")["ExitCode"]
+        return exit_code, b"".join(output).decode(errors="replace")
+
+_docker_session = []
+
+def docker_session():
+    """Pooled Docker API session, or None to use the docker CLI instead."""
+    if not USE_SESSIONS:
+        return None
+    with _sessions_lock:
+        if not _docker_session:
+            host = os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock")
+            path = host[len("unix://"):] if host.startswith("unix://") else None
+            session = DockerSession(path) if path and os.path.exists(path) else None
+            if session:
+                try:
+                    status, _ = session.pool.request("GET", "/_ping")
+                    session = session if status == 200 else None
+                except ApiError:
+                    session = None
+            _docker_session.append(session)
+        return _docker_session[0]
+
+# ----------------------------
+# BATCHED NODE OPERATIONS
+# ----------------------------
+def docker_exec_batch(node, ops):
+    """
+    Run several shell commands inside a node container with a single `docker exec`.
+
+    ops is a list of (key, command) pairs; keys must be plain words (no whitespace).
+    Every command runs even if an earlier one failed. Returns {key: (exit_code, output)}.
+    """
+    script = []
+    for key, command in ops:
+        script.append(f"out=$( {{ {command} ; }} 2>&1 ); rc=$?")
+        script.append(f"printf '%s\\t%s\\t%s\\n' '{key}' \"$rc\" \"$(printf '%s' \"$out\" | tr '\\n' ' ')\"")
+    script = "\n".join(script) + "\n"
+    session = docker_session()
+    if session:
+        returncode, out = session.exec(node, ["sh", "-c", script])
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, f"docker exec {node} sh", output=out)
+    else:
+        out = run(f"docker exec -i {node} sh -s", capture=True, input=script)
+
+    results = {}
+    for line in out.splitlines():
+        key, rc, output = (line.split("\t", 2) + ["", ""])[:3]
+        if rc.isdigit():
+            results[key] = (int(rc), output)
+    return results
+
+def node_links(node):
+    """{ifname: link} of every link in a node's network namespace, from a single `ip -j link show`."""
+    rc, out = docker_exec_batch(node, [("links", "ip -j link show")]).get("links", (1, "no result"))
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, f"ip -j link show ({node})", output=out)
+    return {link["ifname"]: link for link in json.loads(out or "[]")}
+
+def _vlan_id(ifname):
+    """VLAN id of an eth1.<id> interface name, None for any other link."""
+    parent, _, vlan_id = ifname.partition(".")
+    return int(vlan_id) if parent == "eth1" and vlan_id.isdigit() else None
+
+def vlan_interfaces(node):
+    """VLAN ids of the eth1.<id> interfaces of a node."""
+    try:
+        links = node_links(node)
+    except subprocess.CalledProcessError:
+        return []
+    return sorted(v for v in map(_vlan_id, links) if v is not None)
+
+def sync_vlan_interfaces(node, desired, prune=True):
+    """
+    Converge the eth1.<id> interfaces of a node on the desired VLAN ids.
+
+    The links are listed once and every add, up and (with prune) delete is applied
+    by one `ip -batch` run. Returns {"added": [...], "up": [...], "deleted": [...]}.
+    """
+    current = {}
+    for ifname, link in node_links(node).items():
+        if _vlan_id(ifname) is not None:
+            current[_vlan_id(ifname)] = link
+    desired = set(desired)
+    changes = {
+        "added": sorted(desired - set(current)),
+        "up": sorted(v for v in desired & set(current) if "UP" not in current[v].get("flags", [])),
+        "deleted": sorted(set(current) - desired) if prune else [],
+    }
+    commands = [f"link del eth1.{v}" for v in changes["deleted"]]
+    commands += [f"link add link eth1 name eth1.{v} type vlan id {v}" for v in changes["added"]]
+    commands += [f"link set eth1.{v} up" for v in changes["added"] + changes["up"]]
+    if commands:
+        script = "\\n".join(commands)
+        rc, out = docker_exec_batch(node, [("batch", f"printf '{script}\\n' | ip -force -batch -")]).get("batch", (1, "no result"))
+        if rc != 0:
+            raise subprocess.CalledProcessError(rc, f"ip -batch ({node})", output=out)
+    return changes
+
+def label_nodes(cluster, nodes, label):
+    """Set a label ("key=value") on many nodes of a cluster with one kubectl call (or API session)."""
+    if not nodes:
+        return
+    session = kube_session(kube_context(cluster))
+    if session:
+        key, _, value = label.partition("=")
+        for node in nodes:
+            session.label_node(node, key, value)
+        return
+    run(f"kubectl label node --overwrite {' '.join(nodes)} {label} --context {kube_context(cluster)}")
+
+def worker_nodes(cluster):
+    """Names of the non control-plane nodes of a cluster."""
+    return [
+        node["metadata"]["name"]
+        for node in list_objects("nodes", context=kube_context(cluster), selector="!node-role.kubernetes.io/control-plane")
+    ]
+
+def kind_clusters():
+    """The clusters of CLUSTERS_YAML that exist in kind (by their kind name, see kind_name)."""
+    session = docker_session()
+    if session:
+        names = {c["Labels"]["io.x-k8s.kind.cluster"] for c in session.containers(label="io.x-k8s.kind.cluster")}
+    else:
+        names = set(run("kind get clusters", capture=True).splitlines())
+    return [c for c in CLUSTERS_YAML if kind_name(c) in names]
+
+def docker_network(name):
+    """`docker network inspect` of a network as a dict, or None if it does not exist."""
+    session = docker_session()
+    if session:
+        return session.network(name)
+    try:
+        return json.loads(run(f"docker network inspect {name} 2>/dev/null", capture=True))[0]
+    except subprocess.CalledProcessError:
+        return None
+
+def docker_container(name):
+    """`docker inspect` of a container as a dict, or None if it does not exist."""
+    session = docker_session()
+    if session:
+        return session.container(name)
+    try:
+        return json.loads(run(f"docker inspect {name} 2>/dev/null", capture=True))[0]
+    except subprocess.CalledProcessError:
+        return None
+
+def docker_container_state(name):
+    """State of a container ("running", "exited", ...), or None if it does not exist."""
+    container = docker_container(name)
+    return container["State"]["Status"] if container else None
+
+def docker_containers():
+    """{name: state} of all containers, in one call."""
+    session = docker_session()
+    if session:
+        return {c["Names"][0].lstrip("/"): c["State"] for c in session.containers()}
+    out = run("docker ps -a --format '{{.Names}}\t{{.State}}'", capture=True)
+    return dict(line.split("\t", 1) for line in out.splitlines() if "\t" in line)
+
+def docker_image_exists(image):
+    session = docker_session()
+    if session:
+        return session.image_exists(image)
+    return run(f"docker image inspect {image} >/dev/null 2>&1", check=False).returncode == 0
+
+# ----------------------------
+# TOPOLOGY
+# ----------------------------
+# A topology spec (YAML, see topologies/) declares the sites with their number
+# of workers, the leaf/spine fabric and the VPC networks. use_topology() renders
+# it below TOPOLOGY_DIR/<name>/ (kind configs, containerlab vars and the
+# network-plan manifests) and points the cluster, network and endpoint tables
+# above at the result.
+CLUSTER_SUBNET = "10.{}.0.0/16"  # cluster i gets 10.(64+i).0.0/16 for pods and 10.(128+i).0.0/16 for services
+
+def kind_worker_names(cluster, count):
+    """Container names kind gives the workers of a cluster."""
+    return [f"{cluster}-worker" + (str(i) if i > 1 else "") for i in range(1, count + 1)]
+
+def fabric_plan(workers, network=None):
+    """
+    Cable every worker to a leaf and every leaf to every spine.
+
+    Returns the containerlab vars: {"name", "network", "image", "workers", "leafs", "spines",
+    "links": [[endpoint, endpoint], ...], "endpoints": {worker: [leaf, port]}}.
+    network is the docker network of the management interfaces (default: the
+    bridge of the clusters).
+    """
+    leafs = ["leaf"] if LEAFS == 1 else [f"leaf{i}" for i in range(1, LEAFS + 1)]
+    spines = [f"spine{i}" for i in range(1, SPINES + 1)]
+    per_leaf = LEAF_PORTS - SPINES
+    if len(workers) > per_leaf * len(leafs):
+        raise InfraError(f"{len(workers)} workers do not fit on {len(leafs)} leaf(s) with {per_leaf} ports each")
+
+    links, endpoints = [], {}
+    for i, worker in enumerate(workers):
+        leaf, port = leafs[i // per_leaf], f"e1-{i % per_leaf + 1}"
+        endpoints[worker] = [leaf, port]
+        links.append([f"{leaf}:{port}", f"{worker}:eth1"])
+    for l, leaf in enumerate(leafs):
+        for s, spine in enumerate(spines):
+            links.append([f"{leaf}:e1-{per_leaf + s + 1}", f"{spine}:e1-{l + 1}"])
+    network = network or next(iter(NETWORKS.values())).split(":")[1]
+    return {"name": clab_name(), "network": network, "image": SRL_IMAGE, "workers": workers, "leafs": leafs,
+            "spines": spines, "links": links, "endpoints": endpoints}
+
+def load_topology(path):
+    """
+    Read and validate a topology spec.
+
+    Site entries with a `count` expand to <name>01, <name>02, ...; a network's
+    `sites` may name such a group. Networks without `sites` span all sites.
+    """
+    try:
+        with open(path) as f:
+            spec = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as exc:
+        raise InfraError(f"Cannot read topology {path}: {exc}")
+
+    sites, groups = [], {}
+    for entry in spec.get("sites") or []:
+        count = entry.get("count")
+        names = [f"{entry['name']}{i:02d}" for i in range(1, count + 1)] if count else [entry["name"]]
+        groups[entry["name"]] = names
+        sites.extend((name, int(entry.get("workers", 1))) for name in names)
+    names = [name for name, _ in sites]
+    if not names:
+        raise InfraError(f"Topology {path} declares no sites")
+    if len(set(names)) != len(names) or "mgmt" in names:
+        raise InfraError(f"Topology {path}: site names must be unique and not 'mgmt'")
+    if any(workers < 1 for _, workers in sites):
+        raise InfraError(f"Topology {path}: every site needs at least one worker")
+    if len(sites) >= 64:
+        raise InfraError(f"Topology {path}: at most 63 sites are supported (pod/service subnet plan)")
+
+    fabric, bridge = spec.get("fabric") or {}, spec.get("bridge") or {}
+    topo = {
+        "name": spec.get("name", TOPOLOGY_NAME),
+        "image": spec.get("image", KIND_NODE_IMAGE),
+        "bridge": bridge.get("name", "kind"),
+        "subnet": bridge.get("subnet", "172.21.76.0/24"),
+        "mgmt_workers": int((spec.get("mgmt") or {}).get("workers", 0)),
+        "sites": sites,
+        "leafs": int(fabric.get("leafs", LEAFS)),
+        "spines": int(fabric.get("spines", SPINES)),
+        "ports": int(fabric.get("ports", LEAF_PORTS)),
+        "networks": {},
+    }
+    for net, cfg in (spec.get("networks") or {}).items():
+        selected = []
+        for name in cfg.get("sites") or names:
+            if name not in groups and name not in names:
+                raise InfraError(f"Topology {path}: network {net} refers to unknown site {name}")
+            selected.extend(groups.get(name, [name]))
+        try:
+            prefix = ipaddress.ip_network(cfg["prefix"])
+        except (KeyError, ValueError) as exc:
+            raise InfraError(f"Topology {path}: network {net} needs a valid prefix ({exc})")
+        if prefix.prefixlen > 23 or 2 ** (24 - prefix.prefixlen) <= len(selected):
+            raise InfraError(f"Topology {path}: {prefix} of network {net} has no /24 for each of its {len(selected)} sites")
+        topo["networks"][net] = {"prefix": str(prefix), "sites": selected}
+    return topo
+
+def _write_yaml(path, docs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        yaml.dump_all(docs, f, Dumper=YAML_DUMPER, sort_keys=False)
+
+def _plan_manifests(topo, fabric):
+    """The network-plan manifests of a topology: {file name: [docs]}."""
+    name = topo["name"]
+    networks = topo["networks"]
+
+    with open(os.path.join("network-plan", "inventory.yaml")) as f:
+        node_models = [d for d in yaml.safe_load_all(f) if d and d.get("kind") != "Topology"]
+    exclude = {"infra.be.kuid.dev/exclude": "true"}
+    clab = {
+        "name": name, "prefix": "net", "mgmt": {"network": topo["bridge"]},
+        "topology": {
+            "kinds": {"nokia_srlinux": {"type": "ixr-d3", "image": "ghcr.io/nokia/srlinux"}},
+            "nodes": {
+                **{n: {"kind": "nokia_srlinux", "type": "ixr-d3"} for n in fabric["leafs"] + fabric["spines"]},
+                **{w: {"kind": "ext-container", "labels": exclude} for w in fabric["workers"]},
+            },
+            "links": [
+                {"endpoints": link, **({"labels": exclude} if link[1].endswith(":eth1") else {})}
+                for link in fabric["links"]
+            ],
+        },
+    }
+    topology = {
+        "apiVersion": "topo.app.kuid.dev/v1alpha1", "kind": "Topology",
+        "metadata": {"name": name, "namespace": "default"},
+        "spec": {"region": DEFAULT_REGION, "site": DEFAULT_SITE,
+                 "containerLab": yaml.safe_dump(clab, sort_keys=False)},
+    }
+
+    def labels(net, **extra):
+        return {NETWORK_LABEL: net, **extra}
+
+    return {
+        "inventory.yaml": node_models + [topology],
+        "vlan-indicies.yaml": [{
+            "apiVersion": "vlan.be.kuid.dev/v1alpha1", "kind": "VLANIndex", "metadata": {"name": name},
+            "spec": {"minID": 2, "maxID": 2 + max(len(networks), 1) - 1, "labels": {"inv.kuid.dev/site": name}},
+        }],
+        "dynamic-vlan.yaml": [{
+            "apiVersion": "vlan.be.kuid.dev/v1alpha1", "kind": "VLANClaim",
+            "metadata": {"name": net, "labels": labels(net, **{"inv.kuid.dev/router-name": f"{name}.{net}-rt"})},
+            "spec": {"index": name, "labels": labels(net)},
+        } for net in networks],
+        "ipindex.yaml": [{
+            "apiVersion": "ipam.be.kuid.dev/v1alpha1", "kind": "IPIndex",
+            "metadata": {"name": f"{name}.{net}", "labels": labels(net)},
+            "spec": {"prefixes": [{"prefix": cfg["prefix"], "labels": labels(net)}]},
+        } for net, cfg in networks.items()],
+        "network-config.yaml": [{
+            "apiVersion": "network.app.kuid.dev/v1alpha1", "kind": "NetworkConfig",
+            "metadata": {"name": f"{name}.{net}", "labels": labels(net)},
+            "spec": {
+                "topology": name, "addressing": "dualstack",
+                "prefixes": [{
+                    "prefix": str(subnet),
+                    "labels": labels(net, **{SITE_LABEL: site, "ipam.be.kuid.dev/ipprefix-type": "network",
+                                             "infra.be.kuid.dev/purpose": "link-internal"}),
+                } for site, subnet in zip(cfg["sites"], itertools.islice(
+                    ipaddress.ip_network(cfg["prefix"]).subnets(new_prefix=24), 1, None))],
+                "encapsulation": {"vxlan": {}},
+            },
+        } for net, cfg in networks.items()],
+        "ipclaim-vpcs.yaml": [{
+            "apiVersion": "ipam.be.kuid.dev/v1alpha1", "kind": "IPClaim",
+            "metadata": {"name": f"{name}.{net}-{site}-rt",
+                         "labels": labels(net, **{"inv.kuid.dev/router-name": f"{name}.{net}-rt"})},
+            "spec": {
+                "index": f"{name}.{net}",
+                "selector": {"matchLabels": labels(net, **{SITE_LABEL: site})},
+                "labels": {"inv.kuid.dev/endpoint-name": f"{name}.{net}-{site}-rt"},
+            },
+        } for net, cfg in networks.items() for site in cfg["sites"]],
+    }
+
+def render_topology(topo, out_dir):
+    """
+    Write the kind configs, containerlab vars and network-plan manifests of a topology to out_dir.
+
+    Returns ({cluster: kind config path}, {site: [[leaf, port] of every worker]}), mgmt first.
+    """
+    clusters, workers = {}, []
+    for i, (cluster, count) in enumerate([("mgmt", topo["mgmt_workers"])] + topo["sites"]):
+        path = os.path.join(out_dir, "infra-kind", f"{cluster}-cluster.yaml")
+        _write_yaml(path, [{
+            "kind": "Cluster", "apiVersion": "kind.x-k8s.io/v1alpha4", "name": cluster,
+            "networking": {"podSubnet": CLUSTER_SUBNET.format(64 + i), "serviceSubnet": CLUSTER_SUBNET.format(128 + i)},
+            "nodes": [{"role": "control-plane", "image": topo["image"]}]
+                     + [{"role": "worker", "image": topo["image"]}] * count,
+        }])
+        clusters[cluster] = path
+        workers.extend(kind_worker_names(cluster, count))
+
+    fabric = fabric_plan(workers, network=topo["bridge"])
+    with open(os.path.join(out_dir, "vars.json"), "w") as f:
+        json.dump(fabric, f, indent=2)
+
+    plan_dir = os.path.join(out_dir, "network-plan")
+    os.makedirs(plan_dir, exist_ok=True)
+    shutil.copy(os.path.join("network-plan", "discovery.yaml"), plan_dir)
+    for filename, docs in _plan_manifests(topo, fabric).items():
+        _write_yaml(os.path.join(plan_dir, filename), docs)
+
+    endpoints = {
+        site: [fabric["endpoints"][worker] for worker in kind_worker_names(site, count)]
+        for site, count in topo["sites"]
+    }
+    return clusters, endpoints
+
+def use_topology(path):
+    """Render the topology spec at path and make every command operate on it."""
+    global TOPOLOGY_NAME, LEAFS, SPINES, LEAF_PORTS, PLAN_DIR, CREATE_WORKERS
+    topo = load_topology(path)
+    TOPOLOGY_NAME, LEAFS, SPINES, LEAF_PORTS = topo["name"], topo["leafs"], topo["spines"], topo["ports"]
+    out_dir = os.path.join(TOPOLOGY_DIR, topo["name"])
+    clusters, endpoints = render_topology(topo, out_dir)
+
+    # Updated in place: default arguments (e.g. of create_vlan_interfaces) refer to these dicts
+    for table, values in (
+        (CLUSTERS_YAML, clusters),
+        (NETWORKS, {cluster: f"{topo['subnet']}:{topo['bridge']}" for cluster in clusters}),
+        (ENDPOINT_BASE, {site: ports[0][1] for site, ports in endpoints.items()}),
+        (SITE_NODES, {site: ports[0][0] for site, ports in endpoints.items()}),
+        (SITE_ENDPOINTS, endpoints),
+    ):
+        table.clear()
+        table.update(values)
+    PLAN_DIR = os.path.join(out_dir, "network-plan")
+    CREATE_WORKERS = len(clusters)
+    return topo
+
+# ----------------------------
+# LABS
+# ----------------------------
+# use_lab() namespaces one lab among several on the host. Kind clusters become
+# <lab>-<cluster>, the bridges <bridge>-<lab> and the containerlab lab <lab>-<topology>;
+# cluster and site names inside the labs stay the same. Every lab gets a slot in
+# LAB_REGISTRY (under CACHE_DIR), which picks its bridge subnet (the n-th one after
+# the default) and its block of LAB_POD_POOL / LAB_SERVICE_POOL. A destroyed lab gets
+# its slot back if it is still free, so a snapshot restores onto the same subnet. Kind configs, the
+# network plan, vars, generated CRs, plan state, traces and the kubeconfig of the
+# lab are kept in LAB_DIR/<lab>/.
+LAB_ID_PATTERN = r"[a-z0-9]{1,10}"  # short enough for the bridge name (15 characters at most)
+LAB_REGISTRY = "labs.json"
+
+def kind_name(cluster):
+    """Kind cluster name of a cluster of the current lab."""
+    return f"{LAB_ID}-{cluster}" if LAB_ID else cluster
+
+def clab_name():
+    """Containerlab lab name: its nodes run as net-<name>-<node>, its files live in clab-<name>."""
+    return f"{LAB_ID}-{TOPOLOGY_NAME}" if LAB_ID else TOPOLOGY_NAME
+
+def _load_labs():
+    """LAB_REGISTRY: {lab: {"slot": n, "active": bool}}; inactive entries remember the slot of a destroyed lab."""
+    try:
+        with open(os.path.join(CACHE_DIR, LAB_REGISTRY)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_labs(labs):
+    path = os.path.join(CACHE_DIR, LAB_REGISTRY)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(labs, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+def registered_labs():
+    """{lab: slot} of the labs that exist."""
+    return {lab: entry["slot"] for lab, entry in _load_labs().items() if entry["active"]}
+
+def lab_slot(lab, allocate=False):
+    """
+    Slot of a lab, or None if it is not registered. allocate registers it in its
+    previous slot if that is free, else in the lowest free one.
+    """
+    with cache_lock("labs"):
+        labs = _load_labs()
+        entry = labs.get(lab)
+        if entry and entry["active"]:
+            return entry["slot"]
+        if not allocate:
+            return None
+        taken = {e["slot"] for e in labs.values() if e["active"]}
+        free = [i for i in range(1, LAB_MAX + 1) if i not in taken]
+        if not free:
+            raise InfraError(f"All {LAB_MAX} lab slots are taken ({', '.join(sorted(registered_labs()))}), destroy a lab first")
+        slot = entry["slot"] if entry and entry["slot"] in free else free[0]
+        labs[lab] = {"slot": slot, "active": True}
+        _save_labs(labs)
+        log("INFO", f"Registered lab {lab} in slot {slot}")
+        return slot
+
+def release_lab(lab):
+    with cache_lock("labs"):
+        labs = _load_labs()
+        if lab in labs and labs[lab]["active"]:
+            labs[lab]["active"] = False
+            _save_labs(labs)
+            log("INFO", f"Released slot {labs[lab]['slot']} of lab {lab}")
+
+def lab_subnet(subnet, slot):
+    """The slot-th subnet of the same size after subnet (slot 0 is subnet itself)."""
+    net = ipaddress.ip_network(subnet)
+    return ipaddress.ip_network((int(net.network_address) + slot * net.num_addresses, net.prefixlen))
+
+def lab_block(pool, slot):
+    """The block of a CIDR pool that belongs to the lab in slot (1..LAB_MAX)."""
+    blocks = ipaddress.ip_network(pool).subnets(prefixlen_diff=(LAB_MAX - 1).bit_length())
+    return next(itertools.islice(blocks, slot - 1, None))
+
+def _move_prefix(prefix, old, new):
+    """prefix moved from subnet old to subnet new; unchanged if it is not inside old."""
+    prefix, old, new = ipaddress.ip_network(prefix), ipaddress.ip_network(old), ipaddress.ip_network(new)
+    if not prefix.subnet_of(old):
+        return prefix
+    offset = int(prefix.network_address) - int(old.network_address)
+    return ipaddress.ip_network((int(new.network_address) + offset, prefix.prefixlen))
+
+def use_lab(lab, allocate=False):
+    """
+    Make every command operate on lab `lab` (see above); allocate registers a new lab.
+
+    Returns the slot of the lab, or None if it is not registered: then only the
+    names are set, which is all `destroy` needs.
+    """
+    global LAB_ID, PLAN_DIR, VARS_FILE, OUTPUT_CRS_FILE, PLANNED_CRS_FILE, NETWORK_IDS_FILE, PLAN_STATE_FILE, TRACE_FILE
+    global SNAPSHOT_DIR
+    if not re.fullmatch(LAB_ID_PATTERN, lab):
+        raise InfraError(f"Invalid lab ID '{lab}': 1 to 10 lowercase letters and digits")
+    if len(CLUSTERS_YAML) > 64:
+        raise InfraError(f"A lab holds at most 64 clusters, not {len(CLUSTERS_YAML)}")
+    slot = lab_slot(lab, allocate)
+    LAB_ID = lab
+    lab_dir = os.path.join(LAB_DIR, lab)
+    os.makedirs(os.path.join(lab_dir, "infra-kind"), exist_ok=True)
+    VARS_FILE, OUTPUT_CRS_FILE, PLANNED_CRS_FILE, NETWORK_IDS_FILE, PLAN_STATE_FILE, TRACE_FILE = (
+        os.path.join(lab_dir, os.path.basename(path))
+        for path in (VARS_FILE, OUTPUT_CRS_FILE, PLANNED_CRS_FILE, NETWORK_IDS_FILE, PLAN_STATE_FILE, TRACE_FILE)
+    )
+    SNAPSHOT_DIR = os.path.join(SNAPSHOT_DIR, "labs", lab)
+    # kind writes the lab's contexts, and kubectl reads its current context, from a kubeconfig of its own
+    os.environ["KUBECONFIG"] = os.path.abspath(os.path.join(lab_dir, "kubeconfig"))
+
+    base = next(iter(network_bridges().values()))
+    for cluster, config in NETWORKS.items():
+        subnet, bridge = config.split(":")
+        if len(f"{bridge}-{lab}") > 15:
+            raise InfraError(f"Bridge name {bridge}-{lab} is longer than 15 characters, use a shorter lab ID")
+        NETWORKS[cluster] = f"{lab_subnet(subnet, slot or 0)}:{bridge}-{lab}"
+    if slot is None:
+        return None
+
+    pods = lab_block(LAB_POD_POOL, slot).subnets(prefixlen_diff=6)
+    services = lab_block(LAB_SERVICE_POOL, slot).subnets(prefixlen_diff=6)
+    for (cluster, path), pod, service in zip(list(CLUSTERS_YAML.items()), pods, services):
+        with open(path) as f:
+            config = yaml.safe_load(f)
+        config["name"] = kind_name(cluster)
+        config.setdefault("networking", {}).update(podSubnet=str(pod), serviceSubnet=str(service))
+        CLUSTERS_YAML[cluster] = os.path.join(lab_dir, "infra-kind", f"{cluster}-cluster.yaml")
+        _write_yaml(CLUSTERS_YAML[cluster], [config])
+
+    # The SR Linux management addresses the discovery scans for are on the lab's bridge
+    plan_dir = os.path.join(lab_dir, "network-plan")
+    shutil.copytree(PLAN_DIR, plan_dir, dirs_exist_ok=True)
+    with open(os.path.join(plan_dir, "discovery.yaml")) as f:
+        docs = list(yaml.safe_load_all(f))
+    for doc in docs:
+        if doc and doc.get("kind") == "DiscoveryRule":
+            for entry in doc["spec"].get("prefixes") or []:
+                entry["prefix"] = str(_move_prefix(entry["prefix"], base, lab_subnet(base, slot)))
+    _write_yaml(os.path.join(plan_dir, "discovery.yaml"), docs)
+    PLAN_DIR = plan_dir
+    return slot
+
+def print_labs():
+    """Table of the registered labs with their bridge subnet and CIDR blocks."""
+    labs = registered_labs()
+    if not labs:
+        log("INFO", "No labs registered")
+        return
+    base = next(iter(network_bridges().values()))
+    print(f"{'Lab':<12}{'Slot':>5}  {'Network':<18}{'Pods':<18}Services")
+    for lab, slot in sorted(labs.items(), key=lambda item: item[1]):
+        print(f"{lab:<12}{slot:>5}  {str(lab_subnet(base, slot)):<18}{str(lab_block(LAB_POD_POOL, slot)):<18}"
+              f"{lab_block(LAB_SERVICE_POOL, slot)}")
 
 # ----------------------------
 # NETWORKS
 # ----------------------------
-def create_networks():
-    log("INFO", "Creating networks...")
-    for net, config in NETWORKS.items():
+def network_bridges():
+    """{bridge: subnet} of NETWORKS. Clusters usually share one bridge; the first subnet listed wins."""
+    bridges = {}
+    for config in NETWORKS.values():
         subnet, bridge = config.split(":")
-        try:
-            run(f"docker network inspect {bridge}", check=True)
+        bridges.setdefault(bridge, subnet)
+    return bridges
+
+def create_networks(existing=None):
+    """Create the missing bridges; existing is {bridge: inspect or None} (see take_inventory)."""
+    log("INFO", "Creating networks...")
+    for bridge, subnet in network_bridges().items():
+        if existing is not None:
+            exists = existing.get(bridge)
+        else:
+            exists = docker_network(bridge)
+        if exists:
             log("INFO", f"Network {bridge} already exists, skipping.")
-        except subprocess.CalledProcessError:
+        else:
             log("INFO", f"Creating network {bridge} ({subnet})")
             run(
                 f"docker network create --driver=bridge --subnet={subnet} "
@@ -76,528 +1296,2306 @@ def create_networks():
             )
 
 def delete_networks():
+    """Remove the bridges; returns the ones that did not exist."""
     log("INFO", "Deleting networks...")
-    for net, config in NETWORKS.items():
-        bridge = config.split(":")[1]
-        try:
-            run(f"docker network inspect {bridge}", check=True)
+    gone = []
+    for bridge in network_bridges():
+        if docker_network(bridge):
             log("INFO", f"Removing network {bridge}")
             run(f"docker network rm {bridge}", check=False)
-        except subprocess.CalledProcessError:
+        else:
             log("INFO", f"Network {bridge} does not exist, skipping.")
+            gone.append(bridge)
+    return gone
+
+# ----------------------------
+# ARTIFACT CACHE
+# ----------------------------
+# Layout under CACHE_DIR:
+#   blobs/sha256/<digest>           downloaded artifacts, named by their checksum
+#   cni/<version>-linux-<arch>      index file holding the digest of that release
+#   cni/<digest>/                   extracted plugin tree of that blob
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@contextlib.contextmanager
+def cache_lock(name):
+    """Exclusive file lock, so concurrent infra-manager runs do not race on the cache."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, f".{name}.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def cache_blob(src, expected_sha256=None):
+    """Move (or copy, for seed files) `src` into the blob store and return its digest."""
+    digest = sha256_file(src)
+    if expected_sha256 and digest != expected_sha256:
+        raise InfraError(f"Checksum mismatch for {src}: expected {expected_sha256}, got {digest}")
+    blob_dir = os.path.join(CACHE_DIR, "blobs", "sha256")
+    os.makedirs(blob_dir, exist_ok=True)
+    blob = os.path.join(blob_dir, digest)
+    if not os.path.exists(blob):
+        tmp = tempfile.NamedTemporaryFile(dir=blob_dir, delete=False).name
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, blob)
+    return digest
+
+def _cni_published_sha256(url):
+    """Checksum published next to the release tarball, or None if it cannot be fetched."""
+    try:
+        return run(f"curl -fsSL {url}.sha256", capture=True).split()[0]
+    except (subprocess.CalledProcessError, IndexError):
+        log("WARN", f"Could not fetch {url}.sha256, the download is not verified")
+        return None
+
+def ensure_cni_plugins(version=CNI_VERSION, arch=CNI_ARCH, seed_tarball=None, offline=False):
+    """
+    Return a directory holding the extracted CNI plugins, downloading them at most once per host.
+
+    seed_tarball : str
+        Local tarball to seed the cache with (air-gapped hosts). It is checked
+        against CNI_SHA256 when that is pinned.
+    offline : bool
+        Never touch the network; fail if the release is not cached (or seeded).
+    """
+    index = os.path.join(CACHE_DIR, "cni", f"{version}-linux-{arch}")
+    os.makedirs(os.path.dirname(index), exist_ok=True)
+
+    with cache_lock("cni"):
+        if seed_tarball:
+            log("INFO", f"Seeding CNI plugins {version} cache from {seed_tarball}")
+            with open(index, "w") as f:
+                f.write(cache_blob(seed_tarball, CNI_SHA256))
+
+        digest = None
+        if os.path.exists(index):
+            with open(index) as f:
+                digest = f.read().strip()
+            blob = os.path.join(CACHE_DIR, "blobs", "sha256", digest)
+            if not os.path.exists(blob) or sha256_file(blob) != digest:
+                log("WARN", f"Cached CNI plugins {version} are missing or corrupt, fetching again")
+                digest = None
+
+        if digest is None:
+            if offline:
+                raise InfraError(
+                    f"CNI plugins {version}/{arch} are not cached and --offline is set "
+                    f"(seed the cache with --cni-tarball)"
+                )
+            url = CNI_URL.format(version=version, arch=arch)
+            log("INFO", f"Downloading CNI plugins {version}")
+            expected = CNI_SHA256 or _cni_published_sha256(url)
+            with tempfile.TemporaryDirectory(dir=CACHE_DIR) as tmp:
+                tgz = os.path.join(tmp, "cni-plugins.tgz")
+                run(f"curl -fsSL -o {tgz} {url}")
+                digest = cache_blob(tgz, expected)
+            with open(index, "w") as f:
+                f.write(digest)
+        else:
+            log("INFO", f"Using cached CNI plugins {version} ({digest[:12]})")
+
+        tree = os.path.join(CACHE_DIR, "cni", digest)
+        if not os.path.isdir(tree):
+            # Extract next to the final path and rename, so a tree is either complete or absent
+            tmp = tempfile.mkdtemp(dir=os.path.dirname(tree))
+            try:
+                run(f"tar -xzf {os.path.join(CACHE_DIR, 'blobs', 'sha256', digest)} -C {tmp}")
+            except subprocess.CalledProcessError:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise InfraError(f"CNI plugins {version} tarball ({digest[:12]}) is not a valid archive")
+            os.replace(tmp, tree)
+    return tree
+
+# ----------------------------
+# IMAGES
+# ----------------------------
+# Images are pulled once per host: the node, srlinux and workload images are
+# pulled into the host's docker up front and bulk-loaded into every cluster
+# with `kind load`. Anything else a node needs goes through pull-through
+# registry mirrors on the kind network, whose cache lives in a named volume
+# and so survives `destroy`.
+
+def mirror_name(registry):
+    """Container (and cache volume) name of the mirror of a registry."""
+    return "infra-mirror-" + registry.replace(".", "-")
+
+def start_registry_mirrors(network, containers=None):
+    """
+    Start (or reuse) a mirror per REGISTRY_MIRRORS entry; returns {registry: mirror url}
+    of the running ones. containers is {name: state} of the existing containers, if known.
+    """
+    mirrors = {}
+    for registry, upstream in REGISTRY_MIRRORS.items():
+        name = mirror_name(registry)
+        state = containers.get(name) if containers is not None else docker_container_state(name)
+        try:
+            if state is None:
+                log("INFO", f"Starting registry mirror {name} for {registry}")
+                run(
+                    f"docker run -d --restart=always --name {name} --network {network} "
+                    f"-v {name}:/var/lib/registry -e REGISTRY_PROXY_REMOTEURL={upstream} {REGISTRY_IMAGE}",
+                    capture=True,
+                )
+            elif state != "running":
+                log("INFO", f"Restarting registry mirror {name}")
+                run(f"docker start {name}", capture=True)
+            else:
+                log("INFO", f"Registry mirror {name} is running, reusing it")
+            # Labs share the mirrors: the nodes resolve a mirror by name on their own bridge
+            if state is not None and network not in _container_networks(name):
+                log("INFO", f"Connecting registry mirror {name} to {network}")
+                run(f"docker network connect {network} {name}", capture=True)
+        except subprocess.CalledProcessError:
+            log("WARN", f"Could not start the registry mirror for {registry}, nodes pull from it directly")
+            continue
+        mirrors[registry] = f"http://{name}:5000"
+    return mirrors
+
+def _container_networks(name):
+    return list(((docker_container(name) or {}).get("NetworkSettings") or {}).get("Networks") or {})
+
+def stop_registry_mirrors(network=None):
+    """
+    Remove the mirror containers; their cache volumes are kept for the next `create`.
+    With network, a mirror other labs' bridges still use is only disconnected from it.
+    """
+    for registry in REGISTRY_MIRRORS:
+        name = mirror_name(registry)
+        if docker_container_state(name) is None:
+            continue
+        networks = _container_networks(name)
+        if network and any(n != network for n in networks):
+            if network in networks:
+                log("INFO", f"Disconnecting registry mirror {name} from {network}, other labs still use it")
+                run(f"docker network disconnect {network} {name}", check=False)
+            continue
+        log("INFO", f"Removing registry mirror {name} (cache volume {name} is kept)")
+        run(f"docker rm -f {name} >/dev/null", check=False)
+
+def configure_node_mirrors(cluster, mirrors):
+    """Point the containerd of every node of a cluster at the mirrors (hosts.toml is read on every pull)."""
+    ops = []
+    for registry, url in mirrors.items():
+        hosts = f'server = "{REGISTRY_MIRRORS[registry]}"\n\n[host."{url}"]\n  capabilities = ["pull", "resolve"]\n'
+        path = f"/etc/containerd/certs.d/{registry}"
+        ops.append((mirror_name(registry), f"mkdir -p {path} && printf '%s' '{hosts}' > {path}/hosts.toml"))
+    for node in run(f"kind get nodes --name {kind_name(cluster)}", capture=True).splitlines():
+        for key, (rc, output) in docker_exec_batch(node, ops).items():
+            if rc != 0:
+                log("WARN", f"Could not configure {key} on {node}: {output}")
+
+def kind_config(cluster, mirrors):
+    """
+    Kind config to create a cluster from: with mirrors, a temporary copy that
+    makes containerd look up registry hosts in /etc/containerd/certs.d.
+    """
+    if not mirrors:
+        return CLUSTERS_YAML[cluster]
+    with open(CLUSTERS_YAML[cluster]) as f:
+        config = yaml.safe_load(f)
+    config.setdefault("containerdConfigPatches", []).append(
+        '[plugins."io.containerd.grpc.v1.cri".registry]\n  config_path = "/etc/containerd/certs.d"\n'
+    )
+    with tempfile.NamedTemporaryFile("w", prefix=f"kind-{cluster}-", suffix=".yaml", delete=False) as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return f.name
+
+def manifest_images(patterns):
+    """Images referenced by the manifests matching the glob patterns, in first-seen order."""
+    images = []
+    for path in sorted(p for pattern in patterns for p in glob.glob(pattern)):
+        with open(path) as f:
+            stack = list(yaml.safe_load_all(f))
+        while stack:
+            node = stack.pop(0)
+            if isinstance(node, dict):
+                if isinstance(node.get("image"), str) and node["image"] not in images:
+                    images.append(node["image"])
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+    return images
+
+def preload_images(cluster):
+    """Workload images bulk-loaded into a cluster (PRELOAD_MANIFESTS)."""
+    return manifest_images(PRELOAD_MANIFESTS.get("*", []) + PRELOAD_MANIFESTS.get(cluster, []))
+
+def host_images():
+    """Every image a `create` needs: kind node images, srlinux and the preloaded workload images."""
+    images = manifest_images(CLUSTERS_YAML.values()) + [SRL_IMAGE]
+    for cluster in CLUSTERS_YAML:
+        images.extend(preload_images(cluster))
+    return list(dict.fromkeys(images))
+
+def prefetch_images(images, offline=False):
+    """Pull the missing images into the host's docker, concurrently; returns the set available locally."""
+    present = {image for image in images if docker_image_exists(image)}
+    missing = [image for image in images if image not in present]
+    if not missing:
+        log("INFO", f"All {len(images)} images are present on the host")
+        return present
+    if offline:
+        log("WARN", f"--offline: {len(missing)} image(s) are not on the host and are left to the nodes to pull")
+        return present
+
+    log("INFO", f"Pulling {len(missing)} image(s) once for all clusters")
+    _, failures = run_parallel(
+        lambda image: run(f"docker pull -q {image}", capture=True), missing, label=lambda image: image.rsplit("/", 1)[-1]
+    )
+    for image, exc in failures.items():
+        log("WARN", f"Could not pull {image} ({exc}), the nodes pull it themselves")
+    return present | {image for image in missing if image not in failures}
 
 # ----------------------------
 # CLUSTERS
 # ----------------------------
-def create_kind_cluster(cluster):
+def create_kind_cluster(cluster, cni_dir, mirrors=None, images=()):
+    """
+    mirrors : dict
+        {registry: mirror url} the nodes' containerd pulls through.
+    images : set
+        Images present on the host; those of the cluster's PRELOAD_MANIFESTS are
+        loaded into its nodes before any workload is installed.
+    """
     bridge = NETWORKS[cluster].split(":")[1]
-    clusters = run("kind get clusters", capture=True)
-    if cluster in clusters.split("\n"):
-        log("INFO", f"Cluster {cluster} already exists, skipping.")
-        return
-
     log("INFO", f"Creating kind cluster {cluster} on network {bridge}")
-    run(
-        f"KIND_EXPERIMENTAL_DOCKER_NETWORK={bridge} "
-        f"kind create cluster --config={CLUSTERS_YAML[cluster]} --name {cluster} --wait 5m"
-    )
-    run(f"kubectl get nodes --context kind-{cluster}")
-    run("kubectl create -f infra-kind/multus-daemonset-thick.yml")
+    with span("kind-create"):
+        config = kind_config(cluster, mirrors)
+        try:
+            run(
+                f"KIND_EXPERIMENTAL_DOCKER_NETWORK={bridge} "
+                f"kind create cluster --config={config} --name {kind_name(cluster)} --wait 5m"
+            )
+        finally:
+            if config != CLUSTERS_YAML[cluster]:
+                os.remove(config)
+        run(f"kubectl get nodes --context {kube_context(cluster)}")
+    if mirrors:
+        with span("mirrors"):
+            configure_node_mirrors(cluster, mirrors)
+    preload = [image for image in preload_images(cluster) if image in images]
+    if preload:
+        log("INFO", f"Loading {len(preload)} image(s) into {cluster}")
+        with span("preload", images=len(preload)):
+            run(f"kind load docker-image {' '.join(preload)} --name {kind_name(cluster)}")
+    # Explicit context: with concurrent bring-up the current context belongs to whichever cluster finished last
     log("INFO", f"Installing multus on {cluster}")
+    with span("multus"):
+        run(f"kubectl create -f infra-kind/multus-daemonset-thick.yml --context {kube_context(cluster)}")
 
     # Label worker nodes
     try:
-        worker_nodes = run(
-            f"kubectl get nodes --context kind-{cluster} "
-            f"-l '!node-role.kubernetes.io/control-plane' "
-            f"-o name", capture=True
-        ).splitlines()
-
-        for node in worker_nodes:
-            run(f"kubectl label node --overwrite {node} node-role.kubernetes.io/worker= --context kind-{cluster}")
+        with span("label-workers"):
+            workers = worker_nodes(cluster)
+            label_nodes(cluster, workers, "node-role.kubernetes.io/worker=")
+        for node in workers:
             log("OK", f"Labeled {node} as worker")
     except subprocess.CalledProcessError:
         log("WARN", f"Failed to label worker nodes in {cluster}")
 
-    # Download CNI plugins and copy into all nodes
-    CNI_VERSION = "v1.3.0"
-    ARCH = "amd64"
-    log("INFO", f"Downloading CNI plugins {CNI_VERSION}")
-    run(f"curl -L -o /tmp/cni-plugins.tgz https://github.com/containernetworking/plugins/releases/download/{CNI_VERSION}/cni-plugins-linux-{ARCH}-{CNI_VERSION}.tgz")
-    run("mkdir -p /tmp/cni-plugins")
-    run("tar -xzf /tmp/cni-plugins.tgz -C /tmp/cni-plugins")
-
-    nodes = run(f"kind get nodes --name {cluster}", capture=True).splitlines()
-    for node in nodes:
-        log("INFO", f"Copying CNI plugins to {node}:/opt/cni/bin")
-        run(f"docker cp /tmp/cni-plugins/. {node}:/opt/cni/bin/")
+    # Copy the (cached) CNI plugins into all nodes
+    with span("cni-copy"):
+        nodes = run(f"kind get nodes --name {kind_name(cluster)}", capture=True).splitlines()
+        for node in nodes:
+            log("INFO", f"Copying CNI plugins to {node}:/opt/cni/bin")
+            run(f"docker cp {cni_dir}/. {node}:/opt/cni/bin/")
 
     log("OK", f"Kind cluster {cluster} created with Multus and all CNI plugins installed ✅")
 
-def delete_kind_clusters():
-    log("INFO", "Deleting kind clusters...")
-    clusters = run("kind get clusters", capture=True).split("\n")
-    for cluster in CLUSTERS_YAML.keys():
-        if cluster in clusters:
-            log("INFO", f"Deleting cluster {cluster}")
-            run(f"kind delete cluster --name {cluster}")
-        else:
-            log("INFO", f"Cluster {cluster} does not exist, skipping.")
-
-def wait_for_clusters(timeout=300, poll_interval=5):
-    log("INFO", f"Waiting for clusters to be ready (timeout {timeout}s)...")
-    clusters = run("kind get clusters", capture=True).split("\n")
-
-    for cluster in CLUSTERS_YAML.keys():
-        if cluster not in clusters:
-            log("WARN", f"Cluster {cluster} does not exist, skipping.")
-            continue
-
-        log("INFO", f"Checking cluster {cluster}...")
-        start = time.time()
+def create_kind_clusters(workers=CREATE_WORKERS, cni_dir=None, mirrors=None, images=(), existing=None):
+    """
+    Bring up the clusters in CLUSTERS_YAML that do not exist yet, up to `workers` at a time.
 
-        while True:
-            try:
-                nodes_json = json.loads(
-                    run(f"kubectl get nodes -o json --context kind-{cluster}", capture=True)
-                )
-                not_ready_nodes = []
-                for node in nodes_json["items"]:
-                    conditions = {c["type"]: c["status"] for c in node["status"]["conditions"]}
-                    if conditions.get("Ready") != "True":
-                        not_ready_nodes.append(node["metadata"]["name"])
-
-                if not not_ready_nodes:
-                    log("OK", f"Cluster {cluster} is Ready ✅")
-                    break
-                else:
-                    log("INFO", f"Cluster {cluster} not ready yet. Pending nodes: {', '.join(not_ready_nodes)}")
+    A failing cluster does not stop the others. Once every bring-up has finished,
+    clusters that failed half way are deleted again (so a re-run starts clean)
+    and an InfraError listing all failures is raised.
+    """
+    existing = set(kind_clusters() if existing is None else existing)
+    for cluster in CLUSTERS_YAML:
+        if cluster in existing:
+            log("INFO", f"Cluster {cluster} already exists, skipping.")
+    clusters = [c for c in CLUSTERS_YAML if c not in existing]
+    if not clusters:
+        return
+    log("INFO", f"Creating {len(clusters)} kind clusters ({min(workers, len(clusters))} in parallel)")
+    start = time.time()
+    cni_dir = cni_dir or ensure_cni_plugins()
+    _, failures = run_parallel(functools.partial(create_kind_cluster, cni_dir=cni_dir, mirrors=mirrors, images=images), clusters, workers=workers)
 
-            except subprocess.CalledProcessError:
-                log("WARN", f"Cluster {cluster} API not responding yet...")
+    if not failures:
+        log("OK", f"All clusters created in {time.time() - start:.0f}s")
+        return
 
-            if time.time() - start > timeout:
-                log("ERROR", f"Timeout waiting for cluster {cluster} ❌")
-                break
+    for cluster, exc in failures.items():
+        log("ERROR", f"Cluster {cluster} failed: {exc}")
+        log("INFO", f"Removing partially created cluster {cluster}")
+        run(f"kind delete cluster --name {kind_name(cluster)}", check=False)
+    raise InfraError(
+        f"Failed to create clusters: {', '.join(sorted(failures))}", failures
+    )
 
-            time.sleep(poll_interval)
-
-            def wait_for_pods(cluster, namespace="--all-namespaces", timeout=300, poll_interval=5):
-                """
-                Wait until all pods in a cluster are running and ready.
-                
-                Parameters
-                ----------
-                cluster : str
-                    The kind cluster name (without 'kind-' prefix).
-                namespace : str
-                    Namespace to check. Default is all namespaces.
-                timeout : int
-                    Maximum wait time in seconds.
-                poll_interval : int
-                    How often to poll (seconds).
-                """
-                log("INFO", f"Waiting for pods in cluster {cluster} to be healthy (timeout {timeout}s)...")
-                start = time.time()
-
-                while True:
-                    try:
-                        pods_json = json.loads(
-                            run(f"kubectl get pods -o json {namespace} --context kind-{cluster}", capture=True)
-                        )
-                        not_ready_pods = []
-                        for pod in pods_json["items"]:
-                            name = pod["metadata"]["name"]
-                            ns = pod["metadata"]["namespace"]
-                            phase = pod["status"].get("phase", "Unknown")
-
-                            # Pod must be in Running phase
-                            if phase != "Running":
-                                not_ready_pods.append(f"{ns}/{name} ({phase})")
-                                continue
-
-                            # All containers must be ready
-                            statuses = pod["status"].get("containerStatuses", [])
-                            if not all(s.get("ready", False) for s in statuses):
-                                not_ready_pods.append(f"{ns}/{name} (containers not ready)")
-
-                        if not not_ready_pods:
-                            log("OK", f"All pods in {cluster} are healthy ✅")
-                            return True
-                        else:
-                            log("INFO", f"Cluster {cluster} has pending pods: {', '.join(not_ready_pods[:5])}" +
-                                (", ..." if len(not_ready_pods) > 5 else ""))
-
-                    except subprocess.CalledProcessError:
-                        log("WARN", f"Cluster {cluster} API not responding yet...")
-
-                    if time.time() - start > timeout:
-                        log("ERROR", f"Timeout waiting for pods in cluster {cluster} ❌")
-                        return False
+def delete_kind_clusters(workers=CREATE_WORKERS):
+    """
+    Delete the clusters in CLUSTERS_YAML, up to `workers` at a time; returns the ones that did not exist.
 
-                    time.sleep(poll_interval)
+    The deletions do not depend on each other. Once all of them have finished,
+    an InfraError listing the failed ones is raised.
+    """
+    existing = set(kind_clusters())
+    gone = [c for c in CLUSTERS_YAML if c not in existing]
+    for cluster in gone:
+        log("INFO", f"Cluster {cluster} does not exist, skipping.")
+    clusters = [c for c in CLUSTERS_YAML if c in existing]
+    if clusters:
+        log("INFO", f"Deleting {len(clusters)} kind clusters ({min(workers, len(clusters))} in parallel)")
+    _, failures = run_parallel(lambda cluster: run(f"kind delete cluster --name {kind_name(cluster)}"), clusters, workers=workers)
+    if failures:
+        for cluster, exc in failures.items():
+            log("ERROR", f"Cluster {cluster} failed: {exc}")
+        raise InfraError(f"Failed to delete clusters: {', '.join(sorted(failures))}", failures)
+    return gone
+
+def lab_containers(containers):
+    """Names among containers that belong to the lab: containerlab nodes and nodes of the kind clusters."""
+    prefixes = (f"net-{clab_name()}-", f"clab-{clab_name()}-")
+    prefixes += tuple(f"{kind_name(cluster)}-{role}" for cluster in CLUSTERS_YAML for role in ("control-plane", "worker"))
+    return sorted(name for name in containers if name.startswith(prefixes))
 
+# ----------------------------
+# READINESS
+# ----------------------------
+# Waits are event driven: the current state is listed once, then a
+# `kubectl get --watch --output-watch-events -o json` stream is parsed
+# incrementally and the condition is re-evaluated on every event, so a
+# wait returns as soon as the last object flips. Polling (with backoff)
+# is only used when the watch stream cannot be established.
+#
+# Every object that is not ready is classified as progressing, unknown or
+# terminal. A wait stops at once when one of its objects is terminal (a
+# state it will not leave without intervention) and dumps its events and
+# logs instead of running into the timeout.
+
+WATCH_RESTARTS = 3  # consecutive failed watch streams before falling back to polling
+WAIT_BACKOFF = 1  # first interval (s) between re-checks; doubles while nothing changes, resets on progress
+WATCH_RELIST = 30  # longest interval (s) between re-lists of a watched resource (time based terminal states)
+CRASHLOOP_RESTARTS = 3  # restarts after which a CrashLoopBackOff container counts as terminal
+TERMINAL_WAITING_REASONS = {"ImagePullBackOff", "ErrImageNeverPull", "InvalidImageName"}
+TERMINAL_CONDITION_REASONS = ("Failed", "Error", "Invalid")  # suffixes of Ready=False reasons, e.g. "ReconcileFailed"
+TERMINAL_GRACE = 30  # seconds such a Ready=False condition must persist (controllers retry transient failures)
+DIAGNOSTIC_LINES = 20  # events / log lines dumped per object when a wait fails fast
+
+PROGRESSING, UNKNOWN, TERMINAL = "progressing", "unknown", "terminal"
+
+class WatchUnavailable(Exception):
+    """The watch stream could not be (re)established."""
+
+class Pending(str):
+    """Description of an object that is not ready yet, with its classification and the object itself."""
+
+    def __new__(cls, text, state=PROGRESSING, obj=None):
+        self = super().__new__(cls, text)
+        self.state, self.obj = state, obj
+        return self
+
+class TerminalState(Exception):
+    """Objects a wait is on will not become ready by themselves."""
+
+    def __init__(self, pending):
+        super().__init__(_summary(pending))
+        self.pending = pending
+
+def _ns_arg(namespace):
+    if namespace in ("--all-namespaces", "-A"):
+        return "--all-namespaces"
+    if not namespace:
+        return ""
+    if namespace.startswith("-"):
+        return namespace
+    return f"-n {namespace}"
+
+def _kubectl_get(resource, name=None, namespace=None, context=None, selector=None):
+    parts = ["kubectl get", resource]
+    if name:
+        parts.append(name)
+    if _ns_arg(namespace):
+        parts.append(_ns_arg(namespace))
+    if selector:
+        parts.append(f"-l '{selector}'")
+    if context:
+        parts.append(f"--context {context}")
+    return " ".join(parts)
+
+def _object_key(obj):
+    meta = obj.get("metadata", {})
+    return (meta.get("namespace"), meta.get("name"))
+
+def list_objects(resource, name=None, namespace=None, context=None, selector=None):
+    """List objects as a list of dicts (a missing named object raises CalledProcessError)."""
+    session = kube_session(context)
+    if session:
+        return session.list(resource, name, namespace, selector)
+    out = json.loads(run(f"{_kubectl_get(resource, name, namespace, context, selector)} -o json", capture=True))
+    return [out] if name else out.get("items", [])
+
+def _age(timestamp):
+    """Seconds since an API timestamp ("2024-05-01T10:00:00Z"), 0 if missing or malformed."""
+    try:
+        return time.time() - calendar.timegm(time.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ"))
+    except (TypeError, ValueError):
+        return 0
+
+def classify_pod(pod):
+    """(state, reason) of a pod that is not ready, or None if it is Running with all containers ready."""
+    status = pod.get("status", {})
+    containers = status.get("initContainerStatuses", []) + status.get("containerStatuses", [])
+    for container in containers:
+        waiting = container.get("state", {}).get("waiting", {})
+        reason = waiting.get("reason")
+        restarts = container.get("restartCount", 0)
+        if reason in TERMINAL_WAITING_REASONS:
+            return TERMINAL, f"{container['name']}: {reason}"
+        if reason == "CrashLoopBackOff" and restarts >= CRASHLOOP_RESTARTS:
+            return TERMINAL, f"{container['name']}: {reason}, {restarts} restarts"
+    phase = status.get("phase", "Unknown")
+    if phase == "Failed":
+        return TERMINAL, f"Failed: {status.get('reason', 'pod failed')}"
+    if phase == "Unknown":
+        return UNKNOWN, phase
+    if phase != "Running":
+        return PROGRESSING, phase
+    if not all(c.get("ready", False) for c in status.get("containerStatuses", [])):
+        return PROGRESSING, "containers not ready"
+    return None
+
+def classify_conditions(obj):
+    """(state, reason) of an object whose Ready condition is not True, or None if it is Ready."""
+    conditions = {c["type"]: c for c in obj.get("status", {}).get("conditions", [])}
+    ready = conditions.get("Ready")
+    if ready and ready.get("status") == "True":
+        return None
+    not_true = [t for t, c in conditions.items() if c.get("status") != "True"]
+    reason = f"pending: {', '.join(not_true or ['Ready (missing)'])}"
+    if not ready or ready.get("status") == "Unknown":
+        return (UNKNOWN if ready else PROGRESSING), reason
+    if (ready.get("reason") or "").endswith(TERMINAL_CONDITION_REASONS) and _age(ready.get("lastTransitionTime")) >= TERMINAL_GRACE:
+        return TERMINAL, f"{ready['reason']}: {ready.get('message', '')}".rstrip(": ")
+    return PROGRESSING, reason
+
+def nodes_pending(items):
+    pending = []
+    for node in items:
+        conditions = {c["type"]: c["status"] for c in node.get("status", {}).get("conditions", [])}
+        if conditions.get("Ready") != "True":
+            pending.append(Pending(node["metadata"]["name"], obj=node))
+    return pending
+
+def pods_pending(items):
+    pending = []
+    for pod in items:
+        result = classify_pod(pod)
+        if result:
+            state, reason = result
+            pending.append(Pending(f"{pod['metadata']['namespace']}/{pod['metadata']['name']} ({reason})", state, pod))
+    return pending
+
+def conditions_pending(items):
+    pending = []
+    for res in items:
+        result = classify_conditions(res)
+        if result:
+            state, reason = result
+            pending.append(Pending(f"{res['metadata']['name']} ({reason})", state, res))
+    return pending
+
+def _summary(pending):
+    return ", ".join(pending[:5]) + (", ..." if len(pending) > 5 else "")
+
+def _evaluate(objects, pending_fn, require_items):
+    """
+    Return the list of pending descriptions, or None when there is nothing to wait on yet.
 
-def wait_for_pods(cluster, namespace="--all-namespaces", timeout=300, poll_interval=5):
+    Raises TerminalState when one of the pending objects is terminal.
+    """
+    items = list(objects.values())
+    if not items and require_items:
+        return None
+    pending = pending_fn(items)
+    if pending is None:
+        return None
+    terminal = [p for p in pending if getattr(p, "state", None) == TERMINAL]
+    if terminal:
+        raise TerminalState(terminal)
+    return pending
+
+def dump_diagnostics(pending, context=None):
+    """Log the recent events (and for pods the last log lines) of the objects a wait failed on."""
+    ctx = f" --context {context}" if context else ""
+
+    def output(cmd):
+        try:
+            return run(f"{cmd}{ctx} 2>&1", capture=True)
+        except subprocess.CalledProcessError as exc:
+            return exc.output or f"exit code {exc.returncode}"
+
+    for item in pending[:5]:
+        obj = item.obj or {}
+        meta = obj.get("metadata", {})
+        name, namespace = meta.get("name"), meta.get("namespace")
+        if not name:
+            continue
+        ns = f" -n {namespace}" if namespace else ""
+        log("ERROR", f"Diagnostics for {obj.get('kind', 'object')} {namespace + '/' if namespace else ''}{name}:")
+        events = output(f"kubectl get events{ns} --field-selector involvedObject.name={name} --sort-by=.lastTimestamp")
+        for line in (events or "no events").splitlines()[-DIAGNOSTIC_LINES:]:
+            log("ERROR", f"  {line}")
+        if obj.get("kind") != "Pod":
+            continue
+        for container in obj.get("status", {}).get("containerStatuses", []):
+            previous = " --previous" if container.get("restartCount", 0) else ""
+            logs = output(f"kubectl logs{ns} {name} -c {container['name']} --tail={DIAGNOSTIC_LINES}{previous}")
+            log("ERROR", f"  logs of {container['name']}{' (previous run)' if previous else ''}:")
+            for line in (logs or "no logs").splitlines():
+                log("ERROR", f"    {line}")
+
+def _watch_events(cmd, deadline):
     """
-    Wait until all pods in a cluster are running and ready.
-    
-    Parameters
-    ----------
-    cluster : str
-        The kind cluster name (without 'kind-' prefix).
-    namespace : str
-        Namespace to check. Default is all namespaces.
-    timeout : int
-        Maximum wait time in seconds.
-    poll_interval : int
-        How often to poll (seconds).
+    Yield watch events from a `kubectl get --watch --output-watch-events -o json` stream.
+
+    kubectl prints one (pretty printed) JSON document per event, so the stream is
+    decoded incrementally with raw_decode instead of line by line. Yields None
+    when the deadline passes; raises WatchUnavailable if the stream ends.
     """
-    log("INFO", f"Waiting for pods in cluster {cluster} to be healthy (timeout {timeout}s)...")
-    start = time.time()
+    proc = subprocess.Popen(
+        f"{cmd} -o json --watch --output-watch-events",
+        shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    try:
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                yield None
+                return
+            readable, _, _ = select.select([proc.stdout], [], [], remaining)
+            if not readable:
+                continue
+            chunk = os.read(proc.stdout.fileno(), 65536)
+            if not chunk:
+                raise WatchUnavailable(f"watch exited with code {proc.wait()}")
+            buf += text.decode(chunk)
+            while True:
+                buf = buf.lstrip()
+                if not buf:
+                    break
+                try:
+                    event, end = decoder.raw_decode(buf)
+                except json.JSONDecodeError:
+                    break  # incomplete document, wait for more data
+                buf = buf[end:]
+                yield event
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+def _wait_watch(resource, pending_fn, desc, name, namespace, context, selector, require_items, deadline):
+    cmd = _kubectl_get(resource, name, namespace, context, selector)
+    session = kube_session(context)
+    last, failures, interval = None, 0, WAIT_BACKOFF
 
     while True:
+        # Snapshot first: seeds the state and returns at once if already ready
+        objects = {}
         try:
-            pods_json = json.loads(
-                run(f"kubectl get pods -o json {namespace} --context kind-{cluster}", capture=True)
-            )
-            not_ready_pods = []
-            for pod in pods_json["items"]:
-                name = pod["metadata"]["name"]
-                ns = pod["metadata"]["namespace"]
-                phase = pod["status"].get("phase", "Unknown")
-
-                # Pod must be in Running phase
-                if phase != "Running":
-                    not_ready_pods.append(f"{ns}/{name} ({phase})")
-                    continue
-
-                # All containers must be ready
-                statuses = pod["status"].get("containerStatuses", [])
-                if not all(s.get("ready", False) for s in statuses):
-                    not_ready_pods.append(f"{ns}/{name} (containers not ready)")
-
-            if not not_ready_pods:
-                log("OK", f"All pods in {cluster} are healthy ✅")
-                return True
-            else:
-                log("INFO", f"Cluster {cluster} has pending pods: {', '.join(not_ready_pods[:5])}" +
-                    (", ..." if len(not_ready_pods) > 5 else ""))
-
+            objects = {_object_key(o): o for o in list_objects(resource, name, namespace, context, selector)}
         except subprocess.CalledProcessError:
-            log("WARN", f"Cluster {cluster} API not responding yet...")
-
-        if time.time() - start > timeout:
-            log("ERROR", f"Timeout waiting for pods in cluster {cluster} ❌")
-            return False
+            log("WARN", f"{desc} not available yet...")
+        except json.JSONDecodeError:
+            log("WARN", f"Unexpected output while listing {desc}")
 
-        time.sleep(poll_interval)
+        pending = _evaluate(objects, pending_fn, require_items)
+        if pending == []:
+            return True
 
-def wait_for_resource_ready(resource, name=None, namespace="default", timeout=300, poll_interval=5):
-    """
-    Wait until a custom resource (or all of them) reports Ready status.
-    Returns True if ready, False if timeout.
-    """
-    ns_arg = f"-n {namespace}" if namespace else ""
-    target_desc = f"{resource}/{name}" if name else f"all {resource}"
-    log("INFO", f"Waiting for {target_desc} to become Ready (timeout {timeout}s)...")
-    start = time.time()
-
-    while True:
         try:
-            if name:
-                cmd = f"kubectl get {resource} {name} {ns_arg} -o json"
-                resources = [json.loads(run(cmd, capture=True))]
+            # The stream is re-opened (and the state re-listed) with backoff, so that
+            # states that turn terminal by time alone are caught too
+            until = min(deadline, time.time() + interval)
+            interval = min(WATCH_RELIST, interval * 2)
+            if session:
+                events = session.watch(resource, name, namespace, selector, until)
             else:
-                cmd = f"kubectl get {resource} {ns_arg} -o json"
-                resources = json.loads(run(cmd, capture=True)).get("items", [])
+                events = _watch_events(cmd, until)
+            for event in events:
+                if event is None:
+                    if time.time() >= deadline:
+                        return False
+                    break
+                failures = 0
+                kind, obj = event.get("type"), event.get("object", {})
+                if kind == "DELETED":
+                    objects.pop(_object_key(obj), None)
+                elif kind in ("ADDED", "MODIFIED"):
+                    objects[_object_key(obj)] = obj
+                else:
+                    continue  # BOOKMARK / ERROR carry no object state
 
-            if not resources:
-                log("INFO", f"No {resource} found yet...")
-            else:
-                not_ready = []
-                for res in resources:
-                    rname = res["metadata"]["name"]
-                    conditions = {c["type"]: c["status"] for c in res.get("status", {}).get("conditions", [])}
-
-                    # Treat missing Ready condition as not ready
-                    if conditions.get("Ready") != "True":
-                        pending = [t for t, s in conditions.items() if s != "True"]
-                        if not pending and "Ready" not in conditions:
-                            pending = ["Ready (missing)"]
-                        not_ready.append(f"{rname} (pending: {', '.join(pending)})")
-
-                if not not_ready:
-                    log("OK", f"{target_desc} is Ready ✅")
+                pending = _evaluate(objects, pending_fn, require_items)
+                if pending == []:
                     return True
+                if pending != last:
+                    if pending is None:
+                        log("INFO", f"No {desc} found yet...")
+                    else:
+                        log("INFO", f"Still waiting on {desc}: {_summary(pending)}")
+                    last = pending
+        except WatchUnavailable:
+            failures += 1
+            span_note(retries=failures)
+            if failures >= WATCH_RESTARTS:
+                raise
+            # The API may still be coming up: back off briefly and re-list
+            time.sleep(min(1, max(0, deadline - time.time())))
+            if time.time() >= deadline:
+                return False
+
+def _wait_poll(resource, pending_fn, desc, name, namespace, context, selector, require_items, deadline, poll_interval):
+    polls, last, interval = 0, None, WAIT_BACKOFF
+    while True:
+        polls += 1
+        span_note(polls=polls)
+        try:
+            objects = {_object_key(o): o for o in list_objects(resource, name, namespace, context, selector)}
+            pending = _evaluate(objects, pending_fn, require_items)
+            if pending == []:
+                return True
+            if pending != last:
+                if pending is None:
+                    log("INFO", f"No {desc} found yet...")
                 else:
-                    log("INFO", f"Still waiting: {', '.join(not_ready[:5])}" +
-                        (", ..." if len(not_ready) > 5 else ""))
+                    log("INFO", f"Still waiting on {desc}: {_summary(pending)}")
+                # Something moved: check again soon
+                last, interval = pending, WAIT_BACKOFF
+        except (subprocess.CalledProcessError, json.JSONDecodeError):
+            log("WARN", f"{desc} not available yet...")
 
-        except subprocess.CalledProcessError:
-            log("WARN", f"{target_desc} not found yet...")
+        if time.time() >= deadline:
+            return False
+        time.sleep(max(0, min(interval, deadline - time.time())))
+        interval = min(poll_interval, interval * 2)
+
+def wait_until_ready(resource, pending_fn, desc, name=None, namespace=None, context=None,
+                     selector=None, require_items=True, timeout=300, poll_interval=5, deadline=None):
+    """
+    Block until pending_fn(objects) returns an empty list. Returns True if ready, False on
+    timeout or as soon as one of the pending objects is terminal (after dumping its diagnostics).
 
-        if time.time() - start > timeout:
-            log("ERROR", f"Timeout waiting for {target_desc} ❌")
+    pending_fn gets the current list of objects and returns descriptions (Pending) of the
+    ones that are not ready yet. With require_items an empty list counts as not ready.
+    An absolute deadline (time.time() based) overrides timeout. poll_interval is the
+    longest interval of the polling fallback, which backs off while nothing changes.
+    """
+    deadline = deadline or time.time() + timeout
+    args = (resource, pending_fn, desc, name, namespace, context, selector, require_items, deadline)
+    with span(desc, "wait", resource=resource, context=context, selector=selector, mode="watch") as info:
+        try:
+            try:
+                ready = _wait_watch(*args)
+            except WatchUnavailable:
+                log("WARN", f"Cannot watch {desc}, falling back to polling (at most every {poll_interval}s)")
+                info["mode"] = "poll"
+                ready = _wait_poll(*args, poll_interval)
+        except TerminalState as exc:
+            log("ERROR", f"{desc} will not become ready: {exc} ❌")
+            info["terminal"] = [str(p) for p in exc.pending]
+            dump_diagnostics(exc.pending, context)
             return False
+        info["ready"] = ready
+    if not ready:
+        log("ERROR", f"Timeout waiting for {desc} ❌")
+    return ready
+
+# A readiness target: every `resource` object matching `selector` in kube `context`
+# (None = current context) must be Ready. Nodes and pods use their own checks,
+# everything else the Ready condition.
+WaitTarget = namedtuple("WaitTarget", ["context", "resource", "selector"])
+WaitTarget.__new__.__defaults__ = (None,)
+
+def _target_label(target):
+    desc = f"{target.context or 'current'}/{target.resource}"
+    return f"{desc} -l {target.selector}" if target.selector else desc
+
+def _wait_target(target, deadline, poll_interval):
+    if target.resource == "nodes":
+        pending_fn, namespace, require_items = nodes_pending, None, False
+    elif target.resource == "pods":
+        pending_fn, namespace, require_items = pods_pending, "--all-namespaces", False
+    else:
+        pending_fn, namespace, require_items = conditions_pending, "default", True
 
-        time.sleep(poll_interval)
+    start = time.time()
+    ready = wait_until_ready(target.resource, pending_fn, target.resource, namespace=namespace,
+                             context=target.context, selector=target.selector,
+                             require_items=require_items, poll_interval=poll_interval, deadline=deadline)
+    return time.time() - start if ready else None
+
+def wait_all(targets, timeout=300, poll_interval=5):
+    """
+    Wait on all targets concurrently under one shared deadline.
+
+    Returns {target: seconds until Ready, or None if it timed out} and logs the
+    latency of every target.
+    """
+    targets = list(targets)
+    if not targets:
+        return {}
+    log("INFO", f"Waiting for {len(targets)} target(s) to become Ready (timeout {timeout}s)...")
+    deadline = time.time() + timeout
+    results, failures = run_parallel(
+        lambda t: _wait_target(t, deadline, poll_interval), targets, label=_target_label
+    )
+    for target, exc in failures.items():
+        log("ERROR", f"{_target_label(target)}: {exc}")
+        results[target] = None
+
+    for target in targets:
+        latency = results[target]
+        if latency is None:
+            log("ERROR", f"  {_target_label(target):<50} not ready ❌")
+        else:
+            log("OK", f"  {_target_label(target):<50} ready after {latency:.1f}s")
+    return results
+
+def wait_for_clusters(timeout=300, poll_interval=5):
+    log("INFO", f"Waiting for clusters to be ready (timeout {timeout}s)...")
+    clusters = kind_clusters()
+
+    targets = []
+    for cluster in CLUSTERS_YAML.keys():
+        if cluster not in clusters:
+            log("WARN", f"Cluster {cluster} does not exist, skipping.")
+            continue
+        targets.append(WaitTarget(kube_context(cluster), "nodes"))
 
+    results = wait_all(targets, timeout=timeout, poll_interval=poll_interval)
+    return all(latency is not None for latency in results.values())
 
 
 # ----------------------------
 # Create interfaces for vlan
 # ----------------------------
 
-def create_vlan_interfaces(clusters_yaml=CLUSTERS_YAML):
+def desired_vlans(context=None):
+    """
+    VLAN ids the workers need an interface for, or None before the VLANIndex has a range.
+
+    These are the ids of the allocated VLANClaims that fall inside the index range,
+    or the whole range while nothing has been claimed yet.
+    """
+    vlan_range = None
+    for index in list_objects("vlanindices.vlan.be.kuid.dev", context=context):
+        status = index.get("status", {})
+        if index["metadata"]["name"] == TOPOLOGY_NAME and "minID" in status:
+            vlan_range = list(range(status["minID"], status.get("maxID", status["minID"]) + 1))
+    if vlan_range is None:
+        return None
+    claimed = {claim.get("status", {}).get("id") for claim in list_objects("vlanclaims.vlan.be.kuid.dev", context=context)}
+    return [v for v in vlan_range if v in claimed] or vlan_range
+
+def vlan_placement(vlanclaims, ipclaims):
+    """{site: [vlan ids]} of the allocated VLANClaims whose network has an IPClaim selecting the site."""
+    vlans = {}
+    for claim in vlanclaims:
+        if claim.get("status", {}).get("id") is not None:
+            vlans[claim["metadata"].get("labels", {}).get(NETWORK_LABEL, claim["metadata"]["name"])] = claim["status"]["id"]
+    placement = {}
+    for claim in ipclaims:
+        network = claim["metadata"].get("labels", {}).get(NETWORK_LABEL)
+        site = claim.get("spec", {}).get("selector", {}).get("matchLabels", {}).get(SITE_LABEL)
+        if network in vlans and site:
+            placement.setdefault(site, set()).add(vlans[network])
+    return {site: sorted(ids) for site, ids in placement.items()}
+
+def vlan_targets(clusters, placement=None, context=None):
+    """
+    {cluster: [vlan ids]} its workers need an interface for, or None before the VLANIndex has a range.
+
+    With the "all" placement every cluster gets desired_vlans(); with "claims" a
+    cluster only gets the ones vlan_placement() assigns to the site of the same name.
+    """
+    placement = placement or VLAN_PLACEMENT
+    if placement not in VLAN_PLACEMENTS:
+        raise InfraError(f"Unknown VLAN placement '{placement}' (choose from: {', '.join(VLAN_PLACEMENTS)})")
+    desired = desired_vlans(context)
+    if not desired:
+        return None
+    if placement == "all":
+        return {cluster: desired for cluster in clusters}
+    sites = vlan_placement(
+        list_objects("vlanclaims.vlan.be.kuid.dev", context=context),
+        list_objects("ipclaims.ipam.be.kuid.dev", context=context),
+    )
+    for site in sorted(set(sites) - set(clusters)):
+        log("WARN", f"IPClaims select site '{site}', which is not a cluster of this lab")
+    return {cluster: [v for v in sites.get(cluster, []) if v in desired] for cluster in clusters}
+
+def create_vlan_interfaces(clusters_yaml=CLUSTERS_YAML, placement=None):
     """
-    Create VLAN interfaces on worker nodes for all clusters.
+    Converge the VLAN interfaces of the worker nodes of all clusters on vlan_targets().
 
-    This function is idempotent: running it multiple times will not cause errors
-    if VLAN interfaces already exist.
+    Workers are provisioned in parallel, each with one link listing and at most one
+    `ip -batch` run; interfaces of VLANs that are no longer wanted are removed.
     """
     try:
-        vlan_indices = json.loads(
-            run(f"kubectl get vlanindices.vlan.be.kuid.dev {TOPOLOGY_NAME} -o json", capture=True)
-        )["status"]
-        vlan_min = vlan_indices.get("minID")
-        vlan_max = vlan_indices.get("maxID", vlan_min)
-    except (KeyError, subprocess.CalledProcessError, json.JSONDecodeError):
+        targets = vlan_targets(clusters_yaml, placement)
+    except (subprocess.CalledProcessError, json.JSONDecodeError):
+        targets = None
+    if not targets:
         log("ERROR", "Failed to fetch VLAN index range")
-        return
+        return False
+
+    for cluster, vlans in targets.items():
+        summary = f"{len(vlans)} VLAN IDs ({vlans[0]}–{vlans[-1]})" if vlans else "no VLAN IDs"
+        log("INFO", f"Provisioning VLAN interfaces for {summary} on {cluster}")
+
+    workers, failures = run_parallel(worker_nodes, clusters_yaml)
+    for cluster, exc in failures.items():
+        log("WARN", f"Failed to get worker nodes for {cluster}, skipping: {exc}")
+    nodes = {node: targets[cluster] for cluster in clusters_yaml if cluster in workers for node in workers[cluster]}
+
+    results, errors = run_parallel(lambda node: sync_vlan_interfaces(node, nodes[node]), nodes)
+    for node, vlans in nodes.items():
+        if node in errors:
+            log("ERROR", f"Failed to provision VLAN interfaces on {node}: {errors[node]}")
+        elif any(results[node].values()):
+            log("OK", f"{node}: " + ", ".join(f"{len(v)} {k}" for k, v in results[node].items() if v))
+        else:
+            log("INFO", f"{node}: all {len(vlans)} VLAN interfaces already in place, skipping.")
+    return not errors
+
+# ----------------------------
+# NETWORK CR GENERATION
+# ----------------------------
 
-    log("INFO", f"Creating VLAN interfaces for VLAN IDs {vlan_min}–{vlan_max}")
+NETWORK_LABEL = "nephio.org/network-name"
+SITE_LABEL = "nephio.org/site"
 
-    for cluster in clusters_yaml.keys():
-        try:
-            cmd = (
-                f"kubectl get nodes "
-                f"-l node-role.kubernetes.io/control-plane!= "
-                f"-o jsonpath='{{range .items[*]}}{{.metadata.name}}{{\"\\n\"}}{{end}}' "
-                f"--context kind-{cluster}"
-            )
-            worker_nodes = run(cmd, capture=True).splitlines()
-        except subprocess.CalledProcessError:
-            log("WARN", f"Failed to get worker nodes for {cluster}, skipping.")
+def build_claim_index(vlanclaims, ipclaims):
+    """
+    Index one snapshot of VLANClaims and IPClaims by network.
+
+    Returns {network: {"vlan": id, "sites": {site: address}}}, in VLANClaim order.
+    VLANClaims are keyed by their network-name label (falling back to their name),
+    IPClaims by their network-name label and the site they select.
+    """
+    index = {}
+    for claim in vlanclaims:
+        network = claim["metadata"].get("labels", {}).get(NETWORK_LABEL, claim["metadata"]["name"])
+        vlan = claim.get("status", {}).get("id")
+        if vlan is None:
+            log("WARN", f"VLANClaim {claim['metadata']['name']} has no VLAN ID yet, skipping.")
             continue
+        index.setdefault(network, {"vlan": vlan, "sites": {}})
 
-        for worker in worker_nodes:
-            for vlan_id in range(vlan_min, vlan_max + 1):
-                iface = f"eth1.{vlan_id}"
+    for claim in ipclaims:
+        network = claim["metadata"].get("labels", {}).get(NETWORK_LABEL)
+        site = claim.get("spec", {}).get("selector", {}).get("matchLabels", {}).get(SITE_LABEL)
+        address = claim.get("status", {}).get("address")
+        if network not in index or not site:
+            continue
+        if not address:
+            log("WARN", f"IPClaim {claim['metadata']['name']} has no address yet, skipping.")
+            continue
+        index[network]["sites"][site] = address
+    return index
 
-                # Check if VLAN interface already exists
-                try:
-                    run(f"docker exec {worker} ip link show {iface}", check=True)
-                    log("INFO", f"{worker}: {iface} already exists, skipping.")
-                    continue
-                except subprocess.CalledProcessError:
-                    pass  # Interface does not exist → safe to create
+class IDPool:
+    """Bitmap of the integer IDs in [low, high]; allocate() hands out the lowest free one."""
 
-                # Create VLAN interface
-                try:
-                    run(f"docker exec {worker} ip link add link eth1 name {iface} type vlan id {vlan_id}")
-                    run(f"docker exec {worker} ip link set up {iface}")
-                    log("OK", f"{worker}: created {iface}")
-                except subprocess.CalledProcessError:
-                    log("ERROR", f"Failed to create {iface} on {worker}")
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+        self.bits = bytearray((high - low) // 8 + 1)
+        self.scan = 0  # bytes below this one are full: IDs are never released
 
-# ----------------------------
-# NETWORK CR GENERATION
-# ----------------------------
+    def used(self):
+        """Number of IDs in use."""
+        return bin(int.from_bytes(self.bits, "little")).count("1")
 
-def generate_network_crs(output_file="network-crs.yaml"):
+    def __contains__(self, value):
+        i = value - self.low
+        return 0 <= value - self.low <= self.high - self.low and bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+    def reserve(self, value):
+        """Mark value as used; returns False if it is out of range or already taken."""
+        if not self.low <= value <= self.high or value in self:
+            return False
+        i = value - self.low
+        self.bits[i >> 3] |= 1 << (i & 7)
+        return True
+
+    def allocate(self):
+        for byte_index in range(self.scan, len(self.bits)):
+            if self.bits[byte_index] == 0xFF:
+                self.scan = byte_index + 1
+                continue
+            for bit in range(8):
+                value = self.low + byte_index * 8 + bit
+                if value > self.high:
+                    break
+                if self.reserve(value):
+                    return value
+        raise InfraError(f"No free IDs left in {self.low}-{self.high}")
+
+class NetworkIDAllocator:
+    """
+    Stable networkIDs for generated Network CRs, persisted in NETWORK_IDS_FILE.
+
+    IDs are keyed by "bd/<network>/<site>" (bridge domains) and "rt/<network>"
+    (routing tables) and share one pool, so they never collide. An ID once
+    handed out is kept across runs, so regenerating produces identical CRs.
+    """
+
+    def __init__(self, path=None, id_range=NETWORK_ID_RANGE):
+        path = self.path = path or NETWORK_IDS_FILE
+        self.pool = IDPool(*id_range)
+        self.ids = {}
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            saved = {}
+        for key, value in sorted(saved.items()):
+            self._claim(key, value)
+
+    def _claim(self, key, value):
+        if key in self.ids:
+            return
+        if self.pool.reserve(value):
+            self.ids[key] = value
+        else:
+            log("WARN", f"networkID {value} for {key} is taken or out of range, it will be re-allocated")
+
+    def seed(self, networks):
+        """Adopt the IDs of existing Network CRs for keys that have none yet."""
+        for net in networks:
+            network = net["metadata"]["name"].split(".vpc-", 1)[-1]
+            for bd in net.get("spec", {}).get("bridgeDomains", []):
+                if bd.get("name", "").endswith("-bd") and "networkID" in bd:
+                    self._claim(f"bd/{network}/{bd['name'][:-len('-bd')]}", bd["networkID"])
+            for rt in net.get("spec", {}).get("routingTables", []):
+                if "networkID" in rt:
+                    self._claim(f"rt/{network}", rt["networkID"])
+
+    def get(self, key):
+        if key not in self.ids:
+            self.ids[key] = self.pool.allocate()
+        return self.ids[key]
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(sorted(self.ids.items())), f, indent=2)
+        os.replace(tmp, self.path)
+
+def cr_hash(obj):
+    """Content hash of a CR, ignoring its own hash annotation."""
+    obj = json.loads(json.dumps(obj))
+    obj.get("metadata", {}).get("annotations", {}).pop(SPEC_HASH_ANNOTATION, None)
+    if not obj.get("metadata", {}).get("annotations", True):
+        del obj["metadata"]["annotations"]
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()[:16]
+
+def annotate_hash(obj):
+    obj["metadata"].setdefault("annotations", {})[SPEC_HASH_ANNOTATION] = cr_hash(obj)
+    return obj
+
+def dump_cr(obj):
+    """One document of a multi-document YAML stream."""
+    return "---\n" + yaml.dump(obj, Dumper=YAML_DUMPER, sort_keys=False)
+
+def iter_crs(path):
+    """Parse a multi-document YAML file one document at a time."""
+    with open(path) as f:
+        for doc in yaml.load_all(f, Loader=YAML_LOADER):
+            if doc:
+                yield doc
+
+def read_crs(path):
+    return list(iter_crs(path))
+
+def generate_network_crs(output_file=None):
+    output_file = output_file or OUTPUT_CRS_FILE
 
     log("INFO", "Fetching VLAN and IP claims...")
-    vlans={}
-    ips={}
-    intefaces=[json.loads(run("kubectl get vlanclaims.vlan.be.kuid.dev -o json", capture=True))["items"][i]["metadata"]["name"] for i in range(0,len(json.loads(run("kubectl get vlanclaims.vlan.be.kuid.dev -o json", capture=True))["items"]))]
     try:
-        for i in intefaces:
-            vlans.update({i: json.loads(run(f"kubectl get vlanclaims.vlan.be.kuid.dev -l nephio.org/network-name={i} -o json", capture=True))["items"][0]["status"]["id"]})
-            ipclaim=json.loads(run(f"kubectl get ipclaims.ipam.be.kuid.dev -l nephio.org/network-name={i} -o json", capture=True))["items"]
-            val=[]
-            for c in range(0,len(ipclaim)):
-                val.append({"node":ipclaim[c]["spec"]["selector"]["matchLabels"]["nephio.org/site"],"address":ipclaim[c]["status"]["address"]})
-            ips.update({i: val})
-    except subprocess.CalledProcessError:
+        # One snapshot of each claim type, however many networks there are
+        claims = build_claim_index(
+            list_objects("vlanclaims.vlan.be.kuid.dev"),
+            list_objects("ipclaims.ipam.be.kuid.dev"),
+        )
+    except (subprocess.CalledProcessError, json.JSONDecodeError):
         log("ERROR", "Failed to fetch VLAN or IP claims")
         return
 
-    vpcs=[]
-    # random network id this is used for interfaces
-    network_id = []
-    for i in intefaces:
-        test={}
-        bridge = []
-        routing = []
-        test={
-              "apiVersion": "network.app.kuid.dev/v1alpha1",
-              "kind": "Network",
-              "metadata": {"name":f"5g.vpc-{i}"},
-              "spec": {
-                "topology": f"{TOPOLOGY_NAME}"
-                }
-            }
-        for claim in ips[i]:
-            tmp=[x for x in random.sample(range(1, 1000), 3) if x not in network_id]
-            network_id.append(tmp)
-            bridge.append({
-                "name": f"{claim['node']}-bd",
-                "networkID": tmp[0],
-                "interfaces": [{
-                "endpoint": ENDPOINT_BASE[claim["node"]],
-                "node": DEFAULT_NODE,
-                "region": DEFAULT_REGION,
-                "site": DEFAULT_SITE,
-                "vlanID": vlans[i]                
-                }
-                ]
-                })
-            routing.append({
-                "name": f"{i}-rt",
-                "networkID": random.randint(1,1000),
-                "interfaces": [{
-                "bridgeDomain":f"{claim['node']}-bd",
-                "node": DEFAULT_NODE,
-                "region": DEFAULT_REGION,
-                "site": DEFAULT_SITE,
-                "vlanID": vlans[i],
-                "addresses": [{"address":claim["address"]}]                
+    network_ids = NetworkIDAllocator()
+    try:
+        network_ids.seed(list_objects("networks.network.app.kuid.dev"))
+    except (subprocess.CalledProcessError, json.JSONDecodeError):
+        log("WARN", "Could not list existing Network CRs, using saved networkIDs only")
+    if write_network_crs(claims, network_ids, output_file):
+        network_ids.save()
+
+def write_network_crs(claims, network_ids, output_file):
+    """Write the Network CRs of a claim index (see build_claim_index) to output_file; returns how many."""
+    # Sorted, so the output does not depend on the order the API returns objects in
+    intefaces = sorted(claims)
+    vlans = {i: claims[i]["vlan"] for i in intefaces}
+    ips = {i: [{"node": site, "address": address} for site, address in sorted(claims[i]["sites"].items())] for i in intefaces}
+
+    def network_crs():
+        for i in intefaces:
+            test={}
+            bridge = []
+            routing = []
+            test={
+                  "apiVersion": "network.app.kuid.dev/v1alpha1",
+                  "kind": "Network",
+                  "metadata": {"name":f"{TOPOLOGY_NAME}.vpc-{i}"},
+                  "spec": {
+                    "topology": f"{TOPOLOGY_NAME}"
+                    }
                 }
-                ]
-                })
-        test["spec"].update({"bridgeDomains":bridge})
-        test["spec"].update({"routingTables":routing})
-        vpcs.append(test)
-
-    if not vpcs:
+            for claim in ips[i]:
+                bridge.append({
+                    "name": f"{claim['node']}-bd",
+                    "networkID": network_ids.get(f"bd/{i}/{claim['node']}"),
+                    # one interface per worker of the site
+                    "interfaces": [{
+                    "endpoint": port,
+                    "node": leaf,
+                    "region": DEFAULT_REGION,
+                    "site": DEFAULT_SITE,
+                    "vlanID": vlans[i]                
+                    } for leaf, port in site_endpoints(claim["node"])
+                    ]
+                    })
+                routing.append({
+                    "name": f"{i}-rt",
+                    "networkID": network_ids.get(f"rt/{i}"),
+                    "interfaces": [{
+                    "bridgeDomain":f"{claim['node']}-bd",
+                    "node": SITE_NODES.get(claim["node"], DEFAULT_NODE),
+                    "region": DEFAULT_REGION,
+                    "site": DEFAULT_SITE,
+                    "vlanID": vlans[i],
+                    "addresses": [{"address":claim["address"]}]                
+                    }
+                    ]
+                    })
+            test["spec"].update({"bridgeDomains":bridge})
+            test["spec"].update({"routingTables":routing})
+            yield annotate_hash(test)
+
+    # Every CR goes to disk as soon as it is built; of the previous file only the hashes are kept
+    try:
+        previous = {cr_hash(doc) for doc in iter_crs(output_file)}
+    except (OSError, yaml.YAMLError):
+        previous = set()
+    count = changed = 0
+    tmp = f"{output_file}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            for vpc in network_crs():
+                f.write(dump_cr(vpc))
+                count += 1
+                changed += vpc["metadata"]["annotations"][SPEC_HASH_ANNOTATION] not in previous
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+    if not count:
+        os.remove(tmp)
         log("WARN", "No Network CRs generated (missing claims or mappings).")
+        return 0
+
+    if os.path.exists(output_file) and sha256_file(tmp) == sha256_file(output_file):
+        os.remove(tmp)
+        log("INFO", f"Generated {count} VPC, {output_file} is unchanged")
+        return count
+    os.replace(tmp, output_file)
+    log("INFO", f"Generated {count} VPC Generated ({changed} changed) → {output_file}")
+    return count
+
+def _config_network(config):
+    """Network a sdc Config was rendered from: its owner, or its name without the trailing ".<node>"."""
+    owners = [r["name"] for r in config["metadata"].get("ownerReferences", []) if r.get("kind") == "Network"]
+    return owners[0] if owners else config["metadata"]["name"].rsplit(".", 1)[0]
+
+def _configs_pending(networks):
+    """pending_fn that only looks at the Configs of the given Networks."""
+    def pending(items):
+        affected = [c for c in items if _config_network(c) in networks]
+        if not affected:
+            return None
+        missing = networks - {_config_network(c) for c in affected}
+        return conditions_pending(affected) + [f"{n} (no Config yet)" for n in sorted(missing)]
+    return pending
+
+def apply_network_crs(force=False):
+    """
+    Apply the generated CRs to the current kube-context.
+
+    Only CRs whose content hash differs from the one annotated on the live object
+    are applied (server-side apply), and only their Configs are waited on.
+    force=True applies every CR. The file is streamed and applied in batches of
+    APPLY_BATCH_SIZE, so only one batch is held in memory at a time.
+    """
+    if not os.path.exists(OUTPUT_CRS_FILE):
+        log("ERROR", f"Failed to read {OUTPUT_CRS_FILE}: it does not exist (run gen-crs first)")
         return
 
-    with open(output_file, "w") as f:
-        for vpc in vpcs:
-            f.write("---\n")
-            yaml.safe_dump(vpc, f, sort_keys=False)
+    live = {}
+    if not force:
+        try:
+            with span("diff"):
+                live = {
+                    n["metadata"]["name"]: n["metadata"].get("annotations", {}).get(SPEC_HASH_ANNOTATION)
+                    for n in list_objects("networks.network.app.kuid.dev")
+                }
+        except (subprocess.CalledProcessError, json.JSONDecodeError):
+            log("WARN", "Could not list live Network CRs, applying all of them")
+            force = True
 
-    log("INFO", f"Generated {len(vpcs)} VPC Generated → {output_file}")
+    total, changed = 0, []
+
+    def changed_crs():
+        nonlocal total
+        for cr in iter_crs(OUTPUT_CRS_FILE):
+            total += 1
+            cr = annotate_hash(cr)
+            if force or live.get(cr["metadata"]["name"]) != cr["metadata"]["annotations"][SPEC_HASH_ANNOTATION]:
+                yield cr
 
-def apply_network_crs():
-    """Apply the generated CRs to the current kube-context."""
     try:
-        run(f"kubectl apply -f {OUTPUT_CRS_FILE}")
-        log("OK", f"Applied {OUTPUT_CRS_FILE}")
-        wait_for_resource_ready(resource="configs.config.sdcio.dev")
+        with span("apply") as info:
+            session = kube_session()
+            for batch in batched(changed_crs(), APPLY_BATCH_SIZE):
+                log("INFO", f"Applying {len(batch)} Network CRs")
+                if session:
+                    for cr in batch:
+                        session.apply(cr)
+                        log("INFO", f"network/{cr['metadata']['name']} serverside-applied")
+                else:
+                    run(
+                        "kubectl apply --server-side --force-conflicts --field-manager=infra-manager -f -",
+                        input="".join(dump_cr(cr) for cr in batch),
+                    )
+                changed.extend(cr["metadata"]["name"] for cr in batch)
+            info["crs"] = len(changed)
+    except (OSError, yaml.YAMLError) as exc:
+        log("ERROR", f"Failed to read {OUTPUT_CRS_FILE}: {exc}")
+        return
     except subprocess.CalledProcessError:
         log("ERROR", f"Failed to apply {OUTPUT_CRS_FILE}")
+        return
+
+    if not changed:
+        log("OK", f"All {total} Network CRs in {OUTPUT_CRS_FILE} are up to date")
+        return
+    log("OK", f"Applied {len(changed)} of {total} Network CRs from {OUTPUT_CRS_FILE}")
+
+    networks = set(changed)
+    log("INFO", f"Waiting for the configs.config.sdcio.dev of {len(networks)} Network(s) to become Ready...")
+    with span("wait-configs"):
+        ready = wait_until_ready("configs.config.sdcio.dev", _configs_pending(networks),
+                                 "configs.config.sdcio.dev", namespace="default")
+    if ready:
+        log("OK", "configs.config.sdcio.dev is Ready ✅")
+
+# ----------------------------
+# PLAN SIMULATION
+# ----------------------------
+# `simulate` allocates the VLAN and IP claims of the network plan offline, the way
+# kuid-server would: static claims first, then the dynamic ones in manifest order,
+# each from the lowest free ID or address. A VLANIndex is an IDPool bitmap. The
+# prefixes of an IPIndex (its own, the NetworkConfig ones and static prefix claims)
+# sit in a PrefixTrie, which finds overlaps and the prefix an address lies in, and
+# every network prefix has an IDPool of its host addresses. The claims then go
+# through build_claim_index and write_network_crs like those gen-crs reads back.
+PLANNED_CRS_FILE = "network-crs.planned.yaml"
+SIM_MAX_HOSTS = 1 << 20  # host addresses simulated per prefix (an IPv6 /64 has 2^64)
+
+class PrefixTrie:
+    """Binary trie of the prefixes of one address family, with a value per prefix."""
+
+    def __init__(self):
+        self.root = [None, None, None]  # child for bit 0, child for bit 1, (prefix, value)
+
+    @staticmethod
+    def _bits(net):
+        value = int(net.network_address) >> (net.max_prefixlen - net.prefixlen)
+        return [(value >> shift) & 1 for shift in range(net.prefixlen - 1, -1, -1)]
+
+    def insert(self, net, value):
+        node = self.root
+        for bit in self._bits(net):
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = (net, value)
+
+    def covering(self, net):
+        """(prefix, value) of the prefixes that contain net, net included, shortest first."""
+        found, node = [], self.root
+        for bit in self._bits(net):
+            if node[2]:
+                found.append(node[2])
+            node = node[bit]
+            if node is None:
+                return found
+        return found + [node[2]] if node[2] else found
+
+    def covered(self, net):
+        """(prefix, value) of the prefixes inside net, net excluded."""
+        node = self.root
+        for bit in self._bits(net):
+            node = node[bit]
+            if node is None:
+                return []
+        found, stack = [], [node[0], node[1]]
+        while stack:
+            node = stack.pop()
+            if node:
+                if node[2]:
+                    found.append(node[2])
+                stack += [node[0], node[1]]
+        return found
+
+def _host_pool(net):
+    """IDPool of the host offsets of a network prefix: no network and broadcast address in IPv4."""
+    low, high = 0, net.num_addresses - 1
+    if net.version == 4 and net.prefixlen < 31:
+        low, high = 1, high - 1
+    return IDPool(low, min(high, low + SIM_MAX_HOSTS - 1))
+
+def simulate_plan(docs):
+    """
+    Allocate the VLAN and IP claims among docs (network-plan manifests) without a cluster.
+
+    Returns (vlanclaims, ipclaims, conflicts, usage): copies of the claims with the
+    status kuid would give them (none for rejected ones), [{"kind", "name", "problem"}]
+    and {pool: [used, size]} of the VLAN indices and network prefixes.
+    """
+    conflicts, pools = [], {}
+
+    def conflict(obj, problem):
+        conflicts.append({"kind": obj.get("kind"), "name": (obj.get("metadata") or {}).get("name"), "problem": problem})
+
+    by_kind, seen = defaultdict(list), set()
+    for doc in docs:
+        key = (doc.get("kind"), (doc.get("metadata") or {}).get("name"))
+        if key in seen:
+            conflict(doc, "defined more than once, the first one is used")
+            continue
+        seen.add(key)
+        by_kind[key[0]].append({k: v for k, v in doc.items() if k != "status"})
+
+    for index in by_kind["VLANIndex"]:
+        spec = index.get("spec") or {}
+        low, high = spec.get("minID", 1), spec.get("maxID", 4094)
+        if not 1 <= low <= high <= 4094:
+            conflict(index, f"VLAN range {low}-{high} is not within 1-4094")
+            continue
+        pools[f"VLANIndex {index['metadata']['name']}"] = IDPool(low, high)
+    # Static IDs first, so the dynamic claims cannot take them
+    for claim in sorted(by_kind["VLANClaim"], key=lambda c: "id" not in (c.get("spec") or {})):
+        spec = claim.get("spec") or {}
+        pool = pools.get(f"VLANIndex {spec.get('index')}")
+        if pool is None:
+            conflict(claim, f"no VLANIndex {spec.get('index')}")
+        elif "id" in spec:
+            if pool.reserve(spec["id"]):
+                claim["status"] = {"id": spec["id"]}
+            else:
+                conflict(claim, f"VLAN {spec['id']} is taken or outside {pool.low}-{pool.high}")
+        else:
+            try:
+                claim["status"] = {"id": pool.allocate()}
+            except InfraError:
+                conflict(claim, f"VLANIndex {spec['index']} is exhausted ({pool.low}-{pool.high})")
+
+    tries, selectable = {}, defaultdict(list)  # (index, IP version) -> PrefixTrie; (index, label) -> [(net, pool)]
+
+    def add_prefix(obj, index, prefix, labels, network):
+        """
+        Insert a prefix into the trie of an IPIndex. Aggregates (the IPIndex's own
+        prefixes) must not overlap anything, network prefixes must lie in an aggregate.
+        """
+        try:
+            net = ipaddress.ip_network(prefix)
+        except ValueError as exc:
+            conflict(obj, f"invalid prefix: {exc}")
+            return False
+        trie = tries.setdefault((index, net.version), PrefixTrie())
+        covering = trie.covering(net)
+        clashes = [p for p, pool in covering if not network or pool or p == net] + [p for p, _ in trie.covered(net)]
+        if clashes:
+            conflict(obj, f"{net} overlaps {', '.join(map(str, clashes))} in IPIndex {index}")
+            return False
+        if network and not covering:
+            conflict(obj, f"{net} is not within a prefix of IPIndex {index}")
+            return False
+        pool = _host_pool(net) if network else None
+        trie.insert(net, pool)
+        if network:
+            pools[f"{index} {net}"] = pool
+            for label in (labels or {}).items():
+                selectable[(index, label)].append((net, pool, labels))
+        return True
+
+    ip_indices = set()
+    for index in by_kind["IPIndex"]:
+        name = index["metadata"]["name"]
+        ip_indices.add(name)
+        for prefix in (index.get("spec") or {}).get("prefixes") or []:
+            add_prefix(index, name, prefix.get("prefix"), prefix.get("labels"), network=False)
+    # A NetworkConfig claims its prefixes in the IPIndex of the same name
+    for config in by_kind["NetworkConfig"]:
+        name = config["metadata"]["name"]
+        if name not in ip_indices:
+            conflict(config, f"no IPIndex {name}")
+            continue
+        for prefix in (config.get("spec") or {}).get("prefixes") or []:
+            add_prefix(config, name, prefix.get("prefix"), prefix.get("labels"), network=True)
+
+    # Static prefixes and addresses first, so the dynamic claims cannot take them
+    ipclaims = by_kind["IPClaim"]
+    for claim in sorted(ipclaims, key=lambda c: not {"prefix", "address"} & set(c.get("spec") or {})):
+        spec = claim.get("spec") or {}
+        index = spec.get("index")
+        if index not in ip_indices:
+            conflict(claim, f"no IPIndex {index}")
+            continue
+        if "prefix" in spec:
+            if add_prefix(claim, index, spec["prefix"], spec.get("labels"), network=True):
+                claim["status"] = {"prefix": spec["prefix"]}
+            continue
+
+        if "address" in spec:
+            try:
+                address = ipaddress.ip_interface(spec["address"]).ip
+            except ValueError as exc:
+                conflict(claim, f"invalid address: {exc}")
+                continue
+            trie = tries.get((index, address.version))
+            networks = [(p, pool) for p, pool in trie.covering(ipaddress.ip_network(address)) if pool] if trie else []
+            if not networks:
+                conflict(claim, f"{address} is not within a network prefix of IPIndex {index}")
+                continue
+            net, pool = networks[-1]
+            offset = int(address) - int(net.network_address)
+            if not pool.reserve(offset):
+                conflict(claim, f"{address} is taken or not a host address of {net}")
+                continue
+        else:
+            selector = sorted(((spec.get("selector") or {}).get("matchLabels") or {}).items())
+            if not selector:
+                conflict(claim, "needs a selector, a prefix or an address")
+                continue
+            candidates = min((selectable[(index, label)] for label in selector), key=len)
+            matches = [(p, pool) for p, pool, labels in candidates if all(labels.get(k) == v for k, v in selector)]
+            if len(matches) != 1:
+                found = ", ".join(str(p) for p, _ in matches) or "no network prefix"
+                conflict(claim, f"selector {dict(selector)} matches {found} in IPIndex {index}")
+                continue
+            net, pool = matches[0]
+            try:
+                offset = pool.allocate()
+            except InfraError:
+                conflict(claim, f"{net} in IPIndex {index} is exhausted")
+                continue
+        claim["status"] = {"address": f"{net.network_address + offset}/{net.prefixlen}"}
+
+    usage = {name: [pool.used(), pool.high - pool.low + 1] for name, pool in pools.items()}
+    return by_kind["VLANClaim"], ipclaims, conflicts, usage
+
+def plan_manifests(extra=()):
+    """Paths of the manifests network-plan applies, in step order, then the extra ones."""
+    steps = [os.path.join(PLAN_DIR, step["manifest"]) for step in PLAN_STEPS.values() if "manifest" in step]
+    return steps + [path for path in extra if path not in steps]
+
+def simulate_network_crs(extra=(), output_file=None, as_json=False):
+    """
+    Simulate the network plan (see simulate_plan), write the Network CRs it would
+    lead to and report the conflicts. Returns True if there are none.
+    """
+    output_file = output_file or PLANNED_CRS_FILE
+    docs = []
+    for path in plan_manifests(extra):
+        try:
+            docs.extend(iter_crs(path))
+        except (OSError, yaml.YAMLError) as exc:
+            raise InfraError(f"Cannot read {path}: {exc}")
+    started = time.time()
+    vlanclaims, ipclaims, conflicts, usage = simulate_plan(docs)
+    elapsed = time.time() - started
+    # Saved networkIDs are reused so the CRs match gen-crs; new ones are not persisted
+    try:
+        with contextlib.redirect_stdout(sys.stderr) if as_json else contextlib.nullcontext():
+            count = write_network_crs(build_claim_index(vlanclaims, ipclaims), NetworkIDAllocator(), output_file)
+    except InfraError as exc:
+        count = 0
+        conflicts.append({"kind": "Network", "name": None, "problem": f"{exc} (NETWORK_ID_RANGE)"})
+
+    if as_json:
+        print(json.dumps({"crs": count, "output": output_file, "vlanclaims": len(vlanclaims), "ipclaims": len(ipclaims),
+                          "conflicts": conflicts, "usage": usage, "elapsed": round(elapsed, 3)}, indent=2))
+        return not conflicts
+    log("INFO", "Fullest pools:")
+    for pool, (used, size) in sorted(usage.items(), key=lambda item: item[1][0] / item[1][1], reverse=True)[:5]:
+        log("INFO", f"  {pool:<40} {used}/{size} used")
+    for entry in conflicts:
+        log("ERROR", f"{entry['kind']} {entry['name'] or '*'}: {entry['problem']}")
+    summary = f"{len(vlanclaims)} VLAN and {len(ipclaims)} IP claims simulated in {elapsed * 1000:.0f}ms"
+    if conflicts:
+        log("ERROR", f"{summary}, {len(conflicts)} conflict(s) ❌")
+        return False
+    log("OK", f"{summary}, no conflicts ✅")
+    return True
 
 # ----------------------------
 # ORCHESTRATION
 # ----------------------------
-def create_infra():
+def read_sysctls(names=SYSCTLS):
+    """Current values of the sysctls, read from /proc/sys (None if unreadable)."""
+    values = {}
+    for name in names:
+        try:
+            with open("/proc/sys/" + name.replace(".", "/")) as f:
+                values[name] = int(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            values[name] = None
+    return values
+
+def set_host_sysctls(current=None):
+    """Raise the SYSCTLS that are below their value; current is read_sysctls() if already known."""
+    current = read_sysctls() if current is None else current
+    low = {name: value for name, value in SYSCTLS.items() if current.get(name) is None or current[name] < value}
+    if not low:
+        log("INFO", "sysctl limits are already set")
+        return
     log("INFO", "Setting sysctl limits")
-    run("sudo sysctl -w fs.inotify.max_user_watches=524288")
-    run("sudo sysctl -w fs.inotify.max_user_instances=512")
-    run("sudo sysctl -w kernel.keys.maxkeys=500000")
-    run("sudo sysctl -w kernel.keys.maxbytes=1000000")
-    run("rm /tmp/vars.json || true", check=False)
+    for name, value in low.items():
+        run(f"sudo sysctl -w {name}={value}")
 
-    create_networks()
-    for cluster in CLUSTERS_YAML.keys():
-        create_kind_cluster(cluster)
-    wait_for_clusters(300)
+def applied_manifests(context):
+    """{manifest: sha256} recorded by the last apply of the KUBENET_MANIFESTS."""
+    namespace, name = MANIFEST_STATE
+    try:
+        data = list_objects("configmaps", name=name, namespace=namespace, context=context)[0].get("data") or {}
+    except (subprocess.CalledProcessError, json.JSONDecodeError, IndexError):
+        return {}
+    return {key.replace("_", "/", 1): digest for key, digest in data.items()}
+
+def record_manifests(context, digests):
+    namespace, name = MANIFEST_STATE
+    obj = {
+        "apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": name, "namespace": namespace},
+        # ConfigMap keys cannot hold "/"
+        "data": {path.replace("/", "_", 1): digest for path, digest in digests.items()},
+    }
+    session = kube_session(context)
+    if session:
+        session.apply(obj)
+    else:
+        run(f"kubectl apply --server-side --field-manager=infra-manager -f - --context {context}",
+            capture=True, input=dump_cr(obj))
+
+# One look at everything `create` would make: {bridge: inspect or None}, the
+# existing kind clusters, {container: state}, the recorded manifest hashes of
+# the mgmt cluster and the current sysctl values.
+Inventory = namedtuple("Inventory", "networks clusters containers manifests sysctls")
+
+def take_inventory():
+    with span("inventory"):
+        clusters = set(kind_clusters())
+        inventory = Inventory(
+            networks={bridge: docker_network(bridge) for bridge in network_bridges()},
+            clusters=clusters,
+            containers=docker_containers(),
+            manifests=applied_manifests(kube_context("mgmt")) if "mgmt" in clusters else {},
+            sysctls=read_sysctls(),
+        )
+    log("INFO", f"Inventory: {sum(1 for n in inventory.networks.values() if n)}/{len(inventory.networks)} networks, "
+                f"{len(clusters & set(CLUSTERS_YAML))}/{len(CLUSTERS_YAML)} clusters, "
+                f"{len(inventory.manifests)}/{len(KUBENET_MANIFESTS)} kubenet manifests applied")
+    return inventory
+
+def deploy_containerlab(fabric, containers):
+    """Deploy the containerlab topology unless all of its SR Linux nodes already run."""
+    nodes = [f"net-{fabric['name']}-{node}" for node in fabric["leafs"] + fabric["spines"]]
+    running = [node for node in nodes if containers.get(node) == "running"]
+    if len(running) == len(nodes):
+        log("INFO", f"Containerlab topology {fabric['name']} is running, skipping.")
+        return
+    # Containers of a half deployed lab would make a plain deploy fail
+    reconfigure = " --reconfigure" if any(node in containers for node in nodes) else ""
+    if reconfigure:
+        log("WARN", f"Containerlab topology {fabric['name']} is incomplete, redeploying it")
+    run(f"sudo containerlab deploy --topo clab-topo.gotmpl --vars {VARS_FILE}{reconfigure}")
+
+def apply_kubenet(context, applied):
+    """Apply the KUBENET_MANIFESTS whose content changed since they were last applied."""
+    digests = {path: sha256_file(path) for path in KUBENET_MANIFESTS}
+    changed = [path for path in KUBENET_MANIFESTS if applied.get(path) != digests[path]]
+    if not changed:
+        log("INFO", "Kubenet components are up to date, skipping.")
+        return
+    for path in changed:
+        run(f"kubectl apply -f {path} --context {context}")
+    record_manifests(context, digests)
+
+def create_infra(workers=CREATE_WORKERS, cni_tarball=None, offline=False, mirror=True):
+    """
+    Reconcile the lab: take one inventory of what exists and create only what
+    is missing, so re-running `create` on a healthy lab is almost a no-op.
+    """
+    inventory = take_inventory()
+    missing = [c for c in CLUSTERS_YAML if c not in inventory.clusters]
+
+    with span("sysctl"):
+        set_host_sysctls(inventory.sysctls)
+    with span("networks"):
+        create_networks(inventory.networks)
+
+    if missing:
+        # Resolve the CNI plugins first, so the clusters share one download and a bad cache fails fast
+        with span("cni-plugins"):
+            cni_dir = ensure_cni_plugins(seed_tarball=cni_tarball, offline=offline)
+        # Pull every image once on the host, before the clusters ask for them concurrently
+        with span("images"):
+            bridge = next(iter(network_bridges()))
+            if mirror and offline:
+                log("INFO", "--offline: not starting the registry mirrors, they would pull from upstream")
+            mirrors = start_registry_mirrors(bridge, inventory.containers) if mirror and not offline else {}
+            images = prefetch_images(host_images(), offline=offline)
+        with span("clusters"):
+            create_kind_clusters(workers=workers, cni_dir=cni_dir, mirrors=mirrors, images=images,
+                                 existing=inventory.clusters)
+    else:
+        log("INFO", f"All {len(CLUSTERS_YAML)} clusters exist, skipping.")
+    with span("wait-clusters"):
+        wait_for_clusters(300)
 
     # Write workers JSON
     workers = []
     for cluster in CLUSTERS_YAML.keys():
-        out = run(
-            f"kubectl get nodes -l node-role.kubernetes.io/control-plane!= -o jsonpath='{{.items[*].metadata.name}}' --context kind-{cluster}",
-            capture=True,
-        )
-        if out:
-            workers.extend(out.split())
+        workers.extend(worker_nodes(cluster))
 
-    with open("/tmp/vars.json", "w") as f:
-        json.dump({"workers": workers}, f)
+    fabric = fabric_plan(workers)
+    with open(VARS_FILE, "w") as f:
+        json.dump(fabric, f)
 
-    run("sudo containerlab deploy --topo clab-topo.gotmpl --vars /tmp/vars.json")
+    run(f"kubectl config use-context {kube_context('mgmt')}")
     log("OK", "Creating Kubenet Infra")
-    run("kubectl config use-context kind-mgmt")
-    run("kubectl apply -f infra-kubenet/pkgserver.yaml")
-    run("kubectl apply -f infra-kubenet/sdc.yaml")
-    run("kubectl apply -f infra-kubenet/kuid-server.yaml")
-    run("kubectl apply -f infra-kubenet/kuid-nokia-srl.yaml")
-    run("kubectl apply -f infra-kubenet/kuidapps.yaml")
-    wait_for_pods("mgmt")
+
+    def kubenet():
+        with span("kubenet"):
+            apply_kubenet(kube_context("mgmt"), inventory.manifests)
+        # The mgmt controllers and multus on the workload clusters come up independently
+        with span("wait-pods"):
+            wait_all(WaitTarget(kube_context(cluster), "pods") for cluster in CLUSTERS_YAML.keys())
+
+    def containerlab():
+        with span("containerlab"):
+            deploy_containerlab(fabric, inventory.containers)
+
+    # SR Linux boots in containerlab while the mgmt controllers install: neither needs the
+    # other, and the network plan's discovery step waits for the nodes' gNMI by itself
+    tasks = {"containerlab": containerlab, "kubenet": kubenet}
+    _, failures = run_parallel(lambda name: tasks[name](), tasks)
+    for name, exc in failures.items():
+        log("ERROR", f"{name} failed: {exc}")
+    if failures:
+        raise InfraError(f"Failed to create: {', '.join(sorted(failures))}", failures)
     log("OK", "Infra created ✅")
 
-def destroy_infra():
-    run("sudo containerlab destroy --topo clab-topo.gotmpl --vars /tmp/vars.json || true", check=False)
-    run("rm /tmp/vars.json || true", check=False)
-    run("sudo rm -rf clab-5g || true", check=False)
-    delete_kind_clusters()
-    delete_networks()
+def destroy_infra(workers=CREATE_WORKERS):
+    """
+    Tear the lab down: containerlab first (its links end in the kind nodes), then all
+    clusters in parallel, then whatever containers of the lab are left, the registry
+    mirrors and the networks. Logs which resources were already gone.
+    """
+    containers = docker_containers()
+    gone = []
+    with span("containerlab"):
+        if not any(name.startswith(f"net-{clab_name()}-") for name in containers):
+            gone.append(f"containerlab lab {clab_name()}")
+        elif os.path.exists(VARS_FILE):
+            run(f"sudo containerlab destroy --topo clab-topo.gotmpl --vars {VARS_FILE}", check=False)
+        run(f"rm -f {VARS_FILE}", check=False)
+        run(f"sudo rm -rf clab-{clab_name()}", check=False)
+
+    failed = None
+    with span("clusters"):
+        try:
+            gone += [f"cluster {cluster}" for cluster in delete_kind_clusters(workers)]
+        except InfraError as exc:
+            failed = exc
+
+    # Nodes of failed or half deleted clusters, containerlab nodes without a vars file, ...
+    with span("reap"):
+        strays = lab_containers(docker_containers())
+        if strays:
+            log("WARN", f"Removing {len(strays)} leftover containers: {', '.join(strays)}")
+            run(f"docker rm -f {' '.join(strays)} >/dev/null", check=False)
+
+    stop_registry_mirrors(next(iter(network_bridges())))
+    with span("networks"):
+        gone += [f"network {bridge}" for bridge in delete_networks()]
+
+    if gone:
+        log("INFO", f"Already gone: {', '.join(gone)}")
+    if failed:
+        raise failed
+    if LAB_ID:
+        release_lab(LAB_ID)
+    log("OK", "Infra destroyed ✅")
+
+# ----------------------------
+# STATUS
+# ----------------------------
+# `status` runs every probe concurrently in one pass: node and pod readiness of
+# every cluster, the kuid/sdc CRs on mgmt, the docker networks, the containerlab
+# nodes and the VLAN interfaces of every worker. With API sessions a healthy lab
+# is checked well within a second; `--watch` repeats it over the same connections.
+
+STATUS_RESOURCES = [
+    "targets.inv.sdcio.dev", "vlanclaims.vlan.be.kuid.dev", "ipclaims.ipam.be.kuid.dev",
+    "networks.network.app.kuid.dev", "configs.config.sdcio.dev",
+]
+STATUS_WORKERS = 32  # concurrent probes
+STATUS_INTERVAL = 2  # default seconds between `status --watch` refreshes
+
+def _readiness(items, pending_fn):
+    pending = pending_fn(items)
+    return {"ready": len(items) - len(pending), "total": len(items), "pending": pending}
+
+def collect_status():
+    """Probe the whole lab concurrently; returns the status dict printed by print_status."""
+    started = time.time()
+    containers = docker_containers()
+    clusters = [c for c in CLUSTERS_YAML if containers.get(f"{kind_name(c)}-control-plane") == "running"]
+    mgmt = kube_context("mgmt")
+
+    probes = {("network", bridge): functools.partial(docker_network, bridge) for bridge in network_bridges()}
+    for cluster in clusters:
+        context = kube_context(cluster)
+        probes[("nodes", cluster)] = lambda context=context: _readiness(list_objects("nodes", context=context), nodes_pending)
+        probes[("pods", cluster)] = lambda context=context: _readiness(
+            list_objects("pods", namespace="--all-namespaces", context=context), pods_pending)
+        for node in containers:
+            if node.startswith(f"{kind_name(cluster)}-worker") and containers[node] == "running":
+                probes[("vlans", node)] = functools.partial(vlan_interfaces, node)
+    if "mgmt" in clusters:
+        probes[("vlan-targets",)] = lambda: vlan_targets(clusters, context=mgmt)
+        for resource in STATUS_RESOURCES:
+            probes[("crs", resource)] = lambda resource=resource: _readiness(
+                list_objects(resource, namespace="--all-namespaces", context=mgmt), conditions_pending)
+
+    results, failures = run_parallel(lambda key: probes[key](), probes, workers=STATUS_WORKERS,
+                                     label=lambda key: "/".join(key))
+    errors = {key: f"{type(exc).__name__}: {exc}"[:200] for key, exc in failures.items()}
+    targets = results.get(("vlan-targets",)) or {}
+
+    status = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "networks": {}, "clusters": {},
+              "containerlab": {}, "crs": {}, "vlans": {}}
+    for bridge, subnet in network_bridges().items():
+        network = results.get(("network", bridge))
+        status["networks"][bridge] = (network.get("IPAM", {}).get("Config") or [{}])[0].get("Subnet") if network else None
+    for cluster in CLUSTERS_YAML:
+        entry = {"running": cluster in clusters}
+        for kind in ("nodes", "pods"):
+            entry[kind] = results.get((kind, cluster)) or ({"error": errors[(kind, cluster)]} if (kind, cluster) in errors else None)
+        status["clusters"][cluster] = entry
+    prefix = f"net-{clab_name()}-"
+    status["containerlab"] = {name[len(prefix):]: state for name, state in sorted(containers.items()) if name.startswith(prefix)}
+    for resource in STATUS_RESOURCES:
+        if ("crs", resource) in results:
+            status["crs"][resource] = results[("crs", resource)]
+        elif ("crs", resource) in errors:
+            status["crs"][resource] = {"error": errors[("crs", resource)]}
+    for key in probes:
+        if key[0] == "vlans":
+            have = results.get(key)
+            cluster = next((c for c in clusters if key[1].startswith(f"{kind_name(c)}-worker")), None)
+            missing = [v for v in targets.get(cluster, []) if v not in (have or [])]
+            status["vlans"][key[1]] = {"present": have, "missing": missing} if have is not None else {"error": errors[key]}
+
+    status["healthy"] = bool(
+        all(status["networks"].values())
+        and all(
+            c["running"] and all(c[k] and "error" not in c[k] and c[k]["ready"] == c[k]["total"] for k in ("nodes", "pods"))
+            for c in status["clusters"].values()
+        )
+        and status["containerlab"] and all(state == "running" for state in status["containerlab"].values())
+        # CRs of a lab without a network plan yet are not served: only failing ones count
+        and all("error" in r or r["ready"] == r["total"] for r in status["crs"].values())
+        and all(not v.get("missing") and "error" not in v for v in status["vlans"].values())
+    )
+    status["elapsed"] = round(time.time() - started, 3)
+    return status
+
+def _fraction(result):
+    if not result:
+        return "-"
+    if "error" in result:
+        return "error"
+    return f"{result['ready']}/{result['total']}"
+
+def print_status(status):
+    """Compact table of a collect_status() result."""
+    print(f"{'Cluster':<14}{'Nodes':>8}{'Pods':>9}{'VLAN ifaces':>13}  Not ready")
+    for cluster, entry in status["clusters"].items():
+        if not entry["running"]:
+            print(f"{cluster:<14}{'missing':>8}")
+            continue
+        workers = [v for node, v in status["vlans"].items() if node.startswith(f"{kind_name(cluster)}-worker")]
+        present = sum(len(v.get("present") or []) for v in workers)
+        expected = present + sum(len(v.get("missing") or []) for v in workers)
+        vlans = f"{present}/{expected}" if expected else "-"
+        pending = [p for k in ("nodes", "pods") for p in (entry[k] or {}).get("pending", [])]
+        more = f" (+{len(pending) - 3})" if len(pending) > 3 else ""
+        print(f"{cluster:<14}{_fraction(entry['nodes']):>8}{_fraction(entry['pods']):>9}{vlans:>13}  "
+              f"{', '.join(pending[:3])}{more}")
+
+    networks = ", ".join(f"{b} ({s or 'missing'})" for b, s in status["networks"].items())
+    clab = ", ".join(f"{n} {s}" for n, s in status["containerlab"].items()) or "not deployed"
+    crs = "  ".join(f"{r.split('.')[0]} {_fraction(v)}" for r, v in status["crs"].items()) or "-"
+    print(f"{'Networks':<14}{networks}")
+    print(f"{'Containerlab':<14}{clab}")
+    print(f"{'CRs (mgmt)':<14}{crs}")
+    if status["healthy"]:
+        log("OK", f"Lab is healthy ✅ ({status['elapsed']:.2f}s)")
+    else:
+        log("WARN", f"Lab is not healthy ({status['elapsed']:.2f}s)")
 
-def status_infra():
-    log("INFO", "Current clusters:")
+def status_infra(as_json=False, watch=None):
+    """
+    Print the lab status once (returns whether it is healthy) or, with watch
+    (seconds), refresh it until interrupted. JSON is printed as one line per refresh.
+    """
+    healthy = False
     try:
-        run("kind get clusters")
-    except subprocess.CalledProcessError:
-        log("WARN", "No clusters found")
+        while True:
+            started = time.time()
+            status = collect_status()
+            healthy = status["healthy"]
+            if as_json:
+                print(json.dumps(status, indent=None if watch else 2), flush=True)
+            else:
+                if watch:
+                    print("\033[H\033[J", end="")
+                print_status(status)
+            if not watch:
+                return healthy
+            # Do not let the spans of every refresh pile up
+            with _trace_lock:
+                del _trace_spans[:]
+            time.sleep(max(0, watch - (time.time() - started)))
+    except KeyboardInterrupt:
+        return healthy
+
+# Network plan as a dependency graph. Every step declares the resources it
+# consumes ("inputs") and produces ("outputs"); a step runs as soon as all
+# steps producing its inputs are done, so independent branches (e.g. VLAN and
+# IP indices) run concurrently. The dict order is a valid sequential order and
+# is what --from/--until refer to. A step's optional "gate" runs first and
+# must return True for the step to start. "inputs" may be a callable, for
+# steps whose inputs depend on the run settings.
+
+GNMI_PORT = 57400  # SR Linux gNMI server the sdc discovery connects to
+GNMI_TIMEOUT = 300
+GNMI_POLL = 5  # longest interval (s) between connection attempts
+
+def _mgmt_ip(container):
+    """First IP address of a container on any of its docker networks, or None."""
+    networks = ((docker_container(container) or {}).get("NetworkSettings") or {}).get("Networks") or {}
+    return next((n["IPAddress"] for n in networks.values() if n.get("IPAddress")), None)
+
+def _port_open(host, port, timeout=1):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def wait_for_gnmi(timeout=GNMI_TIMEOUT):
+    """
+    Block until the gNMI port of every containerlab node of the lab accepts connections.
 
-    log("INFO", "Current docker networks:")
-    for net, config in NETWORKS.items():
-        bridge = config.split(":")[1]
+    SR Linux takes a while to boot after `containerlab deploy` returns, so discovery
+    is gated on this instead of on running after containerlab. Returns False on timeout.
+    """
+    prefix = f"net-{clab_name()}-"
+    pending = sorted(name for name in docker_containers() if name.startswith(prefix))
+    if not pending:
+        log("WARN", f"No containerlab nodes of {clab_name()} found, not waiting for gNMI")
+        return True
+    log("INFO", f"Waiting for gNMI (port {GNMI_PORT}) on {', '.join(pending)} (timeout {timeout}s)...")
+    deadline, interval, addresses = time.time() + timeout, WAIT_BACKOFF, {}
+    with span("gnmi", "wait", nodes=len(pending)) as info:
+        while True:
+            for node in list(pending):
+                addresses[node] = addresses.get(node) or _mgmt_ip(node)
+                if addresses[node] and _port_open(addresses[node], GNMI_PORT):
+                    log("OK", f"{node}: gNMI is reachable on {addresses[node]}")
+                    pending.remove(node)
+            info["pending"] = pending
+            if not pending:
+                return True
+            if time.time() >= deadline:
+                log("ERROR", f"Timeout waiting for gNMI on {', '.join(pending)} ❌")
+                return False
+            time.sleep(max(0, min(interval, deadline - time.time())))
+            interval = min(GNMI_POLL, interval * 2)
+
+PLAN_STEPS = {
+    "discovery": {
+        "title": "Creating device definition:",
+        "gate": lambda: wait_for_gnmi(),
+        "manifest": "discovery.yaml",
+        "wait": ["targets.inv.sdcio.dev"],
+        "inputs": [],
+        "outputs": ["targets"],
+    },
+    "inventory": {
+        "title": "Creating device inventory and registering CLAB topology:",
+        "manifest": "inventory.yaml",
+        "wait": ["nodes.infra.be.kuid.dev"],
+        "inputs": ["targets"],
+        "outputs": ["topology"],
+    },
+    "vlan-indices": {
+        "title": "Creating VLAN Indices:",
+        "manifest": "vlan-indicies.yaml",
+        "wait": ["vlanindices.vlan.be.kuid.dev"],
+        "inputs": [],
+        "outputs": ["vlan-index"],
+    },
+    "dynamic-vlan": {
+        "title": "Requesting VLANs for different networks:",
+        "manifest": "dynamic-vlan.yaml",
+        "wait": ["vlanclaims.vlan.be.kuid.dev"],
+        "inputs": ["vlan-index"],
+        "outputs": ["vlan-claims"],
+    },
+    "ip-indices": {
+        "title": "Creating IP prefixes:",
+        "manifest": "ipindex.yaml",
+        "wait": ["ipindices.ipam.be.kuid.dev"],
+        "inputs": [],
+        "outputs": ["ip-index"],
+    },
+    "networks": {
+        "title": "Creating different networks:",
+        "manifest": "network-config.yaml",
+        "wait": ["networkconfigs.network.app.kuid.dev", "ipclaims.ipam.be.kuid.dev"],
+        "inputs": ["topology", "ip-index"],
+        "outputs": ["network-configs"],
+    },
+    "ipclaims": {
+        "title": "Creating IP Claims for the VPCs:",
+        "manifest": "ipclaim-vpcs.yaml",
+        "wait": ["ipclaims.ipam.be.kuid.dev"],
+        "inputs": ["network-configs"],
+        "outputs": ["ip-claims"],
+    },
+    "vlan-interfaces": {
+        "title": "Creating VLANs on the worker nodes:",
+        "action": lambda: create_vlan_interfaces(),
+        # with the claims placement a site's VLANs follow from its IPClaims
+        "inputs": lambda: ["vlan-index", "vlan-claims"] + (["ip-claims"] if VLAN_PLACEMENT == "claims" else []),
+        "outputs": ["vlan-interfaces"],
+    },
+}
+PLAN_STATE_FILE = ".network-plan-state.json"  # completed steps, for --resume
+
+def plan_dependencies(steps):
+    """Map every step to the steps (within `steps`) that produce its inputs."""
+    producers = {out: name for name in steps for out in PLAN_STEPS[name]["outputs"]}
+    def inputs(name):
+        value = PLAN_STEPS[name]["inputs"]
+        return value() if callable(value) else value
+
+    return {name: {producers[i] for i in inputs(name) if i in producers} for name in steps}
+
+def run_plan_step(name):
+    """Run one network plan step; returns True if its resources became Ready."""
+    step = PLAN_STEPS[name]
+    log("INFO", step["title"])
+    with span(name) as info:
+        if "gate" in step and not step["gate"]():
+            info["ok"] = False
+            return False
+        if "action" in step:
+            ok = step["action"]() is not False
+        else:
+            run(f"kubectl apply -f {os.path.join(PLAN_DIR, step['manifest'])}")
+            results = wait_all([WaitTarget(None, resource) for resource in step["wait"]])
+            ok = all(latency is not None for latency in results.values())
+        info["ok"] = ok
+        return ok
+
+def _load_plan_state():
+    try:
+        with open(PLAN_STATE_FILE) as f:
+            return set(json.load(f).get("completed", []))
+    except (OSError, ValueError):
+        return set()
+
+def _save_plan_state(completed):
+    with open(PLAN_STATE_FILE, "w") as f:
+        json.dump({"completed": [s for s in PLAN_STEPS if s in completed]}, f)
+
+def run_plan(steps, workers=None, completed=None):
+    """
+    Run the given steps, each as soon as its dependencies are done, up to `workers` at a time.
+
+    Steps whose dependencies failed are not started. Returns (completed, failed),
+    where completed also contains the steps passed in as already completed.
+    """
+    deps = plan_dependencies(steps)
+    completed = set(completed or ())
+    failed, skipped = set(), set()
+    lock = threading.Lock()
+
+    def on_done(name, ok):
+        with lock:
+            (completed if ok else failed).add(name)
+            _save_plan_state(completed)
+
+    def step_task(name):
+        _log_ctx.prefix = name
         try:
-            subnet = run(
-                f"docker network inspect {bridge} -f '{{{{(index .IPAM.Config 0).Subnet}}}}'",
-                capture=True,
-            )
-            print(f"  {bridge} ({subnet})")
-        except subprocess.CalledProcessError:
-            print(f"  {bridge} (not found)")
-
-def create_network_plan(step=None):
-    """Create network plan in multiple stages, selectable via CLI."""
-    if step in (None, "discovery"):
-        log("INFO", "Creating device definition:")
-        run("kubectl apply -f network-plan/discovery.yaml")
-        wait_for_resource_ready(resource="targets.inv.sdcio.dev")
-
-    if step in (None, "inventory"):
-        log("INFO", "Creating device inventory and registering CLAB topology:")
-        run("kubectl apply -f network-plan/inventory.yaml")
-        wait_for_resource_ready(resource="nodes.infra.be.kuid.dev")
-
-    if step in (None, "vlan-indices"):
-        log("INFO", "Creating VLAN Indices:")
-        run("kubectl apply -f network-plan/vlan-indicies.yaml")
-        wait_for_resource_ready(resource="vlanindices.vlan.be.kuid.dev")
-
-    if step in (None, "dynamic-vlan"):
-        log("INFO", "Requesting VLANs for different networks:")
-        run("kubectl apply -f network-plan/dynamic-vlan.yaml")
-        wait_for_resource_ready(resource="vlanclaims.vlan.be.kuid.dev")
-
-    if step in (None, "ip-indices"):
-        log("INFO", "Creating IP prefixes:")
-        run("kubectl apply -f network-plan/ipindex.yaml")
-        wait_for_resource_ready(resource="ipindices.ipam.be.kuid.dev")
-
-    if step in (None, "networks"):
-        log("INFO", "Creating different networks:")
-        run("kubectl apply -f network-plan/network-config.yaml")
-        wait_for_resource_ready(resource="ipclaims.ipam.be.kuid.dev")
-
-    if step in (None, "ipclaims"):
-        log("INFO", "Creating IP Claims for the VPCs:")
-        run("kubectl apply -f network-plan/ipclaim-vpcs.yaml")
-        wait_for_resource_ready(resource="ipclaims.ipam.be.kuid.dev")
-
-    if step in (None, "vlan-interfaces"):
-        log("INFO", "Creating VLANs on the worker nodes:")
-        create_vlan_interfaces()
+            ok = run_plan_step(name)
+        except Exception as exc:  # any error fails the step, so its dependents are skipped
+            log("ERROR", f"{type(exc).__name__}: {exc}")
+            ok = False
+        finally:
+            _log_ctx.prefix = None
+        on_done(name, ok)
+        return ok
+
+    pending = [s for s in steps if s not in completed]
+    with ThreadPoolExecutor(max_workers=max(1, workers or len(pending) or 1)) as pool:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                if deps[name] & (failed | skipped):
+                    log("WARN", f"Skipping step '{name}': a dependency failed")
+                    skipped.add(name)
+                    pending.remove(name)
+                elif deps[name] <= completed:
+                    running[pool.submit(step_task, name)] = name
+                    pending.remove(name)
+            if not running:
+                break
+            done = next(as_completed(running))
+            running.pop(done)
+            done.result()
+    if pending:
+        raise InfraError(f"Network plan steps never started: {', '.join(pending)}")
+    return completed, failed | skipped
+
+def create_network_plan(step=None, start=None, until=None, resume=False, workers=None):
+    """
+    Create network plan in multiple stages, selectable via CLI.
+
+    step runs a single step. Otherwise the steps from `start` to `until` (in
+    PLAN_STEPS order) are run as a dependency graph; with resume the steps that
+    completed in the previous run are skipped.
+    """
+    names = list(PLAN_STEPS)
+    for value in (step, start, until):
+        if value and value not in PLAN_STEPS:
+            raise InfraError(f"Unknown network-plan step '{value}' (choose from: {', '.join(names)})")
+
+    if step:
+        selected = [step]
+    else:
+        selected = names[names.index(start) if start else 0:names.index(until) + 1 if until else len(names)]
 
+    completed = _load_plan_state() if resume else set()
+    if resume and completed:
+        log("INFO", f"Resuming, already completed: {', '.join(s for s in selected if s in completed)}")
+    _, failed = run_plan(selected, workers=workers, completed=completed)
+
+    if failed:
+        raise InfraError(
+            f"Network plan failed at: {', '.join(s for s in selected if s in failed)} "
+            f"(re-run with --resume to continue)"
+        )
     log("OK", f"Network plan step '{step or 'all'}' completed ✅")
+
+# ----------------------------
+# SNAPSHOTS
+# ----------------------------
+# A snapshot of a provisioned lab lives in SNAPSHOT_DIR/<name>:
+#   snapshot.json      topology, clab vars (+ SR Linux mgmt IPs) and the run settings of every node
+#   var/<node>.tar     the node's /var volume (etcd, kubelet, containerd images), not part of a commit
+#   clab.tgz           containerlab lab directory with the saved SR Linux startup configs
+#   crs.yaml           SNAPSHOT_RESOURCES of the mgmt cluster
+#   state/             network-ids, plan state and generated CRs of this checkout
+# and every node container is committed as infra-snapshot/<node>:<name>.
+
+# How kind runs a node container; restore recreates the nodes the same way
+KIND_NODE_RUN_FLAGS = (
+    "--tty --privileged --security-opt seccomp=unconfined --security-opt apparmor=unconfined "
+    "--tmpfs /tmp --tmpfs /run --volume /var --volume /lib/modules:/lib/modules:ro "
+    "--restart=on-failure:1 --cgroupns=private -e container=docker"
+)
+SNAPSHOT_API_TIMEOUT = 60  # seconds restore waits for the mgmt API server before restoring CRs
+
+def snapshot_path(name, *parts):
+    return os.path.join(SNAPSHOT_DIR, name, *parts)
+
+def _strip_object(obj):
+    """An object as it can be re-created: no status and no server-managed metadata."""
+    meta = {k: v for k, v in obj["metadata"].items() if k in ("name", "namespace", "labels", "annotations")}
+    meta.get("annotations", {}).pop("kubectl.kubernetes.io/last-applied-configuration", None)
+    return {k: v for k, v in obj.items() if k not in ("status", "metadata")} | {"metadata": meta}
+
+def export_crs(path, context):
+    """Write the SNAPSHOT_RESOURCES of a cluster to path; returns the number of objects."""
+    docs = []
+    for resource in SNAPSHOT_RESOURCES:
+        try:
+            docs.extend(_strip_object(o) for o in list_objects(resource, namespace="--all-namespaces", context=context))
+        except (subprocess.CalledProcessError, json.JSONDecodeError):
+            log("WARN", f"Could not list {resource}, not part of the snapshot")
+    _write_yaml(path, docs)
+    return len(docs)
+
+def _node_record(node):
+    """What it takes to re-create a kind node container: name, hostname, labels, network address, ports."""
+    info = docker_container(node)
+    network, settings = next(iter(info["NetworkSettings"]["Networks"].items()))
+    return {
+        "name": node,
+        "hostname": info["Config"]["Hostname"],
+        "labels": info["Config"].get("Labels") or {},
+        "network": network,
+        "ip": settings.get("IPAddress"),
+        "ipv6": settings.get("GlobalIPv6Address"),
+        "ports": [
+            [binding.get("HostIp") or "0.0.0.0", binding["HostPort"], port]
+            for port, bindings in (info["HostConfig"].get("PortBindings") or {}).items()
+            for binding in bindings or []
+        ],
+    }
+
+def _save_node(node, name):
+    """Commit a (paused) node and copy out its /var volume, which a commit does not include."""
+    run(f"docker commit --pause=false {node} infra-snapshot/{node}:{name}", capture=True)
+    run(f"docker cp {node}:/var - > {snapshot_path(name, 'var', node + '.tar')}")
+
+def snapshot_infra(name="latest"):
+    """
+    Snapshot the running lab: every node container, its /var, the SR Linux
+    configs and the kuid CRs of the mgmt cluster.
+
+    All nodes of all clusters are paused while they are saved, so the snapshot
+    is one point in time across clusters; the containerlab links stay in place.
+    """
+    clusters = [c for c in CLUSTERS_YAML if c in kind_clusters()]
+    if len(clusters) != len(CLUSTERS_YAML):
+        raise InfraError(f"Missing clusters: {', '.join(c for c in CLUSTERS_YAML if c not in clusters)}, create the lab first")
+    try:
+        with open(VARS_FILE) as f:
+            fabric = json.load(f)
+    except OSError:
+        raise InfraError(f"No {VARS_FILE}, create the lab first")
+
+    log("INFO", f"Snapshotting lab {TOPOLOGY_NAME} as '{name}' to {snapshot_path(name)}")
+    shutil.rmtree(snapshot_path(name), ignore_errors=True)
+    os.makedirs(snapshot_path(name, "var"))
+    os.makedirs(snapshot_path(name, "state"))
+
+    with span("crs"):
+        count = export_crs(snapshot_path(name, "crs.yaml"), kube_context("mgmt"))
+        log("INFO", f"Exported {count} CRs")
+    for path in (OUTPUT_CRS_FILE, NETWORK_IDS_FILE, PLAN_STATE_FILE):
+        if os.path.exists(path):
+            shutil.copy(path, snapshot_path(name, "state"))
+
+    with span("containerlab"):
+        srl_nodes = fabric["leafs"] + fabric["spines"]
+        _, failures = run_parallel(
+            lambda node: run(f"docker exec net-{fabric['name']}-{node} sr_cli -d 'save startup'", capture=True), srl_nodes
+        )
+        for node, exc in failures.items():
+            log("WARN", f"Could not save the startup config of {node}: {exc}")
+        mgmt_ips = {}
+        for node in srl_nodes:
+            info = docker_container(f"net-{fabric['name']}-{node}")
+            if info:
+                mgmt_ips[node] = info["NetworkSettings"]["Networks"].get(fabric["network"], {}).get("IPAddress")
+        try:
+            run(f"sudo tar -C . -czf - clab-{fabric['name']} > {snapshot_path(name, 'clab.tgz')}")
+        except subprocess.CalledProcessError:
+            log("WARN", f"Could not archive clab-{fabric['name']}, restore deploys fresh SR Linux configs")
+            os.remove(snapshot_path(name, "clab.tgz"))
+
+    nodes = {c: run(f"kind get nodes --name {kind_name(c)}", capture=True).splitlines() for c in clusters}
+    all_nodes = [n for c in clusters for n in nodes[c]]
+    records, failures = run_parallel(lambda n: dict(_node_record(n), vlans=vlan_interfaces(n)), all_nodes)
+    if failures:
+        raise InfraError(f"Failed to inspect nodes: {', '.join(sorted(failures))}", failures)
+
+    with span("nodes", nodes=len(all_nodes)):
+        run(f"docker pause {' '.join(all_nodes)}", capture=True)
+        try:
+            _, failures = run_parallel(lambda n: _save_node(n, name), all_nodes)
+        finally:
+            run(f"docker unpause {' '.join(all_nodes)}", capture=True)
+    if failures:
+        raise InfraError(f"Failed to save nodes: {', '.join(sorted(failures))}", failures)
+
+    manifest = {
+        "name": name, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "topology": TOPOLOGY_NAME,
+        "networks": NETWORKS, "fabric": dict(fabric, mgmt_ips=mgmt_ips),
+        "mirrors": [r for r in REGISTRY_MIRRORS if docker_container_state(mirror_name(r)) == "running"],
+        "clusters": {c: [records[n] for n in nodes[c]] for c in clusters},
+    }
+    with open(snapshot_path(name, "snapshot.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    log("OK", f"Snapshot '{name}' of {len(all_nodes)} nodes in {len(clusters)} clusters saved ✅")
+
+def _restore_node(record, name):
+    """Re-create a node container from its committed image with the same address, ports and labels."""
+    node = record["name"]
+    args = [f"--name {node} --hostname {record['hostname']} {KIND_NODE_RUN_FLAGS} --network {record['network']}"]
+    if record.get("ip"):
+        args.append(f"--ip {record['ip']}")
+    if record.get("ipv6"):
+        args.append(f"--ip6 {record['ipv6']}")
+    args += [f"-p {host_ip}:{host_port}:{port}" for host_ip, host_port, port in record["ports"]]
+    args += [f"--label {key}={value}" for key, value in record["labels"].items()]
+    run(f"docker create {' '.join(args)} infra-snapshot/{node}:{name}", capture=True)
+    run(f"docker cp - {node}:/ < {snapshot_path(name, 'var', node + '.tar')}")
+    run(f"docker start {node}", capture=True)
+
+def restore_crs(path, context, timeout=SNAPSHOT_API_TIMEOUT):
+    """
+    Re-create the exported objects the cluster does not have. The restored etcd
+    normally holds all of them, so this usually only confirms the snapshot.
+    """
+    docs = read_crs(path)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            list_objects("namespaces", context=context)
+            break
+        except (subprocess.CalledProcessError, OSError):
+            if time.time() > deadline:
+                log("WARN", f"API server of {context} not reachable after {timeout}s, CRs not checked")
+                return
+            time.sleep(2)
+
+    live = set()
+    for resource in SNAPSHOT_RESOURCES:
+        try:
+            live.update((o["kind"], *_object_key(o)) for o in list_objects(resource, namespace="--all-namespaces", context=context))
+        except (subprocess.CalledProcessError, json.JSONDecodeError):
+            pass
+    missing = [doc for doc in docs if (doc["kind"], *_object_key(doc)) not in live]
+    if not missing:
+        log("OK", f"All {len(docs)} snapshot CRs are present")
+        return
+    log("INFO", f"Re-creating {len(missing)} of {len(docs)} snapshot CRs")
+    try:
+        session = kube_session(context)
+        if session:
+            for doc in missing:
+                session.apply(doc)
+        else:
+            run(
+                f"kubectl apply --server-side --force-conflicts --field-manager=infra-manager -f - --context {context}",
+                input="".join(dump_cr(doc) for doc in missing),
+            )
+    except subprocess.CalledProcessError:
+        log("ERROR", f"Failed to re-create the CRs of {path}")
+
+def restore_infra(name="latest", offline=False):
+    """
+    Bring a lab back from a snapshot: the nodes are re-created from their
+    committed images and /var, so there is no cluster bootstrap and no
+    readiness wait. The lab must not exist (run `destroy` first). With
+    offline the registry mirrors are not started.
+    """
+    try:
+        with open(snapshot_path(name, "snapshot.json")) as f:
+            manifest = json.load(f)
+    except OSError:
+        raise InfraError(f"No snapshot '{name}' in {SNAPSHOT_DIR}")
+    if manifest["topology"] != TOPOLOGY_NAME:
+        raise InfraError(f"Snapshot '{name}' is of topology {manifest['topology']}, not {TOPOLOGY_NAME} (use --topology)")
+    if manifest["networks"] != NETWORKS:
+        # The nodes come back with their saved addresses, which must be on the lab's bridge
+        raise InfraError(f"Snapshot '{name}' was taken on networks {manifest['networks']}, this lab has {NETWORKS}")
+    existing = [c for c in manifest["clusters"] if c in kind_clusters()]
+    if existing:
+        raise InfraError(f"Clusters {', '.join(existing)} already exist, run destroy first")
+
+    records = {r["name"]: r for nodes in manifest["clusters"].values() for r in nodes}
+    log("INFO", f"Restoring snapshot '{name}' ({manifest['created']}): {len(records)} nodes in {len(manifest['clusters'])} clusters")
+    with span("sysctl"):
+        set_host_sysctls()
+    with span("networks"):
+        create_networks()
+    if manifest.get("mirrors") and not offline:
+        with span("images"):
+            start_registry_mirrors(manifest["fabric"]["network"])
+
+    with span("nodes", nodes=len(records)):
+        _, failures = run_parallel(lambda node: _restore_node(records[node], name), records)
+    if failures:
+        raise InfraError(f"Failed to restore nodes: {', '.join(sorted(failures))} (run destroy to clean up)", failures)
+    with span("kubeconfig"):
+        for cluster in manifest["clusters"]:
+            run(f"kind export kubeconfig --name {kind_name(cluster)}", capture=True)
+
+    with open(VARS_FILE, "w") as f:
+        json.dump(manifest["fabric"], f)
+    with span("containerlab"):
+        if os.path.exists(snapshot_path(name, "clab.tgz")):
+            run(f"sudo tar -xzf {snapshot_path(name, 'clab.tgz')} -C .")
+        run(f"sudo containerlab deploy --topo clab-topo.gotmpl --vars {VARS_FILE}")
+
+    # eth1 of the workers is a new containerlab veth: re-create the VLAN interfaces on it
+    vlans = {node: r["vlans"] for node, r in records.items() if r.get("vlans")}
+    with span("vlan-interfaces"):
+        _, failures = run_parallel(lambda node: sync_vlan_interfaces(node, vlans[node], prune=False), vlans)
+    for node, exc in failures.items():
+        log("WARN", f"Could not re-create the VLAN interfaces of {node}: {exc}")
+
+    for filename in os.listdir(snapshot_path(name, "state")):
+        shutil.copy(snapshot_path(name, "state", filename), os.path.join(os.path.dirname(OUTPUT_CRS_FILE), filename))
+    with span("crs"):
+        restore_crs(snapshot_path(name, "crs.yaml"), kube_context("mgmt"))
+    log("OK", f"Lab restored from snapshot '{name}' ✅")
+
 # ---------------------------
 # HELPER
 # ---------------------------
@@ -605,15 +3603,23 @@ def create_network_plan(step=None):
 def print_help():
     help_text = """
 Usage:
-  infra-manager.py <command> [step]
+  infra-manager.py <command> [step] [options]
 
 Commands:
   create         Create infrastructure (networks, clusters, multus, containerlab, infra components)
   destroy        Destroy all infrastructure
-  status         Show current clusters and docker networks
+  status         Health of the lab: nodes, pods, CRs, containerlab, networks and worker VLAN interfaces
+                 (exit code 1 if anything is not ready)
   network-plan   Run network plan workflow (all steps or a specific one)
   gen-crs        Generate Network Custom Resources (VLAN/IP claims network-crs.yaml)
   apply-crs      Apply generated Network CR to the current kube-context (mgmt)
+  simulate       Allocate the VLAN/IP claims of the network plan offline (plus the manifests given after it),
+                 write the Network CRs they lead to (network-crs.planned.yaml) and report conflicts
+                 (exit code 1 if there are any)
+  gen-topology   Render a --topology spec (kind configs, containerlab vars, network-plan manifests)
+  snapshot       Save the provisioned lab (nodes, SR Linux configs, kuid CRs) as snapshot [name] (default: latest)
+  restore        Re-create a destroyed lab from snapshot [name], without cluster bootstrap or readiness waits
+  labs           List the labs (--lab) registered on this host with their subnets
 
 Network-plan steps (optional):
   discovery        To discovery devices
@@ -625,41 +3631,192 @@ Network-plan steps (optional):
   ipclaims         Request IP claims VPC default gateway
   vlan-interfaces  Create VLAN interfaces on worker nodes
 
+Options:
+  --workers N      Number of clusters ('create', 'destroy') or plan steps ('network-plan') run concurrently (1 = sequential)
+  --cni-tarball F  Seed the CNI plugin cache from a local tarball (air-gapped hosts)
+  --offline        'create', 'restore': do not download anything and do not start the registry mirrors;
+                   use the local cache (~/.cache/infra-manager) only
+  --no-mirror      'create': do not start the pull-through registry mirrors (images are still preloaded)
+  --force          'apply-crs': apply every Network CR, not only the changed ones
+  --from STEP      'network-plan': start at STEP (steps run as a dependency graph, independent ones in parallel)
+  --until STEP     'network-plan': stop after STEP
+  --resume         'network-plan': skip the steps that completed in the previous run
+  --json           'status', 'simulate': print JSON instead of a table
+  --watch [SEC]    'status': refresh every SEC seconds (default 2) until interrupted
+  --vlan-placement MODE
+                   'network-plan', 'status': 'all' puts every claimed VLAN on every worker (default), 'claims' only
+                   the VLANs whose network has an IPClaim for the worker's site; also read from INFRA_VLAN_PLACEMENT
+  --topology FILE  Use the sites, fabric and networks of a topology spec (see topologies/) instead of
+                   the built-in mgmt/core/regional/edge lab; also read from INFRA_TOPOLOGY
+  --lab ID         Run the command on lab ID (1-10 lowercase letters/digits), side by side with other labs:
+                   own cluster names, bridge, subnets, containerlab lab, state files and kubeconfig
+                   (.labs/ID/kubeconfig); also read from INFRA_LAB
+  --trace FILE     'create', 'destroy', 'network-plan', 'apply-crs', 'snapshot', 'restore': write the timing report (Chrome trace) to FILE
+                   instead of infra-trace-<command>.json
+
 Examples:
   ./infra-manager.py create
   ./infra-manager.py status
+  ./infra-manager.py status --watch 5
   ./infra-manager.py network-plan discovery
+  ./infra-manager.py network-plan --from dynamic-vlan --until ipclaims
   ./infra-manager.py gen-crs && ./infra-manager.py apply-crs
+  ./infra-manager.py simulate --topology topologies/edge-scale.yaml
+  ./infra-manager.py snapshot planned && ./infra-manager.py destroy && ./infra-manager.py restore planned
+  ./infra-manager.py create --topology topologies/edge-scale.yaml --workers 8
+  ./infra-manager.py create --lab alice && ./infra-manager.py network-plan --lab alice
 """
     print(help_text.strip())
 
 # ----------------------------
 # MAIN
 # ----------------------------
+# Options that never take a value, and those whose value is optional (taken from
+# the next argument only if it is a number); every other option needs a value.
+FLAG_OPTIONS = {"offline", "no-mirror", "force", "resume", "json"}
+OPTIONAL_VALUE_OPTIONS = {"watch"}
+VALUE_OPTIONS = {"workers", "cni-tarball", "from", "until", "vlan-placement", "topology", "lab", "trace"}
+
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def parse_args(argv):
+    """Split argv into positional arguments and a dict of --options (flags map to True)."""
+    args, opts = [], {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith("--"):
+            key, sep, value = arg[2:].partition("=")
+            has_next = i + 1 < len(argv) and not argv[i + 1].startswith("--")
+            if key in FLAG_OPTIONS:
+                if sep:
+                    raise InfraError(f"Option --{key} takes no value")
+                value = True
+            elif key in OPTIONAL_VALUE_OPTIONS:
+                if not sep:
+                    value = True
+                    if has_next and _is_number(argv[i + 1]):
+                        value = argv[i + 1]
+                        i += 1
+            elif key in VALUE_OPTIONS:
+                if not sep:
+                    if not has_next:
+                        raise InfraError(f"Option --{key} needs a value")
+                    value = argv[i + 1]
+                    i += 1
+            else:
+                raise InfraError(f"Unknown option --{key}")
+            opts[key] = value
+        else:
+            args.append(arg)
+        i += 1
+    return args, opts
+
+def number_option(opts, key, default=None, kind=int):
+    """The value of a numeric --option, or default if it is not given."""
+    if key not in opts:
+        return default
+    try:
+        value = kind(opts[key])
+    except ValueError:
+        raise InfraError(f"Option --{key} needs a number, not '{opts[key]}'")
+    if value <= 0:
+        raise InfraError(f"Option --{key} must be positive, not '{opts[key]}'")
+    return value
+
 def main():
+    global VLAN_PLACEMENT
     if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help", "help"):
         print_help()
         sys.exit(0)
 
-    cmd = sys.argv[1]
-    step = sys.argv[2] if len(sys.argv) > 2 else None
+    args, opts = parse_args(sys.argv[1:])
+    if not args:
+        raise InfraError("No command given (see --help)")
+    cmd = args[0]
+    step = args[1] if len(args) > 1 else None
+
+    trace_file = opts.get("trace")
+    workers = number_option(opts, "workers")
+    watch = opts.get("watch")
+    if watch is not None:
+        watch = STATUS_INTERVAL if watch is True else number_option(opts, "watch", kind=float)
+    topology = opts.get("topology", os.environ.get("INFRA_TOPOLOGY"))
+    if topology:
+        topo = use_topology(topology)
+        log("INFO", f"Topology {topo['name']}: {len(topo['sites'])} sites, {LEAFS} leaf(s), {SPINES} spine(s), "
+                    f"{len(topo['networks'])} networks (rendered to {os.path.join(TOPOLOGY_DIR, topo['name'])})")
+    lab = opts.get("lab", os.environ.get("INFRA_LAB"))
+    if lab:
+        slot = use_lab(lab, allocate=cmd in ("create", "restore"))
+        if slot is None and cmd != "destroy":
+            raise InfraError(f"Lab {lab} does not exist, create it first")
+        log("INFO", f"Lab {lab}" + (f" (slot {slot})" if slot else "") + ": "
+                    + ", ".join(f"{b} {s}" for b, s in network_bridges().items())
+                    + f", kubeconfig {os.environ['KUBECONFIG']}")
+
+    VLAN_PLACEMENT = opts.get("vlan-placement", VLAN_PLACEMENT)
+    if VLAN_PLACEMENT not in VLAN_PLACEMENTS:
+        raise InfraError(f"Unknown VLAN placement '{VLAN_PLACEMENT}' (choose from: {', '.join(VLAN_PLACEMENTS)})")
 
     if cmd == "create":
-        create_infra()
+        with tracing(cmd, trace_file):
+            create_infra(
+                workers=workers or CREATE_WORKERS,
+                cni_tarball=opts.get("cni-tarball"),
+                offline=bool(opts.get("offline")),
+                mirror=not opts.get("no-mirror"),
+            )
     elif cmd == "destroy":
-        destroy_infra()
+        with tracing(cmd, trace_file):
+            destroy_infra(workers=workers or CREATE_WORKERS)
     elif cmd == "status":
-        status_infra()
+        healthy = status_infra(
+            as_json=bool(opts.get("json")),
+            watch=watch,
+        )
+        sys.exit(0 if healthy else 1)
+    elif cmd == "snapshot":
+        with tracing(cmd, trace_file):
+            snapshot_infra(step or "latest")
+    elif cmd == "restore":
+        with tracing(cmd, trace_file):
+            restore_infra(step or "latest", offline=bool(opts.get("offline")))
+    elif cmd == "labs":
+        print_labs()
     elif cmd == "gen-crs":
         generate_network_crs()
+    elif cmd == "simulate":
+        sys.exit(0 if simulate_network_crs(extra=args[1:], as_json=bool(opts.get("json"))) else 1)
+    elif cmd == "gen-topology":
+        if not topology:
+            raise InfraError("gen-topology needs --topology FILE")
+        log("OK", f"Rendered {len(CLUSTERS_YAML)} kind configs, containerlab vars and the network plan ✅")
     elif cmd == "apply-crs":
-        apply_network_crs()
+        with tracing(cmd, trace_file):
+            apply_network_crs(force=bool(opts.get("force")))
     elif cmd == "network-plan":
-        create_network_plan(step=step)
+        with tracing(cmd, trace_file):
+            create_network_plan(
+                step=step,
+                start=opts.get("from"),
+                until=opts.get("until"),
+                resume=bool(opts.get("resume")),
+                workers=workers,
+            )
     else:
         print(f"[ERROR] Unknown command: {cmd}\n")
         print_help()
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except InfraError as exc:
+        log("ERROR", f"{exc} ❌")
+        sys.exit(1)
@@ -0,0 +1,218 @@
+"""
+Offline checks of the network plan logic of infra-manager.py: the ID pools, the
+networkID allocator, the plan scheduler, the `simulate` allocator (against the
+built-in 3-site plan and topologies/5g.yaml) and the Config wait of apply-crs.
+
+  python -m pytest tests
+"""
+import importlib.util
+import ipaddress
+import os
+
+import pytest
+import yaml
+
+POC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# VLAN IDs and router addresses of a live 5g lab (see README.md)
+LIVE_VLAN_IDS = set(range(2, 10))
+LIVE_ADDRESSES = {"5g.e1-edge-rt": "172.4.2.1/24", "5g.e1-regional-rt": "172.4.1.1/24"}
+
+
+@pytest.fixture
+def im(tmp_path, monkeypatch):
+    """A fresh copy of infra-manager.py, run from the checkout, writing its state to tmp_path."""
+    monkeypatch.chdir(POC_DIR)
+    spec = importlib.util.spec_from_file_location("infra_manager", os.path.join(POC_DIR, "infra-manager.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.TOPOLOGY_DIR = str(tmp_path / "topology")
+    module.NETWORK_IDS_FILE = str(tmp_path / "network-ids.json")
+    module.PLAN_STATE_FILE = str(tmp_path / "plan-state.json")
+    module.PLANNED_CRS_FILE = str(tmp_path / "network-crs.planned.yaml")
+    return module
+
+
+def simulate(im, extra=()):
+    docs = [doc for path in im.plan_manifests(extra) for doc in im.iter_crs(path)]
+    return im.simulate_plan(docs)
+
+
+def test_idpool_allocates_lowest_free(im):
+    pool = im.IDPool(2, 20)
+    assert pool.reserve(3)
+    assert not pool.reserve(3)
+    assert not pool.reserve(21)
+    assert [pool.allocate() for _ in range(3)] == [2, 4, 5]
+    assert pool.used() == 4
+    for _ in range(15):
+        pool.allocate()
+    assert 20 in pool
+    with pytest.raises(im.InfraError):
+        pool.allocate()
+
+
+def test_idpool_skips_full_bytes(im):
+    pool = im.IDPool(0, 99)
+    assert [pool.allocate() for _ in range(50)] == list(range(50))
+    assert pool.scan == 6
+    assert pool.reserve(51)
+    assert [pool.allocate() for _ in range(2)] == [50, 52]
+    assert pool.used() == 53
+
+
+def test_network_ids_survive_a_restart(im):
+    ids = im.NetworkIDAllocator()
+    first = {key: ids.get(key) for key in ("bd/n2/core", "bd/n2/regional", "rt/n2")}
+    assert sorted(first.values()) == [1, 2, 3]
+    ids.save()
+
+    again = im.NetworkIDAllocator()
+    assert {key: again.get(key) for key in first} == first
+    assert again.get("rt/n3") == 4
+
+
+def test_network_ids_adopt_existing_networks(im):
+    ids = im.NetworkIDAllocator()
+    ids.seed([{
+        "metadata": {"name": "5g.vpc-n2"},
+        "spec": {"bridgeDomains": [{"name": "core-bd", "networkID": 7}], "routingTables": [{"networkID": 9}]},
+    }])
+    assert ids.get("bd/n2/core") == 7
+    assert ids.get("rt/n2") == 9
+    assert ids.get("bd/n2/edge") == 1
+
+
+def test_run_plan_follows_dependencies(im, monkeypatch):
+    started = []
+    monkeypatch.setattr(im, "run_plan_step", lambda name: started.append(name) or True)
+    completed, failed = im.run_plan(list(im.PLAN_STEPS), workers=1)
+    assert completed == set(im.PLAN_STEPS) and not failed
+    for name, deps in im.plan_dependencies(list(im.PLAN_STEPS)).items():
+        assert all(started.index(dep) < started.index(name) for dep in deps)
+
+
+@pytest.mark.parametrize("error", [False, KeyError("boom")])
+def test_run_plan_skips_the_dependents_of_a_failed_step(im, monkeypatch, error):
+    def step(name):
+        if name == "dynamic-vlan":
+            if error:
+                raise error
+            return False
+        return True
+
+    monkeypatch.setattr(im, "run_plan_step", step)
+    completed, failed = im.run_plan(list(im.PLAN_STEPS))
+    assert failed == {"dynamic-vlan", "vlan-interfaces"}
+    assert "ipclaims" in completed
+    with pytest.raises(im.InfraError, match="dynamic-vlan, vlan-interfaces"):
+        im.create_network_plan()
+
+
+def test_vlan_interfaces_wait_for_ipclaims_with_claims_placement(im):
+    assert "ipclaims" not in im.plan_dependencies(list(im.PLAN_STEPS))["vlan-interfaces"]
+    im.VLAN_PLACEMENT = "claims"
+    assert "ipclaims" in im.plan_dependencies(list(im.PLAN_STEPS))["vlan-interfaces"]
+
+
+def test_simulate_default_plan(im):
+    vlanclaims, ipclaims, conflicts, usage = simulate(im)
+    assert conflicts == []
+    assert len(vlanclaims) == 8 and len(ipclaims) == 15
+    assert {claim["status"]["id"] for claim in vlanclaims} == LIVE_VLAN_IDS
+    addresses = {claim["metadata"]["name"]: claim["status"]["address"] for claim in ipclaims}
+    assert LIVE_ADDRESSES.items() <= addresses.items()
+    # every router gets the first host address of its site's /24
+    for address in addresses.values():
+        interface = ipaddress.ip_interface(address)
+        assert interface.ip == next(interface.network.hosts())
+    assert usage["VLANIndex 5g"] == [8, 8]
+
+
+def test_topology_spec_reproduces_default_plan(im):
+    def allocation():
+        vlanclaims, ipclaims, conflicts, _ = simulate(im)
+        assert conflicts == []
+        return ({c["metadata"]["name"]: c["status"] for c in vlanclaims},
+                {c["metadata"]["name"]: c["status"] for c in ipclaims})
+
+    built_in = allocation()
+    im.use_topology("topologies/5g.yaml")
+    assert allocation() == built_in
+
+
+def test_simulate_reports_missing_prefix(im):
+    _, _, conflicts, _ = simulate(im, ["network-plan/cucp-dynamic.yaml"])
+    assert [(c["kind"], c["name"]) for c in conflicts] == [("IPClaim", "net1-claim2")]
+    assert "matches no network prefix" in conflicts[0]["problem"]
+
+
+def test_simulate_reports_conflicts(im):
+    docs = [
+        {"kind": "VLANIndex", "metadata": {"name": "v"}, "spec": {"minID": 10, "maxID": 11}},
+        {"kind": "VLANClaim", "metadata": {"name": "a"}, "spec": {"index": "v", "id": 10}},
+        {"kind": "VLANClaim", "metadata": {"name": "b"}, "spec": {"index": "v", "id": 10}},
+        {"kind": "VLANClaim", "metadata": {"name": "c"}, "spec": {"index": "v"}},
+        {"kind": "VLANClaim", "metadata": {"name": "d"}, "spec": {"index": "v"}},
+        {"kind": "IPIndex", "metadata": {"name": "i"}, "spec": {"prefixes": [{"prefix": "10.0.0.0/16"}]}},
+        {"kind": "NetworkConfig", "metadata": {"name": "i"}, "spec": {"prefixes": [
+            {"prefix": "10.0.1.0/30", "labels": {"site": "a"}},
+            {"prefix": "10.0.1.0/24", "labels": {"site": "b"}},
+        ]}},
+        {"kind": "IPClaim", "metadata": {"name": "x"}, "spec": {"index": "i", "address": "10.0.1.1/30"}},
+        {"kind": "IPClaim", "metadata": {"name": "y"}, "spec": {"index": "i", "selector": {"matchLabels": {"site": "a"}}}},
+        {"kind": "IPClaim", "metadata": {"name": "z"}, "spec": {"index": "i", "selector": {"matchLabels": {"site": "a"}}}},
+        {"kind": "IPClaim", "metadata": {"name": "w"}, "spec": {"index": "i", "address": "10.1.0.1"}},
+    ]
+    vlanclaims, ipclaims, conflicts, usage = im.simulate_plan(docs)
+    assert {c["name"] for c in conflicts} == {"b", "d", "i", "z", "w"}
+    assert {c["metadata"]["name"]: c["status"]["id"] for c in vlanclaims if "status" in c} == {"a": 10, "c": 11}
+    assert {c["metadata"]["name"]: c["status"]["address"] for c in ipclaims if "status" in c} == {
+        "x": "10.0.1.1/30", "y": "10.0.1.2/30"}
+    assert usage["i 10.0.1.0/30"] == [2, 2]
+
+
+def test_simulate_writes_network_crs(im):
+    assert im.simulate_network_crs()
+    with open(im.PLANNED_CRS_FILE) as f:
+        networks = [doc for doc in yaml.safe_load_all(f) if doc]
+    assert sorted(n["metadata"]["name"] for n in networks) == sorted(f"5g.vpc-{net}" for net in
+                                                                     ("default", "e1", "f1", "n2", "n3", "n4", "n6", "sbi"))
+    ids = [bd["networkID"] for n in networks for bd in n["spec"]["bridgeDomains"]]
+    ids += [rt["networkID"] for n in networks for rt in n["spec"]["routingTables"]]
+    assert None not in ids
+    assert not os.path.exists(im.NETWORK_IDS_FILE)
+
+
+def config(name, network, ready):
+    """A sdc Config owned by a Network, with its Ready condition."""
+    return {
+        "metadata": {"name": name, "namespace": "default",
+                     "ownerReferences": [{"kind": "Network", "name": network}]},
+        "status": {"conditions": [{"type": "Ready", "status": "True" if ready else "False", "reason": "Pending"}]},
+    }
+
+
+def evaluate(im, configs, networks):
+    objects = {im._object_key(c): c for c in configs}
+    return im._evaluate(objects, im._configs_pending(set(networks)), require_items=False)
+
+
+def test_evaluate_keeps_waiting_for_a_new_network(im):
+    # Only Configs of other networks exist: nothing to wait on yet, not ready either
+    assert evaluate(im, [config("5g.vpc-n2.leaf", "5g.vpc-n2", ready=True)], ["5g.vpc-new"]) is None
+
+
+def test_evaluate_waits_for_the_config_of_a_changed_network(im):
+    configs = [config("5g.vpc-n2.leaf", "5g.vpc-n2", ready=False), config("5g.vpc-n3.leaf", "5g.vpc-n3", ready=False)]
+    assert evaluate(im, configs, ["5g.vpc-n2"]) == ["5g.vpc-n2.leaf (pending: Ready)"]
+
+
+def test_evaluate_waits_for_changed_networks_without_a_config(im):
+    configs = [config("5g.vpc-n2.leaf", "5g.vpc-n2", ready=True)]
+    assert evaluate(im, configs, ["5g.vpc-n2", "5g.vpc-n3"]) == ["5g.vpc-n3 (no Config yet)"]
+
+
+def test_evaluate_is_done_when_the_changed_networks_are_ready(im):
+    configs = [config("5g.vpc-n2.leaf", "5g.vpc-n2", ready=True), config("5g.vpc-n3.leaf", "5g.vpc-n3", ready=False)]
+    assert evaluate(im, configs, ["5g.vpc-n2"]) == []